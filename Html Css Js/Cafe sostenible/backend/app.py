@@ -1,6 +1,5 @@
-from flask import Flask, send_from_directory, request, redirect, url_for, jsonify, session
+from flask import Flask, Blueprint, request, redirect, url_for, jsonify, session
 # Flask: framework web ligero de Python
-# send_from_directory: sirve archivos estáticos (HTML, CSS, JS, imágenes)
 # request: accede a datos del formulario/files
 # redirect/url_for: redirecciones internas
 # jsonify: devuelve respuestas JSON (para AJAX)
@@ -30,24 +29,6 @@ import base64
 # --- CARGAR VARIABLES DE ENTORNO ---
 load_dotenv()  # Carga automáticamente el archivo .env en la raíz del backend
 
-# --- INICIALIZACIÓN DE LA APP FLASK ---
-app = Flask(__name__, static_folder='../frontend')
-# Indica que los archivos estáticos están en la carpeta ../frontend (estructura del proyecto)
-
-# Clave secreta para firmar cookies de sesión (debe ser segura y secreta)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback_secret_key_dev")
-app.config['SECRET_KEY'] = os.getenv("FLASK_SECRET_KEY", "super-secret-key-dev")
-
-# Configuración segura de cookies de sesión
-app.config['SESSION_COOKIE_HTTPONLY'] = True      # Evita acceso desde JavaScript
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'     # Protege contra CSRF en navegación
-app.config['SESSION_COOKIE_SECURE'] = False      # Cambiar a True en producción con HTTPS
-app.config['SESSION_COOKIE_PATH'] = '/'           # Disponible en toda la app
-app.config['PERMANENT_SESSION_LIFETIME'] = 3600   # Sesión dura 1 hora
-
-# Modo debug controlado por variable de entorno
-app.config['DEBUG'] = os.getenv("FLASK_DEBUG", "False") == "True"
-
 # --- DEFINICIÓN DE RUTAS ABSOLUTAS (para servir archivos estáticos) ---
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))  # Directorio actual (backend/)
 FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
@@ -56,43 +37,89 @@ CSS_DIR = os.path.join(FRONTEND_DIR, 'css')
 JS_DIR = os.path.join(FRONTEND_DIR, 'js')
 IMG_DIR = os.path.join(FRONTEND_DIR, 'img')
 
-# --- CONFIGURACIÓN DE BASE DE DATOS SQL SERVER (desde .env) ---
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-
-# URI de conexión a SQL Server usando pymssql
-app.config['SQLALCHEMY_DATABASE_URI'] = (
-    f"mssql+pymssql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Mejora rendimiento
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,   # Verifica conexiones muertas
-    'pool_recycle': 300,     # Recicla conexiones cada 5 minutos
-}
-
 # --- IMPORTAR MODELOS (User y Finca) ---
 from models import db, User, Finca
-db.init_app(app)  # Vincula SQLAlchemy con la app Flask
 
-# --- CREAR TABLAS AUTOMÁTICAMENTE AL INICIAR (solo en desarrollo) ---
-with app.app_context():
+import estaticos
+# Archivos estáticos precomprimidos y con huella (flask --app app construir-estaticos)
+
+# --- BLUEPRINT CON TODAS LAS RUTAS (create_app lo registra) ---
+web = Blueprint('web', __name__, cli_group=None)
+
+# --- CONFIGURACIÓN DE BASE DE DATOS SQL SERVER (desde .env) ---
+def database_uri():
+    # DATABASE_URL permite usar otra base (p. ej. SQLite local) sin tocar el código
+    if os.getenv("DATABASE_URL"):
+        return os.getenv("DATABASE_URL")
+    DB_USER = os.getenv("DB_USER")
+    DB_PASSWORD = os.getenv("DB_PASSWORD")
+    DB_HOST = os.getenv("DB_HOST")
+    DB_NAME = os.getenv("DB_NAME")
+    # URI de conexión a SQL Server usando pymssql
+    return f"mssql+pymssql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+
+# --- INICIALIZACIÓN DE LA APP FLASK ---
+def create_app(config=None):
+    """Crea la app sin conectarse a la base: las tablas se crean con `flask init-db`"""
+    app = Flask(__name__, static_folder='../frontend')
+    # Indica que los archivos estáticos están en la carpeta ../frontend (estructura del proyecto)
+
+    # Clave secreta para firmar cookies de sesión (debe ser segura y secreta)
+    app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback_secret_key_dev")
+    app.config['SECRET_KEY'] = os.getenv("FLASK_SECRET_KEY", "super-secret-key-dev")
+
+    # Configuración segura de cookies de sesión
+    app.config['SESSION_COOKIE_HTTPONLY'] = True      # Evita acceso desde JavaScript
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'     # Protege contra CSRF en navegación
+    app.config['SESSION_COOKIE_SECURE'] = False      # Cambiar a True en producción con HTTPS
+    app.config['SESSION_COOKIE_PATH'] = '/'           # Disponible en toda la app
+    app.config['PERMANENT_SESSION_LIFETIME'] = 3600   # Sesión dura 1 hora
+
+    # Modo debug controlado por variable de entorno
+    app.config['DEBUG'] = os.getenv("FLASK_DEBUG", "False") == "True"
+
+    # --- LÍMITE DE TAMAÑO DE ARCHIVO ---
+    app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB máximo
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # Mejora rendimiento
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_pre_ping': True,   # Verifica conexiones muertas
+        'pool_recycle': 300,     # Recicla conexiones cada 5 minutos
+    }
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)  # Vincula SQLAlchemy con la app Flask (la conexión se abre en la primera consulta)
+    estaticos.iniciar(app)  # Carga el manifiesto de estáticos en memoria (si se construyó)
+    app.register_blueprint(web)
+    return app
+
+# --- CREAR TABLAS (comando explícito, una sola vez por despliegue) ---
+@web.cli.command('init-db')
+def init_db():
+    """Verifica la conexión y crea las tablas que falten: flask --app app init-db"""
     try:
         # Prueba rápida de conexión
         db.session.execute(db.text("SELECT 1"))
         db.session.commit()
         print("Conexión a la base de datos exitosa.")
-        
+
         # Crea las tablas si no existen
         db.create_all()
         print("Tablas verificadas/creadas correctamente.")
-        
+
     except Exception as e:
         print(f"No se pudo conectar a la base de datos: {e}")
         print(" → Crea las tablas manualmente en Somee.com o revisa las credenciales.")
         print(" → Asegúrate de que pymssql esté instalado: pip install pymssql")
 
+# --- CONSTRUIR ESTÁTICOS (paso del despliegue, antes de arrancar gunicorn) ---
+@web.cli.command('construir-estaticos')
+def construir_estaticos():
+    """Precomprime y pone huella a css/js/img: flask --app app construir-estaticos"""
+    estaticos.construir()
+
 # --- FUNCIÓN PARA HASHEAR TEXTO (contraseñas y códigos de asociado) ---
 def hash_text(text):
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
@@ -108,46 +135,48 @@ def login_required(f):
     return decorated_function
 
 # --- RUTAS PÚBLICAS (frontend) ---
-@app.route('/')
+@web.route('/')
 def index():
     """Página principal: si ya está logueado → va al dashboard, sino muestra landing"""
     if 'user_id' in session:
-        return redirect(url_for('inicio'))
-    return send_from_directory(HTML_DIR, 'index.html')
+        return redirect(url_for('web.inicio'))
+    return estaticos.pagina('index.html', HTML_DIR)
 
-@app.route('/inicio')
+@web.route('/inicio')
 @login_required
 def inicio():
     """Dashboard del productor (protegido)"""
-    return send_from_directory(HTML_DIR, 'inicio.html')
+    return estaticos.pagina('inicio.html', HTML_DIR)
 
 # --- SERVIR ARCHIVOS ESTÁTICOS ---
-@app.route('/css/<path:filename>')
+# Con el manifiesto construido: nombres con huella → caché immutable de 1 año,
+# .br/.gz según Accept-Encoding y envío con sendfile (ver estaticos.py)
+@web.route('/css/<path:filename>')
 def css(filename):
-    return send_from_directory(CSS_DIR, filename)
+    return estaticos.servir('css', filename, CSS_DIR)
 
-@app.route('/js/<path:filename>')
+@web.route('/js/<path:filename>')
 def js(filename):
-    return send_from_directory(JS_DIR, filename)
+    return estaticos.servir('js', filename, JS_DIR)
 
-@app.route('/img/<path:filename>')
+@web.route('/img/<path:filename>')
 def img(filename):
-    return send_from_directory(IMG_DIR, filename)
+    return estaticos.servir('img', filename, IMG_DIR)
 
 # --- RUTAS DE AUTENTICACIÓN ---
-@app.route('/login')
+@web.route('/login')
 def login_page():
     """Muestra el formulario de login"""
-    return send_from_directory(HTML_DIR, 'login.html')
+    return estaticos.pagina('login.html', HTML_DIR)
 
-@app.route('/perfil')
+@web.route('/perfil')
 @login_required
 def perfil():
     """Página de perfil del usuario"""
-    return send_from_directory(HTML_DIR, 'perfil.html')
+    return estaticos.pagina('perfil.html', HTML_DIR)
 
 # --- API: INICIO DE SESIÓN ---
-@app.route('/login', methods=['POST'])
+@web.route('/login', methods=['POST'])
 def login():
     username = request.form.get('username')
     password = request.form.get('password')
@@ -167,7 +196,7 @@ def login():
         return jsonify({"status": "error", "message": "Usuario o contraseña incorrectos"}), 401
 
 # --- API: REGISTRO DE NUEVO PRODUCTOR ---
-@app.route('/register', methods=['POST'])
+@web.route('/register', methods=['POST'])
 def register():
     # Datos del formulario
     username = request.form.get('username')
@@ -218,7 +247,7 @@ def register():
     return jsonify({"status": "success", "message": "Registro exitoso"})
 
 # --- API: OBTENER DATOS DEL USUARIO LOGUEADO ---
-@app.route('/api/user')
+@web.route('/api/user')
 @login_required
 def api_user():
     user = User.query.get(session['user_id'])
@@ -240,15 +269,13 @@ def api_user():
         "foto_src": f"data:{user.foto_mime};base64,{foto_base64}" if foto_base64 else "/img/usuarios/default-user.png"
     })
 
-# --- LÍMITE DE TAMAÑO DE ARCHIVO ---
-app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB máximo
-
-@app.errorhandler(413)
+# --- ERROR POR ARCHIVO DEMASIADO GRANDE ---
+@web.app_errorhandler(413)
 def request_entity_too_large(error):
     return jsonify({"status": "error", "message": "Archivo demasiado grande"}), 413
 
 # --- API: CAMBIAR FOTO DE PERFIL ---
-@app.route('/api/cambiar-foto', methods=['POST'])
+@web.route('/api/cambiar-foto', methods=['POST'])
 @login_required
 def cambiar_foto():
     foto = request.files.get('foto_perfil')
@@ -267,10 +294,13 @@ def cambiar_foto():
     return jsonify({"status": "success", "message": "Foto actualizada"})
 
 # --- CERRAR SESIÓN ---
-@app.route('/logout')
+@web.route('/logout')
 def logout():
     session.clear()  # Elimina toda la sesión
-    return redirect(url_for('index'))
+    return redirect(url_for('web.index'))
+
+# Instancia para `gunicorn app:app` y `flask --app app`; crearla no abre conexiones
+app = create_app()
 
 # --- INICIAR SERVIDOR ---
 if __name__ == "__main__":
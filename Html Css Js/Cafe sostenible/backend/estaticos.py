@@ -0,0 +1,207 @@
+# backend/estaticos.py
+"""
+Archivos estáticos precomprimidos y con huella en el nombre.
+
+Paso de construcción (una vez por despliegue):
+
+    flask --app app construir-estaticos
+
+- Copia css/, js/ e img/ del frontend a DIST_DIR con el hash del contenido
+  en el nombre (index.css → index.3f2a9c1b0d.css).
+- Los archivos de texto (CSS, JS, SVG, HTML...) se guardan además en .gz y,
+  si está instalado el paquete brotli, en .br (solo si quedan más chicos).
+- Las páginas HTML se copian a DIST_DIR/html con las rutas /css/, /js/ e
+  /img/ reescritas a los nombres con huella.
+- manifest.json guarda por archivo su nombre con huella, hash, tamaño y
+  tamaños comprimidos.
+
+En ejecución el manifiesto se carga una vez en memoria (iniciar). Un nombre
+con huella no cambia nunca de contenido: se sirve con Cache-Control
+immutable de un año, eligiendo .br, .gz o el original según Accept-Encoding,
+con send_file (wsgi.file_wrapper → sendfile en gunicorn, o X-Sendfile con
+ESTATICOS_X_SENDFILE=1 detrás de nginx/apache). Sin manifiesto todo se sirve
+como antes, desde el frontend.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_file, send_from_directory
+
+# Rutas del frontend (las mismas que app.py)
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
+DIST_DIR = os.getenv("ESTATICOS_DIR", os.path.join(BASE_DIR, 'dist'))
+
+CARPETAS = ('img', 'css', 'js')   # img primero: CSS y JS pueden referenciar imágenes
+COMPRIMIBLES = {'.css', '.js', '.svg', '.html', '.webmanifest', '.json', '.ico', '.txt'}
+LARGO_HUELLA = 10
+UN_ANIO = 31536000
+
+# Referencias a recursos dentro de HTML, CSS y JS: "/img/x.png", '/css/a.css', url(/img/y.jpg)
+REFERENCIA = re.compile(r"""(?<=["'(])/(css|js|img)/([^"'()?#\s]+)""")
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('image/svg+xml', '.svg')
+
+try:
+    import brotli
+except ImportError:   # opcional: sin brotli solo se genera .gz
+    brotli = None
+
+
+# --- CONSTRUCCIÓN ---
+def _con_huella(nombre, digest):
+    base, ext = os.path.splitext(nombre)
+    return f"{base}.{digest[:LARGO_HUELLA]}{ext}"
+
+
+def _escribir_comprimidos(ruta, datos):
+    """Escribe ruta.gz y ruta.br si comprimen algo; devuelve sus tamaños (o None)."""
+    tamanos = {'gzip': None, 'br': None}
+    comprimidos = {'gzip': gzip.compress(datos, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        comprimidos['br'] = brotli.compress(datos, quality=11)
+    for codificacion, contenido in comprimidos.items():
+        if len(contenido) < len(datos):
+            extension = '.gz' if codificacion == 'gzip' else '.br'
+            with open(ruta + extension, 'wb') as f:
+                f.write(contenido)
+            tamanos[codificacion] = len(contenido)
+    return tamanos
+
+
+def _reescribir(texto, manifiesto):
+    """Cambia /carpeta/nombre por /carpeta/nombre-con-huella si está en el manifiesto."""
+    def reemplazo(m):
+        entrada = manifiesto.get(f"{m.group(1)}/{m.group(2)}")
+        return f"/{m.group(1)}/{entrada['ruta'].split('/', 1)[1]}" if entrada else m.group(0)
+    return REFERENCIA.sub(reemplazo, texto)
+
+
+def construir(origen=FRONTEND_DIR, destino=DIST_DIR, log=print):
+    """Genera DIST_DIR desde cero y devuelve el manifiesto."""
+    if os.path.isdir(destino):
+        shutil.rmtree(destino)
+    manifiesto, paginas = {}, {}
+
+    def guardar(clave, datos, ruta_relativa):
+        ruta = os.path.join(destino, ruta_relativa)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        entrada = {"ruta": ruta_relativa.replace(os.sep, '/'), "hash": hashlib.sha256(datos).hexdigest(),
+                   "tamano": len(datos), "gzip": None, "br": None}
+        if os.path.splitext(clave)[1].lower() in COMPRIMIBLES:
+            entrada.update(_escribir_comprimidos(ruta, datos))
+        return entrada
+
+    for carpeta in CARPETAS:
+        raiz = os.path.join(origen, carpeta)
+        for directorio, _, archivos in os.walk(raiz):
+            for archivo in sorted(archivos):
+                relativa = os.path.relpath(os.path.join(directorio, archivo), raiz).replace(os.sep, '/')
+                with open(os.path.join(directorio, archivo), 'rb') as f:
+                    datos = f.read()
+                if carpeta in ('css', 'js'):
+                    datos = _reescribir(datos.decode('utf-8'), manifiesto).encode('utf-8')
+                digest = hashlib.sha256(datos).hexdigest()
+                clave = f"{carpeta}/{relativa}"
+                manifiesto[clave] = guardar(clave, datos, os.path.join(carpeta, _con_huella(relativa, digest)))
+
+    # Las páginas conservan su nombre (no se cachean) pero apuntan a los nombres con huella
+    raiz = os.path.join(origen, 'html')
+    for archivo in sorted(os.listdir(raiz)):
+        with open(os.path.join(raiz, archivo), encoding='utf-8') as f:
+            datos = _reescribir(f.read(), manifiesto).encode('utf-8')
+        paginas[archivo] = guardar(archivo, datos, os.path.join('html', archivo))
+
+    with open(os.path.join(destino, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({"archivos": manifiesto, "paginas": paginas}, f, indent=2, sort_keys=True)
+
+    total = sum(e['tamano'] for e in manifiesto.values())
+    comprimido = sum(min(t for t in (e['tamano'], e['gzip'], e['br']) if t) for e in manifiesto.values())
+    log(f"{len(manifiesto)} archivos y {len(paginas)} páginas en {destino} "
+        f"({total:,} bytes; {comprimido:,} con la mejor compresión)")
+    return manifiesto
+
+
+# --- EJECUCIÓN ---
+class Manifiesto:
+    """Índice en memoria de DIST_DIR: nombre original y nombre con huella → entrada."""
+
+    def __init__(self, destino, datos):
+        self.destino = destino
+        self.archivos = datos['archivos']
+        self.paginas = datos['paginas']
+        self.por_huella = {e['ruta']: e for e in self.archivos.values()}
+
+    @classmethod
+    def cargar(cls, destino=DIST_DIR):
+        ruta = os.path.join(destino, 'manifest.json')
+        if not os.path.exists(ruta):
+            return None
+        with open(ruta, encoding='utf-8') as f:
+            return cls(destino, json.load(f))
+
+
+def iniciar(app):
+    """Carga el manifiesto si se construyó; sin él las rutas sirven el frontend tal cual."""
+    app.extensions['estaticos'] = Manifiesto.cargar(app.config.get('ESTATICOS_DIR', DIST_DIR))
+    app.config.setdefault('USE_X_SENDFILE', os.getenv("ESTATICOS_X_SENDFILE") == "1")
+
+
+def _codificacion(entrada):
+    """La mejor codificación precomprimida que acepta el cliente: 'br', 'gzip' o None."""
+    for codificacion in ('br', 'gzip'):
+        if entrada[codificacion] and request.accept_encodings[codificacion]:
+            return codificacion
+    return None
+
+
+def _enviar(manifiesto, entrada, inmutable):
+    ruta = os.path.join(manifiesto.destino, entrada['ruta'])
+    mimetype = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    codificacion = _codificacion(entrada)
+    if codificacion:
+        ruta += '.gz' if codificacion == 'gzip' else '.br'
+    etag = entrada['hash'][:32] + (f"-{codificacion}" if codificacion else '')
+
+    response = send_file(ruta, mimetype=mimetype, etag=etag, conditional=True,
+                         max_age=UN_ANIO if inmutable else 0)
+    if codificacion:
+        response.headers['Content-Encoding'] = codificacion
+    if entrada['gzip'] or entrada['br']:
+        response.vary.add('Accept-Encoding')
+    if inmutable:
+        response.headers['Cache-Control'] = f'public, max-age={UN_ANIO}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'   # revalida con el ETag
+    return response
+
+
+def servir(carpeta, nombre, directorio):
+    """/css/, /js/ e /img/: con huella → immutable; nombre original → revalidable."""
+    manifiesto = current_app.extensions.get('estaticos')
+    if manifiesto is None:
+        return send_from_directory(directorio, nombre)
+    entrada = manifiesto.por_huella.get(f"{carpeta}/{nombre}")
+    if entrada is not None:
+        return _enviar(manifiesto, entrada, inmutable=True)
+    entrada = manifiesto.archivos.get(f"{carpeta}/{nombre}")
+    if entrada is not None:
+        return _enviar(manifiesto, entrada, inmutable=False)
+    return send_from_directory(directorio, nombre)
+
+
+def pagina(nombre, directorio):
+    """Página HTML: la versión reescrita del manifiesto si existe, si no la original."""
+    manifiesto = current_app.extensions.get('estaticos')
+    entrada = manifiesto.paginas.get(nombre) if manifiesto else None
+    if entrada is None:
+        return send_from_directory(directorio, nombre)
+    return _enviar(manifiesto, entrada, inmutable=False)
@@ -0,0 +1,25 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.py crea la app al importarse: que no arme la URL de SQL Server
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import estaticos
+from app import create_app
+
+
+@pytest.fixture(scope='session')
+def dist(tmp_path_factory):
+    """Estáticos construidos una vez desde el frontend real en un directorio temporal."""
+    destino = str(tmp_path_factory.mktemp('estaticos') / 'dist')
+    estaticos.construir(destino=destino, log=lambda _: None)
+    return destino
+
+
+@pytest.fixture
+def app(dist):
+    return create_app({'TESTING': True, 'ESTATICOS_DIR': dist})
@@ -0,0 +1,105 @@
+# backend/tests/test_estaticos.py
+import gzip
+import json
+import os
+import re
+
+import pytest
+
+import estaticos
+from app import CSS_DIR, HTML_DIR, IMG_DIR, create_app
+
+
+def _original(directorio, nombre):
+    with open(os.path.join(directorio, nombre), 'rb') as f:
+        return f.read()
+
+
+def _huella(app, clave):
+    return app.extensions['estaticos'].archivos[clave]['ruta']
+
+
+def test_construir_pone_huella_y_reescribe_referencias(dist):
+    with open(os.path.join(dist, 'manifest.json'), encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    entrada = manifiesto['archivos']['css/index.css']
+    assert re.fullmatch(r'css/index\.[0-9a-f]{10}\.css', entrada['ruta'])
+    assert entrada['hash'].startswith(entrada['ruta'].split('.')[1])
+    assert 0 < entrada['gzip'] < entrada['tamano']
+    assert manifiesto['archivos']['img/fondo_cafe.jpg']['gzip'] is None   # JPEG: no se recomprime
+
+    with open(os.path.join(dist, 'html', 'index.html'), encoding='utf-8') as f:
+        pagina = f.read()
+    assert f"/{entrada['ruta']}" in pagina
+    assert '/css/index.css' not in pagina
+
+
+@pytest.mark.parametrize('acepta, codificacion', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('identity', None),
+    (None, None),
+])
+def test_negocia_accept_encoding(app, acepta, codificacion):
+    if codificacion == 'br' and estaticos.brotli is None:
+        pytest.skip("brotli no instalado")
+    ruta = _huella(app, 'css/index.css')
+    headers = {'Accept-Encoding': acepta} if acepta else {}
+    respuesta = app.test_client().get(f'/{ruta}', headers=headers)
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/css'
+    assert respuesta.headers.get('Content-Encoding') == codificacion
+    assert respuesta.headers['Vary'] == 'Accept-Encoding'
+    datos = respuesta.get_data()
+    if codificacion == 'br':
+        datos = estaticos.brotli.decompress(datos)
+    elif codificacion == 'gzip':
+        datos = gzip.decompress(datos)
+    assert datos == _original(CSS_DIR, 'index.css')
+
+
+def test_con_huella_inmutable_y_etag_por_codificacion(app):
+    cliente = app.test_client()
+    ruta = _huella(app, 'css/index.css')
+    gz = cliente.get(f'/{ruta}', headers={'Accept-Encoding': 'gzip'})
+    plano = cliente.get(f'/{ruta}')
+
+    assert gz.headers['Cache-Control'] == f'public, max-age={estaticos.UN_ANIO}, immutable'
+    assert gz.headers['ETag'] != plano.headers['ETag']
+    revalidada = cliente.get(f'/{ruta}', headers={'Accept-Encoding': 'gzip', 'If-None-Match': gz.headers['ETag']})
+    assert revalidada.status_code == 304
+
+
+def test_nombre_original_y_paginas_revalidan(app):
+    cliente = app.test_client()
+    original = cliente.get('/css/index.css', headers={'Accept-Encoding': 'gzip'})
+    assert original.headers['Cache-Control'] == 'no-cache'
+    assert gzip.decompress(original.get_data()) == _original(CSS_DIR, 'index.css')
+
+    pagina = cliente.get('/login')
+    assert pagina.headers['Cache-Control'] == 'no-cache' and 'ETag' in pagina.headers
+    assert f"/{_huella(app, 'css/login.css')}".encode() in pagina.get_data()
+
+
+def test_binarios_sin_comprimir(app):
+    respuesta = app.test_client().get(f"/{_huella(app, 'img/fondo_cafe.jpg')}", headers={'Accept-Encoding': 'br, gzip'})
+    assert 'Content-Encoding' not in respuesta.headers and 'Vary' not in respuesta.headers
+    assert respuesta.get_data() == _original(IMG_DIR, 'fondo_cafe.jpg')
+
+
+def test_sin_manifiesto_sirve_el_frontend(tmp_path):
+    app = create_app({'TESTING': True, 'ESTATICOS_DIR': str(tmp_path / 'sin-construir')})
+    assert app.extensions['estaticos'] is None
+    cliente = app.test_client()
+
+    css = cliente.get('/css/index.css', headers={'Accept-Encoding': 'gzip, br'})
+    assert css.status_code == 200 and 'Content-Encoding' not in css.headers
+    assert css.get_data() == _original(CSS_DIR, 'index.css')
+    assert 'immutable' not in css.headers.get('Cache-Control', '')
+    assert cliente.get('/login').get_data() == _original(HTML_DIR, 'login.html')
+    assert cliente.get('/css/index.0123456789.css').status_code == 404
+
+
+def test_desconocido_404(app):
+    assert app.test_client().get('/js/no-existe.js').status_code == 404
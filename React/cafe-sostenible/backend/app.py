@@ -1,21 +1,40 @@
 # backend/app.py
-from flask import Flask, request, jsonify, session
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import cast, Date
-from datetime import datetime
+from flask import Flask, Blueprint, current_app, request, jsonify, session, g, stream_with_context
+from datetime import datetime, timedelta
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import hashlib
+import json
 from dotenv import load_dotenv
-import base64
-import requests
-from bs4 import BeautifulSoup
+import click
+
+from models import db, User, Finca, CalculoEUDR, FotoPerfil, FotoVariante, VersionFactores, PoligonoFinca
+import conexiones
+import fotos
+import migraciones
+import huella
+import importador
+import noticias
+import tendencias
+import benchmark
+import cache_respuestas
+import exportar
+import metricas
+import serializacion
+import sincronizar
+import escenarios
+import incertidumbre
+import factores_emision
+import recalcular
+import geometria
+import bosque
+import busqueda
+import historial
 
 # --- CARGAR .env ---
 load_dotenv()
 
-# --- INICIALIZACIÓN ---
-app = Flask(__name__)
 # EN PRODUCCIÓN (Render): permite tu frontend y localhost
 allowed_origins = [
     "https://cafe-sostenible-1.onrender.com",  # Frontend
@@ -24,53 +43,59 @@ allowed_origins = [
     "https://localhost:5173"
 ]
 
-CORS(app, origins=allowed_origins, supports_credentials=True)
+# Todas las rutas y comandos viven en este blueprint; create_app lo registra
+api = Blueprint('api', __name__, cli_group=None)
 
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
+# --- BASE DE DATOS ---
+def database_uri():
+    """DATABASE_URL tiene prioridad (p. ej. SQLite local); si no, SQL Server desde DB_*."""
+    if os.getenv("DATABASE_URL"):
+        return os.getenv("DATABASE_URL")
+    DB_USER = os.getenv("DB_USER")
+    DB_PASSWORD = os.getenv("DB_PASSWORD")
+    DB_HOST = os.getenv("DB_HOST")
+    DB_NAME = os.getenv("DB_NAME")
+    return f"mssql+pymssql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
-# Cookies cross-domain
-app.config.update(
-    SESSION_COOKIE_HTTPONLY=True,
-    SESSION_COOKIE_SAMESITE="None",   # Permite cookies entre dominios
-    SESSION_COOKIE_SECURE=True,       # Requerido cuando Samesite=None
-    PERMANENT_SESSION_LIFETIME=3600,
-)
+# --- INICIALIZACIÓN ---
+def create_app(config=None):
+    """
+    Crea la app sin tocar la base de datos: el engine conecta en la primera
+    consulta y el esquema se verifica una sola vez con `flask migrar`.
+    """
+    app = Flask(__name__)
+    # Detrás del proxy de producción: respeta X-Forwarded-Proto/Host al generar URLs externas
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    CORS(app, origins=allowed_origins, supports_credentials=True)
+
+    app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
+
+    # Cookies cross-domain
+    app.config.update(
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SAMESITE="None",   # Permite cookies entre dominios
+        SESSION_COOKIE_SECURE=True,       # Requerido cuando Samesite=None
+        PERMANENT_SESSION_LIFETIME=3600,
+    )
 
-# --- BASE DE DATOS ---
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-
-app.config['SQLALCHEMY_DATABASE_URI'] = (
-    f"mssql+pymssql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
-)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,
-    'pool_recycle': 300,
-}
-
-# --- IMPORTAR MODELOS ---
-from models import db, User, Finca, CalculoEUDR
-db.init_app(app)
-
-# --- CREAR TABLAS (SEGURO Y COMPATIBLE) ---
-with app.app_context():
-    try:
-        # Verifica conexión con una consulta simple
-        db.session.execute(db.text("SELECT 1"))
-        db.session.commit()
-        print("Conexión a la base de datos exitosa.")
-        
-        # Crea tablas si no existen
-        db.create_all()
-        print("Tablas verificadas/creadas correctamente.")
-        
-    except Exception as e:
-        print(f"No se pudo conectar a la base de datos: {e}")
-        print("   → Crea las tablas manualmente en Somee.com o revisa las credenciales.")
-        print("   → Asegúrate de que pymssql esté instalado: pip install pymssql")
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+    }
+    if config:
+        app.config.update(config)
+
+    cache_respuestas.preparar(app)
+    busqueda.preparar(app)       # índice de nombres de finca de esta app
+    conexiones.preparar(app)     # pool del primario y réplica de lectura (DATABASE_READ_URL)
+    metricas.preparar(app)       # antes de crear el engine (pool medido)
+    db.init_app(app)
+    conexiones.iniciar(app, db)
+    metricas.iniciar(app, db)
+    app.register_blueprint(api)
+    return app
 
 # --- UTILIDADES ---
 def hash_text(text):
@@ -85,8 +110,31 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def usuario_actual():
+    """
+    Usuario de la sesión con su finca, en una sola consulta (JOIN) y sin la
+    foto ni el hash de contraseña. Se memoriza en `g` durante la petición.
+    """
+    if 'usuario' not in g:
+        g.usuario = User.query.options(
+            db.load_only(User.id, User.username, User.nombre, User.apellido,
+                         User.foto_hash, User.foto_mime, User.finca_id),
+            db.joinedload(User.finca).load_only(Finca.nombre, Finca.codigo_original),
+        ).filter_by(id=session['user_id']).first()
+    return g.usuario
+
+# Espacios de invalidación de la caché de respuestas
+def espacio_usuario():
+    return f"usuario:{session['user_id']}"
+
+def espacio_historial():
+    return f"historial:{session['user_id']}"
+
+def espacio_usuarios():
+    return "usuarios"
+
 # --- API REST ---
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def api_login():
     data = request.form
     username = data.get('username')
@@ -107,8 +155,10 @@ def api_login():
     
     return jsonify({"status": "error", "message": "Credenciales inválidas"}), 401
 
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def api_register():
+    # Límite antes de leer el formulario: Werkzeug corta con 413 mientras lee
+    request.max_content_length = fotos.BYTES_PETICION
     data = request.form
     foto = request.files.get('foto_perfil')
 
@@ -126,15 +176,14 @@ def api_register():
         return jsonify({"status": "error", "message": "Usuario existe"}), 400
 
     # Procesar foto
-    foto_blob = None
+    foto_hash = None
     foto_mime = 'image/png'
     if foto and foto.filename:
-        if foto.content_length > 5 * 1024 * 1024:
-            return jsonify({"status": "error", "message": "Imagen > 5MB"}), 400
-        if foto.mimetype not in {'image/png', 'image/jpeg', 'image/webp', 'image/gif'}:
-            return jsonify({"status": "error", "message": "Formato no permitido"}), 400
-        foto_blob = foto.read()
-        foto_mime = foto.mimetype
+        try:
+            foto_hash, foto_mime, datos = fotos.recibir(foto)
+        except fotos.FotoInvalida as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        fotos.guardar_foto(datos, foto_mime, foto_hash)
 
     # Crear usuario
     user = User(
@@ -143,26 +192,28 @@ def api_register():
         nombre=data['nombre'],
         apellido=data['apellido'],
         codigo_asociado_hash=codigo_hash,
-        foto_perfil=foto_blob,
+        finca_id=finca.id,
+        foto_hash=foto_hash,
         foto_mime=foto_mime
     )
     db.session.add(user)
     db.session.commit()
+    cache_respuestas.invalidar(espacio_usuarios())
+    if foto_hash:
+        fotos.programar(foto_hash)
 
     return jsonify({"status": "success", "message": "Registro exitoso"})
 
-@app.route('/api/user')
+@api.route('/api/user')
 @login_required
+@cache_respuestas.cacheada(espacio_usuario)
 def api_user():
-    user = User.query.get(session['user_id'])
-    finca = Finca.query.filter_by(codigo_hash=user.codigo_asociado_hash).first()
+    user = usuario_actual()
+    if user is None:
+        return jsonify({"status": "error", "message": "No autorizado"}), 401
+    finca = user.finca
     codigo_plano = finca.codigo_original if finca else "Desconocido"
 
-    foto_src = "/img/usuarios/default-user.png"
-    if user.foto_perfil:
-        foto_base64 = base64.b64encode(user.foto_perfil).decode()
-        foto_src = f"data:{user.foto_mime};base64,{foto_base64}"
-
     # NUEVO: nombre de la finca (para la calculadora)
     nombre_finca = finca.nombre if finca else "Sin finca"
 
@@ -172,40 +223,118 @@ def api_user():
         "apellido": user.apellido,
         "codigo_asociado": codigo_plano,
         "nombreFinca": nombre_finca,          # <-- campo añadido
-        "foto_src": foto_src
+        "foto_src": fotos.url_foto(user.foto_hash)
     })
 
-@app.route('/api/cambiar-foto', methods=['POST'])
+@api.route('/api/cambiar-foto', methods=['POST'])
 @login_required
 def cambiar_foto():
+    request.max_content_length = fotos.BYTES_PETICION
     foto = request.files.get('foto_perfil')
     if not foto or not foto.filename:
         return jsonify({"status": "error", "message": "No se envió foto"}), 400
 
-    if foto.mimetype not in {'image/png', 'image/jpeg', 'image/webp', 'image/gif'}:
-        return jsonify({"status": "error", "message": "Formato no permitido"}), 400
+    try:
+        foto_hash, foto_mime, datos = fotos.recibir(foto)
+    except fotos.FotoInvalida as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-    foto_blob = foto.read()
-    user = User.query.get(session['user_id'])
-    user.foto_perfil = foto_blob
-    user.foto_mime = foto.mimetype
+    fotos.guardar_foto(datos, foto_mime, foto_hash)
+    user = usuario_actual()
+    user.foto_hash = foto_hash
+    user.foto_mime = foto_mime
     db.session.commit()
+    cache_respuestas.invalidar(espacio_usuario())
+    fotos.programar(foto_hash)
+
+    return jsonify({"status": "success", "message": "Foto actualizada", "foto_src": fotos.url_foto(foto_hash)})
+
+# === FOTO DE PERFIL (cacheable) ===
+@api.route('/api/user/foto/<foto_hash>')
+def foto_usuario(foto_hash):
+    # El hash identifica el contenido: si el cliente ya lo tiene, no hay nada que consultar
+    if foto_hash in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        foto = db.session.get(FotoPerfil, foto_hash)
+        if foto is None:
+            return jsonify({"status": "error", "message": "Foto no encontrada"}), 404
+        response = current_app.response_class(foto.datos, mimetype=foto.mime)
+    response.set_etag(foto_hash)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@api.route('/api/user/foto/<foto_hash>/<variante>')
+def foto_variante(foto_hash, variante):
+    if variante not in fotos.VARIANTES:
+        return jsonify({"status": "error", "message": "Variante desconocida"}), 404
+    etag = f"{foto_hash}-{variante}"
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        foto = db.session.get(FotoVariante, (foto_hash, variante))
+        if foto is None:
+            original = db.session.get(FotoPerfil, foto_hash)
+            if original is None:
+                return jsonify({"status": "error", "message": "Foto no encontrada"}), 404
+            if db.session.query(FotoVariante.foto_hash).filter_by(foto_hash=foto_hash).first() is None:
+                # Todavía sin transcodificar: se sirve el original sin cachear y se programa
+                fotos.programar(foto_hash)
+                response = current_app.response_class(original.datos, mimetype=original.mime)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            # Ya transcodificada sin esta variante ('grande' no pesaba menos): el original es la variante
+            foto = original
+        response = current_app.response_class(foto.datos, mimetype=foto.mime)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@api.errorhandler(413)
+def peticion_demasiado_grande(e):
+    return jsonify({"status": "error", "message": "Archivo demasiado grande"}), 413
+
+@api.cli.command('fotos-reducir')
+@click.option('--lote', default=20, show_default=True, help='Fotos por transacción')
+@click.option('--procesos', type=int, help='Procesos que transcodifican (por defecto, uno por CPU)')
+def fotos_reducir_cli(lote, procesos):
+    """Reduce las fotos de perfil guardadas y genera sus variantes WebP."""
+    movidas = migraciones.mover_fotos()
+    if movidas:
+        click.echo(f"{movidas} fotos movidas de users.foto_perfil a fotos_perfil")
+    reporte = fotos.reducir_todas(tamano_lote=lote, procesos=procesos, log=click.echo)
+    click.echo(
+        f"{reporte['reducidas']} fotos reducidas, {reporte['con_error']} con error: "
+        f"{reporte['bytes_antes']:,} → {reporte['bytes_despues']:,} bytes"
+    )
 
-    return jsonify({"status": "success", "message": "Foto actualizada"})
-
-@app.route('/api/logout', methods=['POST'])
+@api.route('/api/logout', methods=['POST'])
 def api_logout():
     session.clear()
     return jsonify({"status": "success", "message": "Sesión cerrada"})
 
 # === GUARDAR CÁLCULO EUDR ===
-@app.route('/api/historial', methods=['POST'])
+@api.route('/api/historial', methods=['POST'])
 @login_required
 def guardar_historial():
-    data = request.get_json()
-    if not data:
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
         return jsonify({"status": "error", "message": "Datos JSON requeridos"}), 400
 
+    # Finca con polígono verificado: el bosque sale del raster, no de lo que se escribió
+    verificacion = bosque.vigentes([session['user_id']]).get(session['user_id'])
+    if verificacion is not None:
+        data = {**data, 'bosqueBase': verificacion.bosque_base_ha, 'bosqueActual': verificacion.bosque_actual_ha}
+    # El porcentaje de deforestación se mide sobre los polígonos verificados, como en la verificación
+    data['area_bosque'] = verificacion.area_ha if verificacion else None
+
+    # El motor del servidor es la autoridad sobre resultados e indicadores
+    version, factores = factores_emision.activa()
+    calculado = huella.calcular(data, factores=factores)
+    if calculado is None:
+        return jsonify({"status": "error", "message": "Área cultivada y producción deben ser mayores a 0"}), 400
+    indicadores, desglose = calculado
+
     try:
         calculo = CalculoEUDR(
             user_id=session['user_id'],
@@ -226,168 +355,584 @@ def guardar_historial():
             residuos_compostados=float(data.get('residuosCompostados', 0)) if data.get('residuosCompostados') else None,
             bosque_base=float(data.get('bosqueBase', 0)) if data.get('bosqueBase') else None,
             bosque_actual=float(data.get('bosqueActual', 0)) if data.get('bosqueActual') else None,
-            huella_total=float(data['total']),
-            huella_por_kg=float(data['porKg']),
-            fert_por_ha=float(data.get('fertPorHa', 0)) if data.get('fertPorHa') else None,
-            rendimiento=float(data.get('rendimiento', 0)) if data.get('rendimiento') else None,
-            energia_total=float(data.get('energiaTotal', 0)) if data.get('energiaTotal') else None,
-            arboles_por_ha=float(data.get('arbolesPorHa', 0)) if data.get('arbolesPorHa') else None,
-            cobertura_porc=float(data.get('coberturaPorc', 0)) if data.get('coberturaPorc') else None,
-            distancia_prom=float(data.get('distanciaProm', 0)) if data.get('distanciaProm') else None,
-            fraccion_compost=float(data.get('fraccionCompost', 0)) if data.get('fraccionCompost') else None,
-            deforestacion_porc=float(data.get('deforestacionPorc', 0)) if data.get('deforestacionPorc') else None,
+            factores_version_id=version.id if version else None,
+            verificacion_id=verificacion.id if verificacion else None,
+            area_bosque=data['area_bosque'],
+            **indicadores,
         )
         db.session.add(calculo)
+        db.session.flush()                 # asigna fecha e id
+        tendencias.registrar([calculo])    # misma transacción que el cálculo
+        benchmark.registrar([calculo.fecha], benchmark.valores_calculo(indicadores, desglose, calculo.produccion_verde))
         db.session.commit()
+        cache_respuestas.invalidar(espacio_historial())
         return jsonify({"status": "success", "message": "Cálculo guardado"}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"status": "error", "message": str(e)}), 400
 
-# === OBTENER HISTORIAL ===
-@app.route('/api/historial', methods=['GET'])
+# === CÁLCULO POR LOTE (vectorizado) ===
+LOTE_MAXIMO = 50000
+
+@api.route('/api/calcular/lote', methods=['POST'])
 @login_required
-def obtener_historial():
-    from sqlalchemy import func
-    from datetime import datetime
+def calcular_lote():
+    data = request.get_json(silent=True)
+    registros = data.get('registros') if isinstance(data, dict) else data
+    if not isinstance(registros, list) or not registros:
+        return jsonify({"status": "error", "message": "Se requiere una lista de registros"}), 400
+    if len(registros) > LOTE_MAXIMO:
+        return jsonify({"status": "error", "message": f"Máximo {LOTE_MAXIMO} registros por lote"}), 413
+    if not all(isinstance(r, dict) for r in registros):
+        return jsonify({"status": "error", "message": "Cada registro debe ser un objeto"}), 400
+
+    columnas = huella.columnas_desde_registros(registros, huella.CAMPOS_PAYLOAD)
+    factores = factores_emision.activa()[1]
+    resultado = huella.calcular_lote(columnas, factores)
+
+    # Opcional: {"incertidumbre": {"n": 5000, "semilla": 1, "distribuciones": {...}}}
+    bandas = None
+    opciones_mc = data.get('incertidumbre') if isinstance(data, dict) else None
+    if opciones_mc is not None:
+        if not isinstance(opciones_mc, dict):
+            return jsonify({"status": "error", "message": "'incertidumbre' debe ser un objeto"}), 400
+        try:
+            n, semilla, distribuciones = incertidumbre.parametros(opciones_mc, factores)
+            bandas = incertidumbre.bandas(columnas, n, semilla, distribuciones, factores=factores)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+    resultados = []
+    for i, valido in enumerate(resultado['valido']):
+        if not valido:
+            resultados.append({
+                "indice": i,
+                "valido": False,
+                "error": "Área cultivada y producción deben ser mayores a 0"
+            })
+            continue
+        item = {
+            "indice": i,
+            "valido": True,
+            "desglose": huella.desglose(resultado, i),
+            "indicadores": huella.columnas_calculo(resultado, i),
+        }
+        if bandas is not None:
+            item["incertidumbre"] = incertidumbre.resumen(bandas, i)
+        resultados.append(item)
 
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    search = request.args.get('search', '').strip()
+    validos = resultado['valido']
+    resumen = {cat: round(float(resultado[cat][validos].sum()), 2) for cat in huella.CATEGORIAS}
+    resumen['total'] = round(float(resultado['total'][validos].sum()), 2)
 
-    query = CalculoEUDR.query.filter_by(user_id=session['user_id'])
+    return jsonify({
+        "status": "success",
+        "procesados": len(registros),
+        "validos": int(validos.sum()),
+        "resumen": resumen,
+        "resultados": resultados
+    })
 
-    # Filtro por fecha: si viene una fecha ISO (YYYY-MM-DD), filtrar por ese día
-    if search:
-        try:
-            # Validar formato YYYY-MM-DD
-            search_date = datetime.strptime(search, '%Y-%m-%d').date()
-            # Filtrar por la fecha completa (sin hora)
-            query = query.filter(func.date(CalculoEUDR.fecha) == search_date)
-        except ValueError:
-            # Si no es una fecha válida, no aplicar filtro
-            pass
+# === SINCRONIZACIÓN OFFLINE (app de campo) ===
+@api.route('/api/v1/historial/sync', methods=['POST'])
+@login_required
+def api_v1_historial_sync():
+    """
+    Recibe {"items": [{"clave": "<uuid>", ...campos de /api/historial}]}.
+    Inserta los nuevos en una transacción y salta las claves ya guardadas.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "error": "Se requiere una lista de cálculos en 'items'"}), 400
+    if len(items) > sincronizar.SYNC_MAXIMO:
+        return jsonify({"success": False, "error": f"Máximo {sincronizar.SYNC_MAXIMO} cálculos por sincronización"}), 413
+
+    try:
+        resultados = sincronizar.sincronizar(session['user_id'], items)
+    except Exception:
+        current_app.logger.exception("Error en sincronización (usuario %s)", session['user_id'])
+        return jsonify({"success": False, "error": "Error al sincronizar"}), 500
+
+    resumen = {estado: 0 for estado in (sincronizar.CREADO, sincronizar.EXISTENTE, sincronizar.ERROR)}
+    for r in resultados:
+        resumen[r['estado']] += 1
+    return jsonify({"success": True, "data": {"items": resultados, "resumen": resumen}})
+
+# === IMPORTACIÓN MASIVA (CSV / Excel) ===
+@api.route('/api/historial/importar', methods=['POST'])
+@login_required
+def importar_historial():
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        return jsonify({"status": "error", "message": "No se envió archivo"}), 400
+    if not archivo.filename.lower().endswith(('.csv', '.txt', '.xlsx', '.xlsm')):
+        return jsonify({"status": "error", "message": "Formato no permitido (CSV o Excel)"}), 400
+
+    try:
+        filas = importador.leer_filas(archivo.stream, archivo.filename)
+        reporte = importador.importar(filas, user_id=session['user_id'], forzar_usuario=True)
+    except RuntimeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception:
+        current_app.logger.exception("Error en importación de %s (usuario %s)", archivo.filename, session['user_id'])
+        return jsonify({"status": "error", "message": "Error al importar el archivo"}), 500
+
+    return jsonify({"status": "success", **reporte})
+
+@api.cli.command('importar-calculos')
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--usuario', help='Username para las filas sin username/user_id')
+@click.option('--lote', default=importador.TAMANO_LOTE, show_default=True, help='Filas por transacción')
+def importar_calculos_cli(ruta, usuario, lote):
+    """Importa cálculos EUDR desde un CSV o Excel."""
+    user_id = None
+    if usuario:
+        user_id = db.session.query(User.id).filter_by(username=usuario).scalar()
+        if user_id is None:
+            raise click.ClickException(f"Usuario no encontrado: {usuario}")
+
+    with open(ruta, 'rb') as f:
+        reporte = importador.importar(importador.leer_filas(f, ruta), user_id=user_id, tamano_lote=lote)
+
+    for error in reporte['errores']:
+        click.echo(f"Fila {error['fila']}: {error['error']}", err=True)
+    click.echo(
+        f"{reporte['insertadas']} insertadas, {reporte['con_error']} con error, "
+        f"{reporte['procesadas']} procesadas en {reporte['segundos']} s "
+        f"({reporte['filas_por_segundo']} filas/s)"
+    )
+
+@api.cli.command('migrar')
+def migrar_cli():
+    """Aplica las migraciones pendientes del esquema."""
+    migraciones.migrar(log=click.echo)
+
+# === FACTORES DE EMISIÓN (versionados) ===
+@api.route('/api/v1/factores', methods=['GET'])
+@login_required
+def api_v1_factores():
+    """Versión activa de los factores (la que usa el servidor al guardar) y las demás versiones."""
+    versiones = VersionFactores.query.order_by(VersionFactores.id).all()
+    activa = next((v for v in versiones if v.activa), None)
+    return jsonify({
+        "success": True,
+        "data": {
+            "activa": factores_emision.describir(activa) if activa else None,
+            "versiones": [{"id": v.id, "nombre": v.nombre, "activa": v.activa} for v in versiones],
+        }
+    })
+
+@api.cli.command('factores-nueva-version')
+@click.argument('nombre')
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--descripcion', help='Origen o motivo del cambio')
+@click.option('--activar', is_flag=True, help='Usarla desde ya para los cálculos nuevos')
+def factores_nueva_version_cli(nombre, ruta, descripcion, activar):
+    """Crea una versión con los factores del JSON RUTA sobre los de la versión activa."""
+    with open(ruta, encoding='utf-8') as f:
+        cambios = json.load(f)
+    try:
+        version = factores_emision.crear(nombre, cambios, descripcion, activar_ya=activar)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Versión {version.id} ({version.nombre}){' activa' if version.activa else ''}")
+
+@api.cli.command('factores-activar')
+@click.argument('version')
+def factores_activar_cli(version):
+    """Activa una versión (id o nombre) para los cálculos nuevos."""
+    encontrada = factores_emision.buscar(version)
+    if encontrada is None:
+        raise click.ClickException(f"Versión no encontrada: {version}")
+    factores_emision.activar(encontrada)
+    click.echo(f"Versión {encontrada.id} ({encontrada.nombre}) activa")
+
+@api.cli.command('recalcular-historial')
+@click.option('--version', 'version', help='Id o nombre de la versión (por defecto, la activa)')
+@click.option('--lote', default=5000, show_default=True, help='Cálculos por bloque')
+@click.option('--procesos', type=int, help='Procesos de cálculo (por defecto, los núcleos)')
+@click.option('--reiniciar', is_flag=True, help='Empezar de cero aunque haya un recálculo a medias')
+@click.option('--sin-agregados', is_flag=True, help='No reconstruir tendencias ni benchmark al terminar')
+def recalcular_historial_cli(version, lote, procesos, reiniciar, sin_agregados):
+    """Recalcula todo el historial con una versión de factores; se retoma si se interrumpe."""
+    encontrada = factores_emision.buscar(version) if version else factores_emision.activa()[0]
+    if encontrada is None:
+        raise click.ClickException(f"Versión no encontrada: {version or 'activa'}")
+
+    click.echo(f"Recalculando con la versión {encontrada.id} ({encontrada.nombre})")
+    trabajo = recalcular.recalcular(encontrada, tamano_lote=lote, procesos=procesos,
+                                    reiniciar=reiniciar, log=click.echo)
+    click.echo(f"Listo: {trabajo.procesados} recalculados, {trabajo.omitidos} omitidos")
+
+    # Los agregados guardan valores calculados con los factores anteriores
+    if not sin_agregados:
+        tendencias.reconstruir(tamano_lote=lote, log=lambda _: None)
+        benchmark.reconstruir(tamano_lote=lote, log=lambda _: None)
+        click.echo("Tendencias y benchmark reconstruidos")
+
+# === POLÍGONOS DE LA FINCA Y VERIFICACIÓN DE BOSQUE (EUDR) ===
+def _finca_actual():
+    user = usuario_actual()
+    return user.finca_id if user else None
+
+@api.route('/api/v1/finca/poligonos', methods=['GET'])
+@login_required
+def api_v1_finca_poligonos():
+    """Polígonos de la finca del usuario (FeatureCollection) y su última verificación."""
+    finca_id = _finca_actual()
+    if finca_id is None:
+        return jsonify({"success": False, "error": "El usuario no tiene finca asociada"}), 404
+    poligonos = PoligonoFinca.query.filter_by(finca_id=finca_id).order_by(PoligonoFinca.id).all()
+    verificacion = bosque.vigentes([session['user_id']]).get(session['user_id'])
+    return jsonify({
+        "success": True,
+        "data": {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "id": p.id,
+                "geometry": json.loads(p.geojson),
+                "properties": {"nombre": p.nombre, "area_ha": round(p.area_ha, 4)},
+            } for p in poligonos],
+            "verificacion": verificacion.to_dict() if verificacion else None,
+        }
+    })
 
-    paginated = query.order_by(CalculoEUDR.fecha.desc()) \
-                    .paginate(page=page, per_page=per_page, error_out=False)
+@api.route('/api/v1/finca/poligonos', methods=['PUT'])
+@login_required
+def api_v1_finca_poligonos_guardar():
+    """Reemplaza los polígonos de la finca (GeoJSON en lon/lat) y la verifica si hay raster."""
+    finca_id = _finca_actual()
+    if finca_id is None:
+        return jsonify({"success": False, "error": "El usuario no tiene finca asociada"}), 404
+    try:
+        leidos = geometria.leer(request.get_json(silent=True))
+    except geometria.GeometriaInvalida as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    filas = bosque.guardar_poligonos(finca_id, leidos)
+    db.session.commit()
+    # Otras fincas con parcelas en la misma zona: el técnico revisa si hay conflicto
+    superpuestos = bosque.superpuestos(finca_id, filas)
 
+    verificacion = None
+    try:
+        verificacion = bosque.verificar([finca_id], procesos=1, log=lambda _: None)[0].to_dict()
+    except (RuntimeError, IndexError):
+        pass   # sin raster local: se verifica después con `flask bosque-verificar`
     return jsonify({
-        'items': [c.to_dict() for c in paginated.items],
-        'total': paginated.total,
-        'pages': paginated.pages,
-        'page': page
+        "success": True,
+        "data": {
+            "poligonos": len(filas),
+            "area_ha": round(sum(f.area_ha for f in filas), 4),
+            "posibles_superposiciones": [{"poligono_id": p, "finca_id": f} for p, f in superpuestos],
+            "verificacion": verificacion,
+        }
+    })
+
+@api.cli.command('fincas-importar-poligonos')
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+def fincas_importar_poligonos_cli(ruta):
+    """Importa un FeatureCollection con la propiedad 'codigo' (código de asociado) o 'finca_id'."""
+    with open(ruta, encoding='utf-8') as f:
+        try:
+            leidos = geometria.leer(f.read())
+        except geometria.GeometriaInvalida as e:
+            raise click.ClickException(str(e))
+
+    por_finca, sin_finca = {}, 0
+    codigos = {f.codigo_original: f.id for f in Finca.query.with_entities(Finca.id, Finca.codigo_original)}
+    for poligonos, propiedades in leidos:
+        finca_id = propiedades.get('finca_id') or codigos.get(propiedades.get('codigo'))
+        if finca_id is None:
+            sin_finca += 1
+            continue
+        por_finca.setdefault(int(finca_id), []).append((poligonos, propiedades))
+    for finca_id, suyos in por_finca.items():
+        bosque.guardar_poligonos(finca_id, suyos)
+    db.session.commit()
+    click.echo(f"{sum(map(len, por_finca.values()))} polígonos de {len(por_finca)} fincas"
+               + (f"; {sin_finca} sin finca reconocida" if sin_finca else ""))
+
+@api.cli.command('bosque-importar-raster')
+@click.argument('capa', type=click.Choice(bosque.CAPAS))
+@click.argument('geotiff', type=click.Path(exists=True, dir_okay=False))
+@click.option('--destino', help='Carpeta del raster (por defecto BOSQUE_RASTER_DIR)')
+@click.option('--tile', default=bosque.TILE, show_default=True, help='Píxeles por lado de cada tile')
+@click.option('--fraccion', is_flag=True, help='Valores 0-1 (bosque sí/no) en lugar de % 0-100')
+def bosque_importar_raster_cli(capa, geotiff, destino, tile, fraccion):
+    """Corta un GeoTIFF (EPSG:4326) en tiles para la verificación sin conexión."""
+    try:
+        bosque.importar_raster(geotiff, capa, destino=destino, tile=tile, fraccion=fraccion, log=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+@api.cli.command('bosque-verificar')
+@click.option('--finca', 'fincas', multiple=True, type=int, help='Id de finca (repetible; por defecto, todas)')
+@click.option('--procesos', type=int, help='Procesos de medición (por defecto, los núcleos)')
+def bosque_verificar_cli(fincas, procesos):
+    """Mide la deforestación desde 2020 dentro de los polígonos de las fincas."""
+    try:
+        verificaciones = bosque.verificar(list(fincas) or None, procesos=procesos, log=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    con_perdida = [v for v in verificaciones if v.deforestacion_porc > 0]
+    click.echo(f"{len(verificaciones)} fincas verificadas, {len(con_perdida)} con pérdida de bosque desde 2020")
+    for v in con_perdida:
+        click.echo(f"  finca {v.finca_id}: {v.bosque_base_ha:.2f} → {v.bosque_actual_ha:.2f} ha "
+                   f"({v.deforestacion_porc:.2f}% del área)")
+
+# === OBTENER HISTORIAL ===
+@api.route('/api/historial', methods=['GET'])
+@login_required
+@cache_respuestas.cacheada(espacio_historial)
+def obtener_historial():
+    try:
+        pagina = historial.pagina(session['user_id'], request.args, per_page_defecto=10)
+    except busqueda.FiltroInvalido as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except ValueError:
+        return jsonify({"status": "error", "message": "Parámetros de fecha o cursor inválidos"}), 400
+
+    return serializacion.respuesta({
+        'items': serializacion.objetos(serializacion.COLUMNAS, pagina['items']),
+        'total': pagina['total'],
+        'pages': pagina['pages'],
+        'page': pagina['page'],
+        'next_cursor': pagina['next_cursor']
     })
 
 # === NUEVA API: /api/v1/historial ===
-@app.route('/api/v1/historial', methods=['GET'])
+@api.route('/api/v1/historial', methods=['GET'])
 @login_required
+@cache_respuestas.cacheada(espacio_historial)
 def api_v1_historial():
     """
-    Obtener historial de cálculos del usuario con paginación y filtro por fecha.
-    Compatible con MSSQL.
+    Obtener historial de cálculos del usuario con paginación por cursor
+    (?after=<fecha,id>) o por página, filtros de fecha search/month/from/to
+    y los de busqueda.py (finca, tipo_procesamiento, tipo_fertilizante,
+    huella_min/max, area_min/max).
+    ?fields=a,b limita las columnas y ?format=columnar devuelve
+    {"columns": [...], "rows": [[...]]} en lugar de una lista de objetos.
     """
-    # Parámetros de query
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 6, type=int)
-    search = request.args.get('search', '').strip()
+    forma = request.args.get('format', 'objetos')
+    if forma not in serializacion.FORMAS:
+        return jsonify({"success": False, "error": "format debe ser 'objetos' o 'columnar'"}), 400
+    try:
+        columnas = serializacion.columnas_pedidas(request.args.get('fields', ''))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        pagina = historial.pagina(session['user_id'], request.args, per_page_defecto=6, columnas=columnas)
+    except busqueda.FiltroInvalido as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except ValueError:
+        return jsonify({"success": False, "error": "Parámetros de fecha o cursor inválidos"}), 400
+
+    if forma == 'columnar':
+        data = serializacion.columnar(columnas, pagina['items'])
+    else:
+        data = {"items": serializacion.objetos(columnas, pagina['items'])}
+    data["pagination"] = {
+        "page": pagina['page'],
+        "per_page": pagina['per_page'],
+        "total": pagina['total'],
+        "total_exacto": pagina['total_exacto'],
+        "pages": pagina['pages'],
+        "has_next": pagina['has_next'],
+        "has_prev": pagina['has_prev'],
+        "next_cursor": pagina['next_cursor']
+    }
+    return serializacion.respuesta({"success": True, "data": data})
+
+# === EXPORTAR HISTORIAL (CSV / Excel en streaming) ===
+@api.route('/api/v1/historial/export', methods=['GET'])
+@login_required
+def api_v1_historial_export():
+    """Todo el historial del usuario (filtros search/month/from/to), sin paginar."""
+    formato = request.args.get('format', 'csv')
+    if formato not in exportar.FORMATOS:
+        return jsonify({"success": False, "error": "format debe ser 'csv' o 'xlsx'"}), 400
+    try:
+        desde, hasta = historial.rango_fechas(request.args)
+    except ValueError:
+        return jsonify({"success": False, "error": "Parámetros de fecha inválidos"}), 400
+
+    user_id = session['user_id']
+    query = exportar.consulta(user_id, desde, hasta)
+    cuerpo = exportar.generar(formato, exportar.encabezados(user_id), exportar.filas(query))
+    response = current_app.response_class(stream_with_context(cuerpo), mimetype=exportar.FORMATOS[formato])
+    nombre = f"historial-{datetime.now():%Y%m%d}.{formato}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    response.headers['Cache-Control'] = 'private, no-store'
+    response.headers['X-Accel-Buffering'] = 'no'   # que el proxy no acumule la respuesta
+    return response
+
+@api.cli.command('exportar-historial')
+@click.argument('destino', type=click.File('wb'))
+@click.option('--formato', type=click.Choice(list(exportar.FORMATOS)), default='csv', show_default=True)
+@click.option('--usuario', help='Username; sin él se exporta toda la cooperativa')
+@click.option('--desde', type=click.DateTime(['%Y-%m-%d']), help='Fecha inicial (inclusive)')
+@click.option('--hasta', type=click.DateTime(['%Y-%m-%d']), help='Fecha final (inclusive)')
+def exportar_historial_cli(destino, formato, usuario, desde, hasta):
+    """Exporta el historial (de un asociado o de toda la cooperativa) para auditorías EUDR."""
+    user_id = None
+    if usuario:
+        user = User.query.filter_by(username=usuario).first()
+        if not user:
+            raise click.ClickException(f"No existe el usuario '{usuario}'")
+        user_id = user.id
+    if hasta is not None:
+        hasta += timedelta(days=1)
+
+    query = exportar.consulta(user_id, desde, hasta)
+    for parte in exportar.generar(formato, exportar.encabezados(user_id), exportar.filas(query)):
+        destino.write(parte)
+    click.echo(f"Historial exportado a {destino.name}")
+
+# === TENDENCIAS (agregados por mes / temporada) ===
+@api.route('/api/v1/tendencias', methods=['GET'])
+@login_required
+def api_v1_tendencias():
+    tipo = request.args.get('periodo', 'mes')
+    if tipo not in tendencias.TIPOS_PERIODO:
+        return jsonify({"success": False, "error": "periodo debe ser 'mes' o 'temporada'"}), 400
+
+    series = tendencias.serie(session['user_id'], tipo, request.args.get('finca'))
+    return jsonify({
+        "success": True,
+        "data": {
+            "periodo": tipo,
+            "metricas": list(tendencias.METRICAS),
+            "series": series
+        }
+    })
 
-    # Query base
+@api.cli.command('reconstruir-tendencias')
+@click.option('--lote', default=5000, show_default=True, help='Cálculos por bloque')
+def reconstruir_tendencias_cli(lote):
+    """Recalcula tendencias_calculo desde todo el historial."""
+    total = tendencias.reconstruir(tamano_lote=lote, log=click.echo)
+    click.echo(f"Tendencias reconstruidas a partir de {total} cálculos")
+
+# === BENCHMARK COOPERATIVO (percentiles) ===
+@api.route('/api/v1/benchmark', methods=['GET'])
+@login_required
+def api_v1_benchmark():
+    """Posición de un cálculo (por defecto el último) frente a la cooperativa."""
+    calculo_id = request.args.get('calculo_id', type=int)
     query = CalculoEUDR.query.filter_by(user_id=session['user_id'])
+    if calculo_id:
+        calculo = query.filter_by(id=calculo_id).first()
+    else:
+        calculo = query.order_by(CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc()).first()
+    if calculo is None:
+        return jsonify({"success": False, "error": "No hay cálculos para comparar"}), 404
 
-    # Filtro por fecha si viene search
-    if search:
-        try:
-            fecha = datetime.strptime(search, '%Y-%m-%d').date()
-            # Usar cast para MSSQL
-            query = query.filter(cast(CalculoEUDR.fecha, Date) == fecha)
-        except ValueError:
-            pass  # Fecha inválida → ignorar
-
-    # Paginación
-    paginated = query.order_by(CalculoEUDR.fecha.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    temporada = request.args.get('temporada', benchmark.TODAS)
+    if temporada == 'actual':
+        temporada = tendencias.temporada(calculo.fecha)
 
     return jsonify({
         "success": True,
         "data": {
-            "items": [c.to_dict() for c in paginated.items],
-            "pagination": {
-                "page": page,
-                "per_page": per_page,
-                "total": paginated.total,
-                "pages": paginated.pages,
-                "has_next": paginated.has_next,
-                "has_prev": paginated.has_prev
-            }
+            "calculo_id": calculo.id,
+            "temporada": temporada,
+            "metricas": benchmark.posicion(calculo, temporada)
         }
     })
 
-@app.route('/api/noticias', methods=['GET'])
-def api_noticias():
+# === ESCENARIOS DE REDUCCIÓN (¿qué pasaría si…?) ===
+@api.route('/api/v1/escenarios/<int:calculo_id>', methods=['GET'])
+@login_required
+def api_v1_escenarios(calculo_id):
+    """
+    Evalúa todas las combinaciones de intervenciones sobre un cálculo guardado
+    y las ordena por reducción de kg CO₂e por kg. ?top=, ?max_cambios= y
+    ?<palanca>=v1,v2 para cambiar las opciones de cada palanca.
+    """
+    calculo = CalculoEUDR.query.filter_by(id=calculo_id, user_id=session['user_id']).first()
+    if calculo is None:
+        return jsonify({"success": False, "error": "Cálculo no encontrado"}), 404
+
+    top = max(1, min(request.args.get('top', 10, type=int), 100))
+    max_cambios = request.args.get('max_cambios', type=int)
     try:
-        url = "https://soppexcca.org.ni/noticias"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
-        }
+        opciones = escenarios.opciones_desde_args(request.args)
+        factores = factores_emision.por_fila([calculo.factores_version_id])
+        data = escenarios.evaluar(calculo.to_dict(), opciones, top=top, max_cambios=max_cambios, factores=factores)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        noticias = []
-        articles = soup.find_all('article', class_='post')
-
-        if not articles:
-            print("No se encontraron artículos.")
-            return jsonify([]), 200
-
-        for article in articles:
-            # Título y enlace
-            title_tag = article.select_one('.entry-title a')
-            title = title_tag.get_text(strip=True) if title_tag else "Sin título"
-            link = title_tag['href'] if title_tag else ""
-
-            # Fecha
-            date_tag = article.select_one('time.entry-date')
-            date = date_tag.get_text(strip=True) if date_tag else "Sin fecha"
-
-            # Snippet
-            snippet_tag = article.select_one('.entry-content p')
-            snippet = snippet_tag.get_text(strip=True) if snippet_tag else ""
-
-            # Imagen destacada
-            img_tag = article.select_one('.post-thumbnail img')
-            image = ""
-            if img_tag and img_tag.get('src'):
-                image = img_tag['src']
-                # Opcional: usar srcset para mejor calidad
-                if img_tag.get('srcset'):
-                    # Tomar la última (más grande)
-                    srcset = img_tag['srcset'].split(',')[-1].strip().split(' ')[0]
-                    image = srcset
-            else:
-                image = ""
-
-            noticias.append({
-                "title": title,
-                "date": date,
-                "snippet": snippet,
-                "url": link,
-                "image": image  # Aquí va la URL de la imagen
-            })
+    data["calculo_id"] = calculo.id
+    return jsonify({"success": True, "data": data})
+
+# === INCERTIDUMBRE (Monte Carlo) ===
+@api.route('/api/v1/incertidumbre/<int:calculo_id>', methods=['GET'])
+@login_required
+def api_v1_incertidumbre(calculo_id):
+    """
+    Bandas p5/p50/p95 de la huella de un cálculo guardado, muestreando los
+    factores de emisión de su versión. ?n= muestras (5000 por defecto) y ?semilla= para
+    reproducir el mismo resultado.
+    """
+    calculo = CalculoEUDR.query.filter_by(id=calculo_id, user_id=session['user_id']).first()
+    if calculo is None:
+        return jsonify({"success": False, "error": "Cálculo no encontrado"}), 404
+
+    # Factores de la versión con que se calculó (la 'base' si no tiene)
+    factores = factores_emision.por_fila([calculo.factores_version_id])
+    columnas = huella.columnas_desde_registros([calculo.to_dict()])
+    if not huella.calcular_lote(columnas, factores)['valido'][0]:
+        return jsonify({"success": False, "error": "El cálculo no tiene área y producción válidas"}), 400
+    try:
+        n, semilla, distribuciones = incertidumbre.parametros(request.args, factores)
+        bandas = incertidumbre.bandas(columnas, n, semilla, distribuciones, factores=factores)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-        return jsonify(noticias), 200
+    return jsonify({
+        "success": True,
+        "data": {
+            "calculo_id": calculo.id,
+            "muestras": n,
+            "semilla": semilla,
+            "huella_total": calculo.huella_total,
+            "huella_por_kg": calculo.huella_por_kg,
+            "percentiles": incertidumbre.resumen(bandas, 0),
+        }
+    })
 
-    except requests.RequestException as e:
+@api.cli.command('reconstruir-benchmark')
+@click.option('--lote', default=5000, show_default=True, help='Cálculos por bloque')
+def reconstruir_benchmark_cli(lote):
+    """Recalcula los sketches de benchmark desde todo el historial."""
+    total = benchmark.reconstruir(tamano_lote=lote, log=click.echo)
+    click.echo(f"Benchmark reconstruido a partir de {total} cálculos")
+
+@api.route('/api/noticias', methods=['GET'])
+def api_noticias():
+    try:
+        lista, estado = noticias.cache.obtener()
+    except noticias.ErrorRed as e:
         print("Error de red:", e)
         return jsonify({"error": "No se pudo conectar al sitio"}), 502
-
     except Exception as e:
         print("Error inesperado:", e)
         return jsonify({"error": "Error al procesar los datos"}), 500
 
-@app.route('/api/total-usuarios')
+    if not lista:
+        print("No se encontraron artículos.")
+
+    response = jsonify(lista)
+    response.headers['X-Cache'] = estado
+    response.headers['Cache-Control'] = f"public, max-age={noticias.cache.ttl}"
+    return response, 200
+
+@api.route('/api/total-usuarios')
+@cache_respuestas.cacheada(espacio_usuarios, publica=True)
 def total_usuarios():
     try:
         total = User.query.count()
@@ -396,11 +941,14 @@ def total_usuarios():
         print("Error al contar usuarios:", e)
         return jsonify({"total": 0}), 500
     
-@app.route('/')
+@api.route('/')
 def home():
     return jsonify({"mensaje": "API funcionando correctamente"})
 
+# Instancia para `gunicorn app:app` y `flask --app app`; crearla no abre conexiones
+app = create_app()
+
 # --- INICIAR ---
 if __name__ == '__main__':
     print("API corriendo en http://localhost:5000")
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000)
@@ -0,0 +1,104 @@
+# backend/asgi.py
+"""
+Modo ASGI de la API:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+
+Las vistas de Flask son las mismas y cada petición corre en un hilo de un
+pool propio del worker (ASGI_HILOS). WsgiToAsgi de asgiref, tal cual, las
+manda todas a un único hilo (thread_sensitive=True): una consulta lenta
+frenaba el login del mismo worker. Lo que espera a servicios externos se resuelve
+antes, en el event loop, con un httpx.AsyncClient compartido (conexiones
+reutilizadas): para /api/noticias la caché se llena con
+noticias.cache.preparar_async y la vista solo la lee. Un sitio lento deja
+corrutinas esperando, no hilos ni workers, así login y guardar siguen
+respondiendo.
+
+Con gunicorn (sync) la app se sigue sirviendo como siempre desde app:app.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import app as flask_app
+import noticias
+
+HILOS = int(os.getenv("ASGI_HILOS", 16))   # peticiones de Flask a la vez por worker (≈ hilos de gunicorn)
+
+_hilos = None
+
+
+def _pool():
+    global _hilos
+    if _hilos is None:
+        _hilos = ThreadPoolExecutor(HILOS, thread_name_prefix='wsgi')
+    return _hilos
+
+
+class _Instancia(WsgiToAsgiInstance):
+    # El cuerpo síncrono de asgiref (environ, start_response, envío), sin su sync_to_async
+    _correr = WsgiToAsgiInstance.__dict__['run_wsgi_app'].__wrapped__
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._correr, thread_sensitive=False, executor=_pool())(body)
+
+
+class WsgiEnHilos(WsgiToAsgi):
+    """WsgiToAsgi con cada petición en un hilo del pool, no todas en el mismo."""
+
+    async def __call__(self, scope, receive, send):
+        await _Instancia(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+noticias.cache.modo_async = True
+_wsgi = WsgiEnHilos(flask_app)
+_cliente = None
+
+
+def cliente():
+    """httpx.AsyncClient del worker (se crea en el event loop que lo usa)."""
+    global _cliente
+    if _cliente is None:
+        _cliente = httpx.AsyncClient(
+            timeout=noticias.TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=5),
+            follow_redirects=True,
+        )
+    return _cliente
+
+
+# Ruta → corrutina que hace el I/O externo antes de pasarle la petición a Flask
+PREPARAR = {
+    '/api/noticias': lambda: noticias.cache.preparar_async(cliente()),
+}
+
+
+async def _lifespan(receive, send):
+    global _cliente, _hilos
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            if _cliente is not None:
+                await _cliente.aclose()
+                _cliente = None
+            if _hilos is not None:
+                _hilos.shutdown(wait=False)
+                _hilos = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        preparar = PREPARAR.get(scope['path'])
+        if preparar is not None:
+            await preparar()
+    await _wsgi(scope, receive, send)
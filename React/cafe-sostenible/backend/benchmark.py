@@ -0,0 +1,222 @@
+# backend/benchmark.py
+"""
+Comparación de cada finca con el resto de SOPPEXCCA (p10/p50/p90).
+
+Cada métrica se resume en un sketch de cuantiles con cubetas logarítmicas
+(estilo DDSketch): el valor v cae en la cubeta ceil(log(v) / log(γ)), con
+error relativo ≤ ALPHA en los cuantiles. Los sketches son mezclables (se
+suman los conteos) y se guardan en benchmark_buckets como filas
+(métrica, temporada, cubeta, conteo) que cada inserción incrementa.
+Consultar un percentil lee solo las cubetas, no calculos_eudr.
+"""
+import math
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+
+from models import db, BenchmarkBucket, CalculoEUDR
+import huella
+import factores_emision
+import tendencias
+
+ALPHA = 0.01                      # error relativo de los cuantiles
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+LOG_GAMMA = math.log(GAMMA)
+MINIMO = 1e-9                     # valores menores van a la cubeta cero
+CUBETA_CERO = -(2 ** 31)
+
+TODAS = 'todas'                   # sketch de todas las temporadas
+METRICAS = ('huella_por_kg',) + huella.CATEGORIAS   # todo en kg CO₂e / kg café
+CUANTILES = (0.10, 0.50, 0.90)
+
+
+def cubetas(valores):
+    """Índice de cubeta de cada valor (vectorizado)."""
+    v = np.asarray(valores, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        idx = np.ceil(np.log(v) / LOG_GAMMA)
+    return np.where(v > MINIMO, idx, CUBETA_CERO).astype(np.int64)
+
+
+def valor_cubeta(indice):
+    if indice == CUBETA_CERO:
+        return 0.0
+    return 2 * GAMMA ** indice / (GAMMA + 1)
+
+
+class Sketch:
+    def __init__(self, conteos=None):
+        self.conteos = dict(conteos or {})
+
+    @property
+    def n(self):
+        return sum(self.conteos.values())
+
+    def agregar(self, valores):
+        idx, cuenta = np.unique(cubetas(valores), return_counts=True)
+        for i, c in zip(idx.tolist(), cuenta.tolist()):
+            self.conteos[i] = self.conteos.get(i, 0) + c
+
+    def mezclar(self, otro):
+        for i, c in otro.conteos.items():
+            self.conteos[i] = self.conteos.get(i, 0) + c
+
+    def cuantil(self, q):
+        total = self.n
+        if not total:
+            return None
+        objetivo = q * (total - 1)
+        acumulado = 0
+        for i in sorted(self.conteos):
+            acumulado += self.conteos[i]
+            if acumulado > objetivo:
+                return valor_cubeta(i)
+        return valor_cubeta(max(self.conteos))
+
+    def percentil(self, valor):
+        """Posición (0-100) de `valor` dentro de la distribución."""
+        total = self.n
+        if not total:
+            return None
+        cubeta = int(cubetas([valor])[0])
+        debajo = sum(c for i, c in self.conteos.items() if i < cubeta)
+        igual = self.conteos.get(cubeta, 0)
+        return round(100 * (debajo + igual / 2) / total, 1)
+
+
+# --- VALORES POR MÉTRICA ---
+def valores_lote(resultado, columnas):
+    """Métricas por kg de café de un resultado de huella.calcular_lote."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        produccion = np.asarray(columnas['produccion_verde'], dtype=float)
+        valores = {'huella_por_kg': resultado['por_kg']}
+        for cat in huella.CATEGORIAS:
+            valores[cat] = resultado[cat] / produccion
+    return valores
+
+
+def valores_calculo(indicadores, desglose, produccion):
+    """Métricas por kg de café de un único cálculo (huella.calcular)."""
+    valores = {'huella_por_kg': [indicadores['huella_por_kg']]}
+    for cat in huella.CATEGORIAS:
+        valores[cat] = [desglose[cat] / produccion]
+    return valores
+
+
+# --- PERSISTENCIA ---
+def _deltas(fechas, valores):
+    """Suma {(métrica, temporada, cubeta): conteo} para la temporada de cada fila y para TODAS."""
+    temporadas = [tendencias.temporada(f) for f in fechas]
+    deltas = {}
+    for metrica in METRICAS:
+        v = np.asarray(valores[metrica], dtype=float)
+        for cubeta, temporada, valido in zip(cubetas(v).tolist(), temporadas, np.isfinite(v).tolist()):
+            if not valido:
+                continue
+            for clave in ((metrica, temporada, cubeta), (metrica, TODAS, cubeta)):
+                deltas[clave] = deltas.get(clave, 0) + 1
+    return deltas
+
+
+def _aplicar(deltas, tamano_in=500):
+    """Incrementa las cubetas: se consulta cuáles existen y se hace un UPDATE y un INSERT por lote."""
+    if not deltas:
+        return
+    t = BenchmarkBucket.__table__
+    temporadas = sorted({tmp for _, tmp, _ in deltas})
+    indices = sorted({i for _, _, i in deltas})
+    existentes = set()
+    for inicio in range(0, len(indices), tamano_in):
+        filas = db.session.query(BenchmarkBucket.metrica, BenchmarkBucket.temporada, BenchmarkBucket.indice) \
+            .filter(BenchmarkBucket.temporada.in_(temporadas),
+                    BenchmarkBucket.indice.in_(indices[inicio:inicio + tamano_in]))
+        existentes.update(tuple(f) for f in filas)
+
+    actualizar = [{'m': m, 't': tmp, 'i': i, 'c': c} for (m, tmp, i), c in deltas.items() if (m, tmp, i) in existentes]
+    insertar = [{'metrica': m, 'temporada': tmp, 'indice': i, 'conteo': c}
+                for (m, tmp, i), c in deltas.items() if (m, tmp, i) not in existentes]
+
+    sumar = t.update().where(
+        t.c.metrica == db.bindparam('m'), t.c.temporada == db.bindparam('t'), t.c.indice == db.bindparam('i'),
+    ).values(conteo=t.c.conteo + db.bindparam('c'))
+    if actualizar:
+        db.session.execute(sumar, actualizar)
+    if insertar:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(t.insert(), insertar)
+        except IntegrityError:
+            # Otra petición creó alguna cubeta a la vez: se reintenta fila por fila
+            for fila in insertar:
+                params = {'m': fila['metrica'], 't': fila['temporada'], 'i': fila['indice'], 'c': fila['conteo']}
+                if not db.session.execute(sumar, params).rowcount:
+                    db.session.execute(t.insert().values(fila))
+
+
+def registrar(fechas, valores):
+    """Agrega las métricas de un lote a los sketches. No hace commit."""
+    _aplicar(_deltas(fechas, valores))
+
+
+def cargar(temporada=TODAS, metricas=METRICAS):
+    """Sketches de la temporada; solo lee las cubetas (acotadas), no el historial."""
+    sketches = {m: Sketch() for m in metricas}
+    filas = db.session.query(BenchmarkBucket.metrica, BenchmarkBucket.indice, BenchmarkBucket.conteo) \
+        .filter(BenchmarkBucket.temporada == temporada, BenchmarkBucket.metrica.in_(metricas))
+    for metrica, indice, conteo in filas:
+        sketches[metrica].conteos[indice] = conteo
+    return sketches
+
+
+def posicion(calculo, temporada=TODAS):
+    """Percentil del cálculo y p10/p50/p90 de la cooperativa por métrica."""
+    columnas = huella.columnas_desde_registros([calculo.to_dict()])
+    resultado = huella.calcular_lote(columnas, factores_emision.por_fila([calculo.factores_version_id]))
+    valores = valores_lote(resultado, columnas)
+    sketches = cargar(temporada)
+
+    comparacion = {}
+    for metrica in METRICAS:
+        valor = float(valores[metrica][0])
+        sketch = sketches[metrica]
+        comparacion[metrica] = {
+            "valor": round(valor, 4) if math.isfinite(valor) else None,
+            "percentil": sketch.percentil(valor) if math.isfinite(valor) else None,
+            "n": sketch.n,
+            **{f"p{int(q * 100)}": _redondear(sketch.cuantil(q)) for q in CUANTILES},
+        }
+    return comparacion
+
+
+def _redondear(valor):
+    return round(valor, 4) if valor is not None else None
+
+
+def reconstruir(tamano_lote=5000, log=print):
+    """
+    Recalcula todos los sketches desde calculos_eudr (por bloques de id),
+    hasta el último id que había al borrar: los cálculos que llegan mientras
+    tanto ya los cuenta `registrar`.
+    """
+    columnas_db = [CalculoEUDR.id, CalculoEUDR.fecha, CalculoEUDR.factores_version_id,
+                   *(getattr(CalculoEUDR, c) for c in huella.CAMPOS_NUMERICOS + huella.CAMPOS_TEXTO)]
+    tope = db.session.query(db.func.max(CalculoEUDR.id)).scalar() or 0
+    db.session.query(BenchmarkBucket).delete()
+    db.session.commit()
+
+    ultimo_id, total = 0, 0
+    while True:
+        filas = db.session.query(*columnas_db).filter(CalculoEUDR.id > ultimo_id, CalculoEUDR.id <= tope) \
+            .order_by(CalculoEUDR.id).limit(tamano_lote).all()
+        if not filas:
+            break
+        registros = [fila._asdict() for fila in filas]
+        columnas = huella.columnas_desde_registros(registros)
+        # Cada cálculo con los factores de su versión
+        factores = factores_emision.por_fila(r['factores_version_id'] for r in registros)
+        registrar([r['fecha'] for r in registros], valores_lote(huella.calcular_lote(columnas, factores), columnas))
+        db.session.commit()
+        ultimo_id = filas[-1].id
+        total += len(filas)
+        log(f"{total} cálculos procesados")
+    return total
@@ -0,0 +1,84 @@
+# backend/benchmarks/arranque.py
+"""
+Tiempo de arranque en frío de un worker: desde lanzar el intérprete hasta
+servir la primera respuesta. Cada corrida es un proceso nuevo.
+
+    python benchmarks/arranque.py                         # backend React
+    python benchmarks/arranque.py "../../../Html Css Js/Cafe sostenible/backend" --ruta /
+    python benchmarks/arranque.py --corridas 20 --salida arranque.json
+
+No necesita base de datos: la app no se conecta al importarse.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Lo que corre dentro de cada proceso hijo: importar, crear cliente y pedir la ruta
+HIJO = """
+import time, json, sys
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+respuesta = app.app.test_client().get(sys.argv[1])
+t2 = time.perf_counter()
+print(json.dumps({"importar": t1 - t0, "primera": t2 - t1, "estado": respuesta.status_code,
+                  "modulos": len(sys.modules)}))
+"""
+
+
+def medir(backend, ruta):
+    entorno = dict(os.environ)
+    entorno.setdefault("DATABASE_URL", "sqlite://")   # nunca se abre; solo evita depender de DB_*
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, "-c", HIJO, ruta], cwd=backend, env=entorno,
+                            capture_output=True, text=True, check=True)
+    total = time.perf_counter() - inicio
+    datos = json.loads(salida.stdout.strip().splitlines()[-1])
+    datos["total"] = total
+    return datos
+
+
+def resumen(valores):
+    ordenados = sorted(valores)
+    return {
+        "min_ms": round(ordenados[0] * 1000, 1),
+        "p50_ms": round(statistics.median(ordenados) * 1000, 1),
+        "max_ms": round(ordenados[-1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("backend", nargs="?", default=BACKEND)
+    parser.add_argument("--ruta", default="/")
+    parser.add_argument("--corridas", type=int, default=10)
+    parser.add_argument("--salida", help="archivo JSON (por defecto stdout)")
+    args = parser.parse_args()
+
+    medir(args.backend, args.ruta)   # calienta la caché de bytecode y del sistema de archivos
+    corridas = [medir(args.backend, args.ruta) for _ in range(args.corridas)]
+
+    reporte = {
+        "backend": os.path.abspath(args.backend),
+        "ruta": args.ruta,
+        "corridas": args.corridas,
+        "python": sys.version.split()[0],
+        "estado": corridas[-1]["estado"],
+        "modulos": corridas[-1]["modulos"],
+        **{fase: resumen([c[fase] for c in corridas]) for fase in ("total", "importar", "primera")},
+    }
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+
+if __name__ == "__main__":
+    main()
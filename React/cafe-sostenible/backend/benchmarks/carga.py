@@ -0,0 +1,264 @@
+# backend/benchmarks/carga.py
+"""
+Prueba de carga de la API contra una base SQLite sintética.
+
+Siembra (o reutiliza) una base con `sembrar.py`, levanta la app en un
+proceso aparte con un servidor con hilos y, para cada endpoint, lanza N
+clientes concurrentes durante unos segundos. Reporta p50/p95/p99,
+promedio, máximo, peticiones por segundo y errores en un JSON.
+
+    python benchmarks/carga.py --escala 1000
+    python benchmarks/carga.py --escala 100000 --clientes 16 --salida base.json
+    python benchmarks/carga.py --escala 100000 --salida nuevo.json --comparar base.json
+
+Con --url se mide un servidor ya levantado (p. ej. gunicorn) sembrado
+con la misma escala.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+import sembrar
+
+ESCALAS = (1000, 100000, 1000000)
+
+# Servidor de la app en el proceso hijo: imprime el puerto y atiende con hilos
+SERVIDOR = """
+from werkzeug.serving import make_server
+from app import create_app
+app = create_app({'SESSION_COOKIE_SECURE': False})
+servidor = make_server('127.0.0.1', 0, app, threaded=True)
+print(servidor.port, flush=True)
+servidor.serve_forever()
+"""
+
+
+# --- ESCENARIOS ---
+def _pagina(rng):
+    return int(rng.integers(1, 11))
+
+
+def _payload(rng):
+    area = float(rng.uniform(0.5, 20))
+    return {
+        'nombreFinca': 'Finca bench',
+        'areaCultivada': area,
+        'produccionVerde': area * float(rng.uniform(300, 1200)),
+        'fertilizanteTotal': area * float(rng.uniform(0, 400)),
+        'tipoFertilizante': 'sintetico',
+        'energiaElectrica': float(rng.uniform(0, 3000)),
+        'combustibleLitros': float(rng.uniform(0, 500)),
+        'tipoCombustible': 'diesel',
+        'distanciaKm': float(rng.uniform(1, 60)),
+        'volumenCargas': float(rng.uniform(1, 30)),
+        'tipoProcesamiento': 'lavado',
+        'residuosTotales': 1000,
+        'residuosCompostados': 400,
+        'bosqueBase': 2,
+        'bosqueActual': 1.9,
+    }
+
+
+def _login(cliente, rng):
+    usuario = sembrar.username(int(rng.integers(0, cliente.usuarios)))
+    # Sesión nueva: cada login es un inicio de sesión completo
+    return requests.post(cliente.url + '/api/login', data={'username': usuario, 'password': sembrar.CLAVE})
+
+
+ESCENARIOS = {
+    'POST /api/login': _login,
+    'GET /api/user': lambda c, rng: c.get('/api/user'),
+    'GET /api/historial': lambda c, rng: c.get(f'/api/historial?page={_pagina(rng)}'),
+    'GET /api/v1/historial': lambda c, rng: c.get(f'/api/v1/historial?page={_pagina(rng)}'),
+    'POST /api/historial': lambda c, rng: c.post('/api/historial', json=_payload(rng)),
+}
+
+
+class Cliente:
+    """Sesión HTTP autenticada como uno de los usuarios sembrados."""
+    def __init__(self, url, indice, usuarios):
+        self.url = url
+        self.usuarios = usuarios
+        self.sesion = requests.Session()
+        respuesta = self.sesion.post(url + '/api/login', data={
+            'username': sembrar.username(indice % usuarios), 'password': sembrar.CLAVE,
+        })
+        respuesta.raise_for_status()
+
+    def get(self, ruta):
+        return self.sesion.get(self.url + ruta)
+
+    def post(self, ruta, **kwargs):
+        return self.sesion.post(self.url + ruta, **kwargs)
+
+
+def medir(escenario, clientes, duracion, calentamiento, semilla):
+    """Corre el escenario con todos los clientes a la vez; devuelve latencias (s) y errores."""
+    latencias, errores = [], []
+    lock = threading.Lock()
+    arranque = time.perf_counter()
+    fin_calentamiento = arranque + calentamiento
+    fin = fin_calentamiento + duracion
+
+    def trabajar(cliente, rng):
+        propias, fallas = [], 0
+        while True:
+            inicio = time.perf_counter()
+            if inicio >= fin:
+                break
+            try:
+                ok = escenario(cliente, rng).status_code < 400
+            except requests.RequestException:
+                ok = False
+            if inicio >= fin_calentamiento:
+                propias.append(time.perf_counter() - inicio)
+                fallas += not ok
+        with lock:
+            latencias.extend(propias)
+            errores.append(fallas)
+
+    hilos = [threading.Thread(target=trabajar, args=(c, np.random.default_rng(semilla + i)))
+             for i, c in enumerate(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return np.array(latencias), sum(errores)
+
+
+def resumir(latencias, errores, duracion):
+    if not len(latencias):
+        return {"peticiones": 0, "errores": errores}
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000
+    return {
+        "peticiones": int(len(latencias)),
+        "errores": int(errores),
+        "rps": round(len(latencias) / duracion, 1),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "promedio_ms": round(float(latencias.mean() * 1000), 2),
+        "max_ms": round(float(latencias.max() * 1000), 2),
+    }
+
+
+def comparar(actual, anterior, umbral):
+    """Imprime la variación contra una corrida anterior; devuelve los escenarios que empeoraron."""
+    peores = []
+    print(f"\n{'escenario':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}")
+    for nombre, datos in actual["resultados"].items():
+        previo = anterior["resultados"].get(nombre)
+        if not previo or not previo.get("peticiones") or not datos.get("peticiones"):
+            continue
+        cambios = {k: 100 * (datos[k] - previo[k]) / previo[k] for k in ("p50_ms", "p95_ms", "p99_ms", "rps")}
+        print(f"{nombre:<24}" + "".join(f"{cambios[k]:>+9.1f}%" for k in ("p50_ms", "p95_ms", "p99_ms", "rps")))
+        if cambios["p95_ms"] > umbral:
+            peores.append(nombre)
+    return peores
+
+
+# --- PREPARACIÓN ---
+def preparar_base(ruta, escala, por_usuario, semilla, resembrar):
+    """Reutiliza la base si se sembró con los mismos parámetros."""
+    parametros = {"escala": escala, "por_usuario": por_usuario, "semilla": semilla}
+    meta = ruta + '.json'
+    if not resembrar and os.path.exists(ruta) and os.path.exists(meta):
+        with open(meta, encoding='utf-8') as f:
+            guardado = json.load(f)
+        if guardado.get("parametros") == parametros:
+            return guardado["usuarios"]
+    usuarios = sembrar.sembrar(ruta, escala, por_usuario, semilla)
+    with open(meta, 'w', encoding='utf-8') as f:
+        json.dump({"parametros": parametros, "usuarios": usuarios}, f)
+    return usuarios
+
+
+def levantar_servidor(ruta):
+    entorno = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.abspath(ruta)}')
+    proceso = subprocess.Popen([sys.executable, '-c', SERVIDOR], cwd=sembrar.BACKEND, env=entorno,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    puerto = proceso.stdout.readline().strip()
+    if not puerto:
+        proceso.kill()
+        raise RuntimeError("El servidor no arrancó")
+    return proceso, f'http://127.0.0.1:{puerto}'
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=sembrar.BACKEND,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', type=int, default=1000, help=f'cálculos en la base (típico: {ESCALAS})')
+    parser.add_argument('--por-usuario', type=int, default=100)
+    parser.add_argument('--clientes', type=int, default=8, help='clientes concurrentes')
+    parser.add_argument('--duracion', type=float, default=10, help='segundos medidos por escenario')
+    parser.add_argument('--calentamiento', type=float, default=2, help='segundos descartados al inicio')
+    parser.add_argument('--escenarios', nargs='*', choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--db', help='archivo SQLite (por defecto en el directorio temporal)')
+    parser.add_argument('--resembrar', action='store_true')
+    parser.add_argument('--url', help='medir un servidor ya levantado')
+    parser.add_argument('--salida', help='archivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=10, help='%% de aumento de p95 que cuenta como regresión')
+    args = parser.parse_args()
+
+    ruta = args.db or os.path.join(tempfile.gettempdir(), f'cafe-bench-{args.escala}.db')
+    usuarios = preparar_base(ruta, args.escala, args.por_usuario, args.semilla, args.resembrar)
+
+    proceso, url = (None, args.url) if args.url else levantar_servidor(ruta)
+    try:
+        clientes = [Cliente(url, i, usuarios) for i in range(args.clientes)]
+        resultados = {}
+        for nombre in args.escenarios:
+            latencias, errores = medir(ESCENARIOS[nombre], clientes, args.duracion, args.calentamiento, args.semilla)
+            resultados[nombre] = resumir(latencias, errores, args.duracion)
+            print(f"{nombre:<24} {json.dumps(resultados[nombre])}", flush=True)
+    finally:
+        if proceso:
+            proceso.terminate()
+            proceso.wait()
+
+    reporte = {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "escala": args.escala,
+        "usuarios": usuarios,
+        "clientes": args.clientes,
+        "duracion_s": args.duracion,
+        "url": args.url,
+        "resultados": resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            peores = comparar(reporte, json.load(f), args.umbral)
+        if peores:
+            print(f"\nRegresión de p95 > {args.umbral}% en: {', '.join(peores)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
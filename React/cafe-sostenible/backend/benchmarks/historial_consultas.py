@@ -0,0 +1,183 @@
+# backend/benchmarks/historial_consultas.py
+"""
+Compara el armado de las consultas del historial:
+
+- query:   Query del ORM construida en cada petición (camino anterior)
+- armada:  historial.py (select con bindparam armado una vez por forma)
+
+    python benchmarks/historial_consultas.py --calculos 2000 --repeticiones 2000 --salida consultas.json
+
+Para cada escenario mide dos cosas:
+- armar: construir la sentencia y su clave de caché, que es lo que se paga
+  en Python antes de encontrar el SQL compilado (sin tocar la base)
+- pagina: la página completa (conteo + filas) contra una base SQLite chica,
+  para que el tiempo de la base no tape el de Python
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import sembrar
+
+ESCENARIOS = {
+    'pagina1': {'per_page': '10'},
+    'cursor': {'per_page': '10', 'after': None, 'total': 'none'},
+    'filtros': {'per_page': '10', 'tipo_procesamiento': 'lavado', 'huella_min': '0.5', 'huella_max': '20',
+                'month': None},
+}
+
+
+# --- CAMINO ANTERIOR (Query del ORM por petición) ---
+def _query_filtrada(db, CalculoEUDR, serializacion, historial, busqueda, user_id, args):
+    query = serializacion.consulta(user_id)
+    desde, hasta = historial.rango_fechas(args)
+    if desde is not None:
+        query = query.filter(CalculoEUDR.fecha >= desde)
+    if hasta is not None:
+        query = query.filter(CalculoEUDR.fecha < hasta)
+    filtros = busqueda.leer(args)
+    for columna in busqueda.TIPOS:
+        if columna in filtros:
+            query = query.filter(getattr(CalculoEUDR, columna).in_(filtros[columna]))
+    for prefijo, columna in busqueda.RANGOS.items():
+        if f'{prefijo}_min' in filtros:
+            query = query.filter(getattr(CalculoEUDR, columna) >= filtros[f'{prefijo}_min'])
+        if f'{prefijo}_max' in filtros:
+            query = query.filter(getattr(CalculoEUDR, columna) <= filtros[f'{prefijo}_max'])
+    return query, filtros
+
+
+def _ordenada(db, CalculoEUDR, historial, query, args, per_page):
+    ordenada = query.order_by(CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc())
+    if args.get('after'):
+        fecha, ident = historial._leer_cursor(args['after'])
+        ordenada = ordenada.filter(db.or_(
+            CalculoEUDR.fecha < fecha,
+            db.and_(CalculoEUDR.fecha == fecha, CalculoEUDR.id < ident),
+        ))
+    return ordenada.limit(per_page + 1)
+
+
+def _pagina_query(m, user_id, args):
+    db, CalculoEUDR = m['db'], m['CalculoEUDR']
+    query, filtros = _query_filtrada(**_modulos(m), user_id=user_id, args=args)
+    per_page = int(args['per_page'])
+    total = None
+    if args.get('total', 'exact') == 'exact':
+        total = query.order_by(None).count()
+    ordenada = _ordenada(db, CalculoEUDR, m['historial'], query, args, per_page)
+    if filtros:
+        ids = [i for i, in ordenada.with_entities(CalculoEUDR.id)]
+        filas = query.filter(CalculoEUDR.id.in_(ids)) \
+            .order_by(CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc()).all() if ids else []
+    else:
+        filas = ordenada.all()
+    return total, filas[:per_page]
+
+
+def _armar_query(m, user_id, args):
+    query, _ = _query_filtrada(**_modulos(m), user_id=user_id, args=args)
+    ordenada = _ordenada(m['db'], m['CalculoEUDR'], m['historial'], query, args, int(args['per_page']))
+    return ordenada.statement._generate_cache_key()
+
+
+# --- CAMINO NUEVO (historial.py) ---
+def _pagina_armada(m, user_id, args):
+    pagina = m['historial'].pagina(user_id, args, per_page_defecto=10)
+    return pagina['total'], pagina['items']
+
+
+def _armar_armada(m, user_id, args):
+    historial = m['historial']
+    desde, hasta = historial.rango_fechas(args)
+    condiciones, parametros = historial._condiciones(user_id, desde, hasta, m['busqueda'].leer(args))
+    if args.get('after'):
+        parametros['fecha_cursor'], parametros['id_cursor'] = historial._leer_cursor(args['after'])
+    parametros['limite'] = int(args['per_page']) + 1
+    stmt = historial._sentencia_pagina(m['serializacion'].COLUMNAS, condiciones,
+                                       'cursor' if args.get('after') else None)
+    return stmt._generate_cache_key(), parametros
+
+
+def _modulos(m):
+    return {k: m[k] for k in ('db', 'CalculoEUDR', 'serializacion', 'historial', 'busqueda')}
+
+
+CAMINOS = {'query': (_armar_query, _pagina_query), 'armada': (_armar_armada, _pagina_armada)}
+
+
+def _medir(funcion, repeticiones):
+    for _ in range(min(50, repeticiones)):   # calentamiento: cachés de SQLAlchemy llenos
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tiempos) * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calculos', type=int, default=2000)
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    parser.add_argument('--salida', help='archivo JSON de resultados')
+    args = parser.parse_args()
+
+    ruta = os.path.join(tempfile.gettempdir(), 'cafe-bench-consultas.db')
+    sembrar.sembrar(ruta, args.calculos, por_usuario=args.calculos, log=lambda *_: None)
+
+    from werkzeug.datastructures import MultiDict
+    from app import create_app
+    from models import db, CalculoEUDR
+    import busqueda
+    import historial
+    import serializacion
+
+    app = create_app()
+    m = {'db': db, 'CalculoEUDR': CalculoEUDR, 'serializacion': serializacion,
+         'historial': historial, 'busqueda': busqueda}
+    resultados = {}
+    with app.test_request_context():
+        user_id, fecha = db.session.query(CalculoEUDR.user_id, db.func.max(CalculoEUDR.fecha)) \
+            .group_by(CalculoEUDR.user_id).first()
+        for escenario, parametros in ESCENARIOS.items():
+            parametros = dict(parametros)
+            if 'after' in parametros:
+                parametros['after'] = f"{fecha.isoformat()},{2 ** 31}"
+            if 'month' in parametros:
+                parametros['month'] = f"{fecha:%Y-%m}"
+            consulta = MultiDict(parametros)
+
+            # Los dos caminos tienen que devolver lo mismo
+            esperado = _pagina_query(m, user_id, consulta)
+            obtenido = _pagina_armada(m, user_id, consulta)
+            assert esperado[0] == obtenido[0] and [tuple(f) for f in esperado[1]] == [tuple(f) for f in obtenido[1]]
+
+            for camino, (armar, pagina) in CAMINOS.items():
+                resultados[f"{camino}_{escenario}"] = {
+                    "escenario": escenario,
+                    "camino": camino,
+                    "armar_us": _medir(lambda: armar(m, user_id, consulta), args.repeticiones),
+                    "pagina_us": _medir(lambda: pagina(m, user_id, consulta), args.repeticiones // 4 or 1),
+                    "filas": len(obtenido[1]),
+                }
+            antes, despues = resultados[f"query_{escenario}"], resultados[f"armada_{escenario}"]
+            for clave in ('armar_us', 'pagina_us'):
+                despues[clave.replace('_us', '_aceleracion')] = round(antes[clave] / despues[clave], 2)
+            for r in (antes, despues):
+                print(f"{escenario:<8} {r['camino']:<7} armar {r['armar_us']:>8.1f} µs  "
+                      f"página {r['pagina_us']:>8.1f} µs")
+
+    reporte = {"calculos": args.calculos, "repeticiones": args.repeticiones, "resultados": resultados}
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# backend/benchmarks/serializacion.py
+"""
+Compara la serialización de una página de historial:
+
+- orm:       objetos CalculoEUDR + to_dict() + jsonify (camino anterior)
+- objetos:   tuplas de columnas + dict(zip) + serializacion.dumps
+- columnar:  tuplas de columnas + {"columns", "rows"} + serializacion.dumps
+
+    python benchmarks/historial_json.py --filas 100 1000 --repeticiones 200 --salida historial_json.json
+
+Mide consulta + serialización (el camino completo de la vista sin HTTP)
+sobre una base SQLite sembrada con un solo usuario.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import sembrar
+
+FORMAS = ('orm', 'objetos', 'columnar')
+
+
+def _pagina_orm(CalculoEUDR, jsonify, user_id, n):
+    filas = CalculoEUDR.query.filter_by(user_id=user_id) \
+        .order_by(CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc()).limit(n).all()
+    return jsonify({"items": [c.to_dict() for c in filas]}).get_data()
+
+
+def _pagina_proyeccion(serializacion, CalculoEUDR, user_id, n, forma):
+    filas = serializacion.consulta(user_id) \
+        .order_by(CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc()).limit(n).all()
+    if forma == 'columnar':
+        datos = serializacion.columnar(serializacion.COLUMNAS, filas)
+    else:
+        datos = {"items": serializacion.objetos(serializacion.COLUMNAS, filas)}
+    return serializacion.dumps(datos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--repeticiones', type=int, default=100)
+    parser.add_argument('--salida', help='archivo JSON de resultados')
+    args = parser.parse_args()
+
+    ruta = os.path.join(tempfile.gettempdir(), 'cafe-bench-serializacion.db')
+    maximo = max(args.filas)
+    sembrar.sembrar(ruta, maximo, por_usuario=maximo, log=lambda *_: None)
+
+    from flask import jsonify
+    from app import create_app
+    from models import db, CalculoEUDR
+    import serializacion
+
+    app = create_app()
+    resultados = {}
+    with app.test_request_context():
+        user_id = db.session.query(CalculoEUDR.user_id).limit(1).scalar()
+        for n in args.filas:
+            for forma in FORMAS:
+                tiempos = []
+                for _ in range(args.repeticiones):
+                    db.session.remove()   # sin identity map de la corrida anterior
+                    inicio = time.perf_counter()
+                    if forma == 'orm':
+                        cuerpo = _pagina_orm(CalculoEUDR, jsonify, user_id, n)
+                    else:
+                        cuerpo = _pagina_proyeccion(serializacion, CalculoEUDR, user_id, n, forma)
+                    tiempos.append(time.perf_counter() - inicio)
+                resultados[f"{forma}_{n}"] = {
+                    "filas": n,
+                    "forma": forma,
+                    "p50_ms": round(statistics.median(tiempos) * 1000, 3),
+                    "min_ms": round(min(tiempos) * 1000, 3),
+                    "bytes": len(cuerpo),
+                }
+            base = resultados[f"orm_{n}"]["p50_ms"]
+            for forma in FORMAS:
+                r = resultados[f"{forma}_{n}"]
+                r["aceleracion"] = round(base / r["p50_ms"], 2)
+                print(f"{n:>6} filas  {forma:<9} p50 {r['p50_ms']:>8.3f} ms  "
+                      f"x{r['aceleracion']:<5} {r['bytes']:>8} bytes")
+
+    reporte = {"encoder": "orjson" if serializacion.orjson else "json",
+               "repeticiones": args.repeticiones, "resultados": resultados}
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
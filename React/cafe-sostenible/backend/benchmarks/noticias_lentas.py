@@ -0,0 +1,205 @@
+# backend/benchmarks/noticias_lentas.py
+"""
+Latencia del login con el sitio de noticias lento o con consultas pesadas
+en curso: gunicorn (sync) vs ASGI.
+
+Levanta un sitio de noticias falso que tarda --retraso segundos en cada
+respuesta, y la app en cada modo con los mismos workers:
+
+- sync:  gunicorn -k sync app:app
+- asgi:  uvicorn asgi:app
+
+Para cada modo mide POST /api/login:
+- solo
+- con --clientes-noticias pidiendo /api/noticias sin parar (la caché de
+  noticias casi sin TTL, así cada pedido vuelve a ir al sitio lento)
+- con --clientes-export descargando su historial completo en XLSX
+  (/api/v1/historial/export, --por-usuario cálculos cada uno): la consulta
+  lenta ocupa un hilo de Flask mientras dura
+
+    python benchmarks/noticias_lentas.py --retraso 3 --salida noticias.json
+
+Requiere gunicorn, uvicorn, asgiref y httpx (requirements.txt).
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+import carga
+import sembrar
+
+HTML = """<html><body>{}</body></html>""".format("".join(
+    f'<article class="post"><h2 class="entry-title"><a href="/n{i}">Noticia {i}</a></h2>'
+    f'<time class="entry-date">1 enero, 2025</time><div class="entry-content"><p>Texto {i}</p></div></article>'
+    for i in range(6)
+))
+
+COMANDOS = {
+    'sync': lambda puerto, workers: ['gunicorn', '-k', 'sync', '-w', str(workers), '--timeout', '120',
+                                     '-b', f'127.0.0.1:{puerto}', 'app:app'],
+    'asgi': lambda puerto, workers: ['uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(puerto),
+                                     '--workers', str(workers), '--log-level', 'warning'],
+}
+
+
+def sitio_lento(retraso):
+    """Servidor HTTP local que responde HTML de noticias después de `retraso` segundos."""
+    class Lento(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(retraso)
+            cuerpo = HTML.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Lento)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def levantar(modo, ruta_db, url_noticias, workers):
+    puerto = _puerto_libre()
+    entorno = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.abspath(ruta_db)}',
+                   NOTICIAS_URL=url_noticias, NOTICIAS_TTL='1', NOTICIAS_STALE='0')
+    proceso = subprocess.Popen(COMANDOS[modo](puerto, workers), cwd=sembrar.BACKEND, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            if requests.get(url + '/api/total-usuarios', timeout=1).ok:
+                return proceso, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proceso.kill()
+    raise RuntimeError(f"El servidor {modo} no arrancó")
+
+
+def cargar(url, sesiones, ruta, detener):
+    """Un hilo por sesión pidiendo `ruta` sin pausa hasta `detener`; devuelve sus latencias."""
+    latencias, lock = [], threading.Lock()
+
+    def trabajar(sesion):
+        while not detener.is_set():
+            inicio = time.perf_counter()
+            try:
+                sesion.get(url + ruta, timeout=60).raise_for_status()
+            except requests.RequestException:
+                continue
+            with lock:
+                latencias.append(time.perf_counter() - inicio)
+
+    hilos = [threading.Thread(target=trabajar, args=(s,), daemon=True) for s in sesiones]
+    for hilo in hilos:
+        hilo.start()
+    return hilos, latencias
+
+
+def _sesion_http(cliente):
+    """La app marca la cookie de sesión como Secure; el servidor de prueba es http."""
+    for cookie in cliente.sesion.cookies:
+        cookie.secure = False
+    return cliente.sesion
+
+
+def medir_modo(modo, args, ruta_db, usuarios, url_noticias):
+    proceso, url = levantar(modo, ruta_db, url_noticias, args.workers)
+    try:
+        clientes = [carga.Cliente(url, i, usuarios) for i in range(args.clientes_login)]
+        login = carga.ESCENARIOS['POST /api/login']
+
+        latencias, errores = carga.medir(login, clientes, args.duracion, args.calentamiento, args.semilla)
+        resultado = {"login_solo": carga.resumir(latencias, errores, args.duracion)}
+
+        cargas = {
+            'noticias': ('/api/noticias', [requests.Session() for _ in range(args.clientes_noticias)]),
+            'export': ('/api/v1/historial/export?format=xlsx',
+                       [_sesion_http(carga.Cliente(url, i, usuarios)) for i in range(args.clientes_export)]),
+        }
+        for nombre, (ruta, sesiones) in cargas.items():
+            detener = threading.Event()
+            hilos, lentas = cargar(url, sesiones, ruta, detener)
+            latencias, errores = carga.medir(login, clientes, args.duracion, args.calentamiento, args.semilla)
+            resultado[f"login_con_{nombre}"] = carga.resumir(latencias, errores, args.duracion)
+            detener.set()
+            for hilo in hilos:
+                hilo.join(timeout=args.retraso + 60)
+            resultado[nombre] = carga.resumir(np.array(lentas), 0, args.duracion + args.calentamiento)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modos', nargs='*', choices=list(COMANDOS), default=list(COMANDOS))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--retraso', type=float, default=3, help='segundos que tarda el sitio de noticias')
+    parser.add_argument('--clientes-noticias', type=int, default=8)
+    parser.add_argument('--clientes-export', type=int, default=8)
+    parser.add_argument('--clientes-login', type=int, default=2)
+    parser.add_argument('--duracion', type=float, default=10)
+    parser.add_argument('--calentamiento', type=float, default=1)
+    parser.add_argument('--escala', type=int, default=20000)
+    parser.add_argument('--por-usuario', type=int, default=5000, help='cálculos por usuario (tamaño del export)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='archivo JSON de resultados')
+    args = parser.parse_args()
+
+    ruta_db = os.path.join(tempfile.gettempdir(), f'cafe-bench-lentas-{args.escala}-{args.por_usuario}.db')
+    usuarios = carga.preparar_base(ruta_db, args.escala, args.por_usuario, args.semilla, False)
+    sitio = sitio_lento(args.retraso)
+    url_noticias = f'http://127.0.0.1:{sitio.server_address[1]}/noticias'
+
+    resultados = {}
+    try:
+        for modo in args.modos:
+            resultados[modo] = medir_modo(modo, args, ruta_db, usuarios, url_noticias)
+            for fase, datos in resultados[modo].items():
+                print(f"{modo:<5} {fase:<20} {json.dumps(datos)}", flush=True)
+    finally:
+        sitio.shutdown()
+
+    if args.salida:
+        reporte = {
+            "fecha": datetime.now().isoformat(timespec='seconds'),
+            "commit": carga._commit(),
+            "workers": args.workers,
+            "retraso_s": args.retraso,
+            "clientes_noticias": args.clientes_noticias,
+            "clientes_export": args.clientes_export,
+            "por_usuario": args.por_usuario,
+            "clientes_login": args.clientes_login,
+            "resultados": resultados,
+        }
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+# backend/benchmarks/sembrar.py
+"""
+Base SQLite sintética para las pruebas de carga: fincas, usuarios y
+cálculos EUDR con valores plausibles y resultados del motor de huella.
+
+    python benchmarks/sembrar.py /tmp/cafe-100k.db --calculos 100000
+
+Todos los usuarios tienen la contraseña CLAVE. Con la misma semilla se
+obtiene la misma base. tendencias_calculo y benchmark_buckets quedan
+vacías (`flask reconstruir-tendencias` / `reconstruir-benchmark` si hacen falta).
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+CLAVE = 'clave-bench'
+TAMANO_LOTE = 10000
+FECHA_INICIAL = datetime(2021, 10, 1)
+FECHA_FINAL = datetime(2025, 10, 1)     # fija: la base no depende del día en que se siembra
+
+
+def _hash(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def username(i):
+    return f'bench{i:06d}'
+
+
+def columnas_aleatorias(rng, n):
+    """Entradas del formulario con rangos típicos de fincas de SOPPEXCCA."""
+    area = rng.uniform(0.5, 20, n)
+    columnas = {
+        'area_cultivada': area,
+        'produccion_verde': area * rng.uniform(300, 1200, n),
+        'fertilizante_total': area * rng.uniform(0, 400, n),
+        'energia_electrica': rng.uniform(0, 3000, n),
+        'combustible_litros': rng.uniform(0, 500, n),
+        'arboles_sombra': np.floor(area * rng.uniform(20, 200, n)),
+        'area_copa_promedio': rng.uniform(5, 40, n),
+        'distancia_km': rng.uniform(1, 60, n),
+        'volumen_cargas': rng.uniform(1, 30, n),
+        'residuos_totales': rng.uniform(100, 5000, n),
+        'bosque_base': area * rng.uniform(0, 0.5, n),
+        'tipo_fertilizante': rng.choice(np.array(['sintetico', 'organico'], dtype=object), n),
+        'tipo_combustible': rng.choice(np.array(['diesel', 'gasolina', 'otro'], dtype=object), n),
+        'tipo_procesamiento': rng.choice(np.array(['lavado', 'miel', 'natural'], dtype=object), n),
+    }
+    columnas['residuos_compostados'] = columnas['residuos_totales'] * rng.uniform(0, 1, n)
+    columnas['bosque_actual'] = columnas['bosque_base'] * rng.uniform(0.9, 1, n)
+    return columnas
+
+
+def sembrar(ruta, calculos, por_usuario=100, semilla=42, log=print):
+    """Crea la base en `ruta` (la reemplaza si existe) y devuelve el número de usuarios."""
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(ruta)}'
+
+    from app import create_app
+    from models import db, User, Finca, CalculoEUDR
+    import factores_emision
+    import huella
+    import migraciones
+
+    app = create_app()
+    rng = np.random.default_rng(semilla)
+    usuarios = max(1, -(-calculos // por_usuario))
+    inicio = time.perf_counter()
+
+    with app.app_context():
+        migraciones.migrar(log=lambda *_: None)
+        db.session.execute(Finca.__table__.insert(), [
+            {'nombre': f'Finca {i}', 'codigo_hash': _hash(f'BENCH-{i}'), 'codigo_original': f'BENCH-{i}'}
+            for i in range(usuarios)
+        ])
+        fincas = dict(db.session.query(Finca.codigo_original, Finca.id))
+        clave = _hash(CLAVE)
+        db.session.execute(User.__table__.insert(), [
+            {'username': username(i), 'password_hash': clave, 'nombre': 'Bench', 'apellido': str(i),
+             'codigo_asociado_hash': _hash(f'BENCH-{i}'), 'finca_id': fincas[f'BENCH-{i}']}
+            for i in range(usuarios)
+        ])
+        ids = [uid for (uid,) in db.session.query(User.id).order_by(User.id)]
+        db.session.commit()
+        version_id = factores_emision.activa()[0].id
+
+        tabla = CalculoEUDR.__table__
+        segundos = (FECHA_FINAL - FECHA_INICIAL).total_seconds()
+        for desde in range(0, calculos, TAMANO_LOTE):
+            n = min(TAMANO_LOTE, calculos - desde)
+            columnas = columnas_aleatorias(rng, n)
+            resultado = huella.calcular_lote(columnas)
+            duenos = rng.integers(0, usuarios, n)
+            fechas = rng.uniform(0, segundos, n)
+            filas = []
+            for i in range(n):
+                fila = {c: (columnas[c][i] if c in huella.CAMPOS_TEXTO else float(columnas[c][i]))
+                        for c in huella.CAMPOS_NUMERICOS + huella.CAMPOS_TEXTO}
+                fila['arboles_sombra'] = int(fila['arboles_sombra'])
+                fila.update(huella.columnas_calculo(resultado, i))
+                fila.update(user_id=ids[duenos[i]], nombre_finca=f'Finca {duenos[i]}',
+                            fecha=FECHA_INICIAL + timedelta(seconds=float(fechas[i])),
+                            factores_version_id=version_id)
+                filas.append(fila)
+            db.session.execute(tabla.insert(), filas)
+            db.session.commit()
+            log(f"{desde + n} cálculos")
+
+    log(f"Base sembrada en {time.perf_counter() - inicio:.1f} s: {usuarios} usuarios, {calculos} cálculos")
+    return usuarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ruta')
+    parser.add_argument('--calculos', type=int, default=1000)
+    parser.add_argument('--por-usuario', type=int, default=100, help='cálculos promedio por usuario')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+    sembrar(args.ruta, args.calculos, args.por_usuario, args.semilla)
+
+
+if __name__ == '__main__':
+    main()
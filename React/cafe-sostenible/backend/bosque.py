@@ -0,0 +1,375 @@
+# backend/bosque.py
+"""
+Verificación de deforestación (EUDR) con los polígonos de las fincas.
+
+Cruza cada polígono con un raster local de cobertura de bosque, sin red.
+El raster es una carpeta (BOSQUE_RASTER_DIR) de tiles .npy que se abren
+mapeados en memoria: solo se leen del disco las ventanas que tocan los
+polígonos.
+
+    indice.json              {"nombre": "GFC2020", "origen": [lon_oeste, lat_norte],
+                              "pixel": [dlon, dlat], "filas": H, "columnas": W, "tile": 512}
+    base/<fila>_<col>.npy    cobertura de bosque al 31-12-2020, % del píxel (uint8 0-100)
+    actual/<fila>_<col>.npy  cobertura actual, o bien
+    perdida/<fila>_<col>.npy pérdida desde 2020, % del píxel
+    (255 = sin dato; un tile que no existe es todo sin dato)
+
+`flask bosque-importar-raster` arma la carpeta desde un GeoTIFF (requiere
+rasterio). `flask bosque-verificar` recorre la cooperativa por tiles: el
+R-tree de los polígonos dice qué polígonos tocan cada tile y un pool de
+procesos mide cada tile una sola vez. El resultado por finca queda en
+verificaciones_bosque, y los cálculos nuevos de esa finca usan sus
+hectáreas de bosque en lugar de las que escribe el productor (salvo que
+la verificación tenga más de BOSQUE_MAX_SIN_DATOS % de píxeles sin dato).
+"""
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models import db, User, PoligonoFinca, VerificacionBosque
+import geometria
+
+RASTER_DIR = os.getenv("BOSQUE_RASTER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raster'))
+SIN_DATO = 255
+TILE = 512
+CAPAS = ('base', 'actual', 'perdida')
+# Una verificación con más píxeles sin dato que esto (tile faltante, polígono fuera
+# del raster o más chico que un píxel) no reemplaza lo que escribe el productor
+MAX_SIN_DATOS = float(os.getenv("BOSQUE_MAX_SIN_DATOS", 20))
+
+
+# --- RASTER (tiles mapeados en memoria) ---
+class Raster:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(os.path.join(ruta, 'indice.json'), 'rb') as f:
+            contenido = f.read()
+        indice = json.loads(contenido)
+        self.lon0, self.lat0 = indice['origen']
+        self.dlon, self.dlat = indice['pixel']
+        self.filas, self.columnas = indice['filas'], indice['columnas']
+        self.tile = indice.get('tile', TILE)
+        self.id = f"{indice.get('nombre', 'raster')}@{hashlib.sha256(contenido).hexdigest()[:12]}"[:100]
+        self.capas = [c for c in CAPAS if os.path.isdir(os.path.join(ruta, c))]
+        if 'base' not in self.capas:
+            raise RuntimeError(f"El raster {ruta} no tiene la capa 'base' (cobertura 2020)")
+        if 'actual' not in self.capas and 'perdida' not in self.capas:
+            raise RuntimeError(f"El raster {ruta} necesita la capa 'actual' o 'perdida'")
+        self._tiles = {}
+
+    def leer_tile(self, capa, fila, col):
+        """Tile mapeado en memoria (np.load mmap_mode='r'), o None si no existe."""
+        clave = (capa, fila, col)
+        if clave not in self._tiles:
+            ruta = os.path.join(self.ruta, capa, f"{fila}_{col}.npy")
+            self._tiles[clave] = np.load(ruta, mmap_mode='r') if os.path.exists(ruta) else None
+        return self._tiles[clave]
+
+    def caja_tile(self, fila, col):
+        lon_min = self.lon0 + col * self.tile * self.dlon
+        lat_max = self.lat0 - fila * self.tile * self.dlat
+        return (lon_min, lat_max - self.tile * self.dlat, lon_min + self.tile * self.dlon, lat_max)
+
+    def tiles_en(self, caja):
+        """(fila, col) de los tiles que tocan la caja."""
+        lon_min, lat_min, lon_max, lat_max = caja
+        tiles_f = math.ceil(self.filas / self.tile)
+        tiles_c = math.ceil(self.columnas / self.tile)
+        c0 = max(0, int((lon_min - self.lon0) / (self.dlon * self.tile)))
+        c1 = min(tiles_c - 1, int((lon_max - self.lon0) / (self.dlon * self.tile)))
+        f0 = max(0, int((self.lat0 - lat_max) / (self.dlat * self.tile)))
+        f1 = min(tiles_f - 1, int((self.lat0 - lat_min) / (self.dlat * self.tile)))
+        return [(f, c) for f in range(f0, f1 + 1) for c in range(c0, c1 + 1)]
+
+
+_rasters = {}
+
+
+def abrir(ruta=None):
+    """Raster abierto una vez por proceso (los tiles mapeados se reutilizan)."""
+    ruta = ruta or RASTER_DIR
+    if ruta not in _rasters:
+        if not os.path.exists(os.path.join(ruta, 'indice.json')):
+            raise RuntimeError(f"No hay raster de bosque en {ruta} (BOSQUE_RASTER_DIR)")
+        _rasters[ruta] = Raster(ruta)
+    return _rasters[ruta]
+
+
+def _area_pixel_ha(raster, lats):
+    """Hectáreas de un píxel en cada latitud (el ancho en metros se achica hacia los polos)."""
+    alto = raster.dlat * geometria.M_POR_GRADO
+    ancho = raster.dlon * geometria.M_POR_GRADO * np.cos(np.radians(lats))
+    return alto * ancho / 10000
+
+
+def medir_tile(ruta, fila, col, poligonos):
+    """
+    Corre en los workers. `poligonos` es [(id, anillos como listas)] de los
+    que tocan el tile. Devuelve {id: [base_ha, actual_ha, pixeles, sin_dato]}.
+    """
+    raster = abrir(ruta)
+    base = raster.leer_tile('base', fila, col)
+    segunda = 'actual' if 'actual' in raster.capas else 'perdida'
+    otra = raster.leer_tile(segunda, fila, col)
+    t = raster.tile
+    lon_t = raster.lon0 + col * t * raster.dlon
+    lat_t = raster.lat0 - fila * t * raster.dlat
+    alto = min(t, raster.filas - fila * t)
+    ancho = min(t, raster.columnas - col * t)
+
+    resultado = {}
+    for poligono_id, anillos in poligonos:
+        partes = [[np.asarray(a, dtype=float) for a in p] for p in anillos]
+        lon_min, lat_min, lon_max, lat_max = geometria.caja(partes)
+        # Ventana del tile que cubre la caja del polígono
+        c0 = max(0, int((lon_min - lon_t) / raster.dlon))
+        c1 = min(ancho, int(math.ceil((lon_max - lon_t) / raster.dlon)))
+        f0 = max(0, int((lat_t - lat_max) / raster.dlat))
+        f1 = min(alto, int(math.ceil((lat_t - lat_min) / raster.dlat)))
+        if c0 >= c1 or f0 >= f1:
+            continue
+        dentro = geometria.mascara(partes, lon_t + c0 * raster.dlon, lat_t - f0 * raster.dlat,
+                                   raster.dlon, raster.dlat, c1 - c0, f1 - f0)
+        pixeles = int(dentro.sum())
+        if not pixeles:
+            continue
+        if base is None:
+            resultado[poligono_id] = [0.0, 0.0, pixeles, pixeles]
+            continue
+
+        ventana_base = np.asarray(base[f0:f1, c0:c1])
+        ventana_otra = np.asarray(otra[f0:f1, c0:c1]) if otra is not None else np.full_like(ventana_base, SIN_DATO)
+        sin_dato = dentro & ((ventana_base == SIN_DATO) | (ventana_otra == SIN_DATO))
+        validos = dentro & ~sin_dato
+        lats = lat_t - (np.arange(f0, f1) + 0.5) * raster.dlat
+        area = np.broadcast_to(_area_pixel_ha(raster, lats)[:, None], dentro.shape)
+
+        cobertura_base = np.where(validos, ventana_base, 0) / 100.0
+        if segunda == 'actual':
+            cobertura_actual = np.where(validos, ventana_otra, 0) / 100.0
+        else:
+            cobertura_actual = cobertura_base * (1 - np.where(validos, ventana_otra, 0) / 100.0)
+        resultado[poligono_id] = [
+            float((cobertura_base * area).sum()),
+            float((np.minimum(cobertura_actual, cobertura_base) * area).sum()),
+            pixeles,
+            int(sin_dato.sum()),
+        ]
+    return resultado
+
+
+# --- POLÍGONOS ---
+def _fila_poligono(finca_id, poligonos, nombre=None):
+    lon_min, lat_min, lon_max, lat_max = geometria.caja(poligonos)
+    return PoligonoFinca(
+        finca_id=finca_id, nombre=(str(nombre)[:100] if nombre else None),
+        geojson=json.dumps(geometria.a_geojson(poligonos), separators=(',', ':')),
+        min_lon=lon_min, min_lat=lat_min, max_lon=lon_max, max_lat=lat_max,
+        area_ha=geometria.area_ha(poligonos),
+    )
+
+
+def guardar_poligonos(finca_id, leidos):
+    """Reemplaza los polígonos de la finca por `leidos` (de geometria.leer). No hace commit."""
+    PoligonoFinca.query.filter_by(finca_id=finca_id).delete(synchronize_session=False)
+    filas = [_fila_poligono(finca_id, poligonos, propiedades.get('nombre')) for poligonos, propiedades in leidos]
+    db.session.add_all(filas)
+    return filas
+
+
+_indice = {"clave": None, "arbol": None}
+
+
+def indice():
+    """
+    R-tree de las cajas de todos los polígonos, en memoria del proceso.
+    Se reconstruye cuando cambian la cantidad o el último id de los polígonos.
+    """
+    clave = tuple(db.session.query(db.func.count(PoligonoFinca.id), db.func.max(PoligonoFinca.id)).one())
+    if _indice["clave"] != clave:
+        filas = db.session.query(PoligonoFinca.id, PoligonoFinca.min_lon, PoligonoFinca.min_lat,
+                                 PoligonoFinca.max_lon, PoligonoFinca.max_lat).all()
+        cajas = np.array([f[1:] for f in filas], dtype=float).reshape(-1, 4)
+        _indice["arbol"] = geometria.ArbolR(cajas, np.array([f[0] for f in filas], dtype=np.int64))
+        _indice["clave"] = clave
+    return _indice["arbol"]
+
+
+def superpuestos(finca_id, filas):
+    """Polígonos de otras fincas cuya caja se cruza con la de alguno de `filas` (posibles conflictos)."""
+    arbol = indice()
+    candidatos = set()
+    for fila in filas:
+        candidatos.update(arbol.buscar((fila.min_lon, fila.min_lat, fila.max_lon, fila.max_lat)))
+    if not candidatos:
+        return []
+    return db.session.query(PoligonoFinca.id, PoligonoFinca.finca_id) \
+        .filter(PoligonoFinca.id.in_(candidatos), PoligonoFinca.finca_id != finca_id).all()
+
+
+# --- VERIFICACIÓN ---
+def verificar(finca_ids=None, procesos=None, ruta=None, log=print):
+    """
+    Mide el bosque 2020 y actual dentro de los polígonos (de toda la
+    cooperativa o de `finca_ids`) y guarda una VerificacionBosque por finca.
+    """
+    raster = abrir(ruta)
+    consulta = PoligonoFinca.query
+    if finca_ids:
+        consulta = consulta.filter(PoligonoFinca.finca_id.in_(finca_ids))
+    poligonos = consulta.all()
+    if not poligonos:
+        return []
+
+    # Tile → polígonos que lo tocan (R-tree de estos polígonos)
+    cajas = np.array([(p.min_lon, p.min_lat, p.max_lon, p.max_lat) for p in poligonos], dtype=float)
+    arbol = geometria.ArbolR(cajas, np.arange(len(poligonos)))
+    anillos = {}
+    trabajos = []
+    for fila, col in raster.tiles_en((cajas[:, 0].min(), cajas[:, 1].min(), cajas[:, 2].max(), cajas[:, 3].max())):
+        indices = arbol.buscar(raster.caja_tile(fila, col))
+        if not indices:
+            continue
+        for i in indices:
+            if i not in anillos:
+                leidos = geometria.leer(poligonos[i].geojson)
+                anillos[i] = [[a.tolist() for a in p] for partes, _ in leidos for p in partes]
+        trabajos.append((fila, col, [(poligonos[i].id, anillos[i]) for i in indices]))
+    log(f"{len(poligonos)} polígonos en {len(trabajos)} tiles de {raster.id}")
+
+    procesos = procesos or os.cpu_count() or 1
+    sumas = defaultdict(lambda: [0.0, 0.0, 0, 0])
+    if procesos == 1 or len(trabajos) == 1:
+        resultados = (medir_tile(raster.ruta, *t) for t in trabajos)
+        _acumular(sumas, resultados)
+    else:
+        with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futuros = [pool.submit(medir_tile, raster.ruta, *t) for t in trabajos]
+            _acumular(sumas, (f.result() for f in futuros))
+
+    por_finca = defaultdict(list)
+    for poligono in poligonos:
+        por_finca[poligono.finca_id].append(poligono)
+
+    verificaciones = []
+    for finca_id, suyos in por_finca.items():
+        area = sum(p.area_ha for p in suyos)
+        base = sum(sumas[p.id][0] for p in suyos)
+        actual = sum(sumas[p.id][1] for p in suyos)
+        pixeles = sum(sumas[p.id][2] for p in suyos)
+        sin_dato = sum(sumas[p.id][3] for p in suyos)
+        verificaciones.append(VerificacionBosque(
+            finca_id=finca_id, raster=raster.id, poligonos=len(suyos), area_ha=area,
+            bosque_base_ha=base, bosque_actual_ha=actual,
+            deforestacion_porc=max(0.0, base - actual) / area * 100 if area else 0.0,
+            # Polígono más chico que un píxel: ningún centro cae adentro, no hay medición
+            sin_datos_porc=sin_dato / pixeles * 100 if pixeles else 100.0,
+        ))
+    db.session.add_all(verificaciones)
+    db.session.commit()
+    return verificaciones
+
+
+def _acumular(sumas, resultados):
+    for resultado in resultados:
+        for poligono_id, valores in resultado.items():
+            acumulado = sumas[poligono_id]
+            for i, valor in enumerate(valores):
+                acumulado[i] += valor
+
+
+def vigentes(user_ids):
+    """
+    {user_id: VerificacionBosque más reciente de su finca} para los usuarios
+    dados, si midió algo: con sin_datos_porc > MAX_SIN_DATOS no se devuelve
+    y el cálculo conserva las hectáreas que escribió el productor.
+    """
+    user_ids = {u for u in user_ids if u is not None}
+    if not user_ids:
+        return {}
+    ultima = db.session.query(VerificacionBosque.finca_id, db.func.max(VerificacionBosque.id).label('id')) \
+        .group_by(VerificacionBosque.finca_id).subquery()
+    filas = db.session.query(User.id, VerificacionBosque) \
+        .join(ultima, ultima.c.finca_id == User.finca_id) \
+        .join(VerificacionBosque, VerificacionBosque.id == ultima.c.id) \
+        .filter(User.id.in_(user_ids), VerificacionBosque.sin_datos_porc <= MAX_SIN_DATOS).all()
+    return {user_id: verificacion for user_id, verificacion in filas}
+
+
+def aplicar(filas):
+    """
+    Filas de CalculoEUDR (dicts con user_id): si la finca del usuario está
+    verificada, bosque_base/bosque_actual y el área medida salen de la verificación.
+    """
+    verificaciones = vigentes(f['user_id'] for f in filas)
+    for fila in filas:
+        verificacion = verificaciones.get(fila['user_id'])
+        if verificacion is not None:
+            fila['bosque_base'] = verificacion.bosque_base_ha
+            fila['bosque_actual'] = verificacion.bosque_actual_ha
+            fila['verificacion_id'] = verificacion.id
+            fila['area_bosque'] = verificacion.area_ha
+        else:
+            fila.setdefault('verificacion_id', None)
+            fila.setdefault('area_bosque', None)
+    return filas
+
+
+# --- IMPORTAR RASTER ---
+def importar_raster(origen, capa, destino=None, tile=TILE, fraccion=False, log=print):
+    """
+    Corta un GeoTIFF en lat/lon (EPSG:4326) en tiles .npy uint8 de la capa
+    dada. Con `fraccion` los valores son 0-1 (p. ej. bosque sí/no) y se
+    llevan a 0-100; nodata → SIN_DATO.
+    """
+    try:
+        import rasterio
+        from rasterio.windows import Window
+    except ImportError:
+        raise RuntimeError("Para importar GeoTIFF instala rasterio: pip install rasterio")
+    if capa not in CAPAS:
+        raise RuntimeError(f"Capa desconocida: {capa} (base, actual o perdida)")
+    destino = destino or RASTER_DIR
+
+    with rasterio.open(origen) as fuente:
+        if fuente.crs is not None and fuente.crs.to_epsg() != 4326:
+            raise RuntimeError("El raster debe estar en EPSG:4326 (lon/lat)")
+        transformacion = fuente.transform
+        indice = {
+            "nombre": os.path.splitext(os.path.basename(origen))[0],
+            "origen": [transformacion.c, transformacion.f],
+            "pixel": [transformacion.a, -transformacion.e],
+            "filas": fuente.height, "columnas": fuente.width, "tile": tile,
+        }
+        ruta_indice = os.path.join(destino, 'indice.json')
+        if os.path.exists(ruta_indice):
+            with open(ruta_indice, encoding='utf-8') as f:
+                existente = json.load(f)
+            mismos = all(existente.get(k) == indice[k] for k in ('origen', 'pixel', 'filas', 'columnas', 'tile'))
+            if not mismos:
+                raise RuntimeError("La grilla no coincide con la del raster ya importado en " + destino)
+            indice["nombre"] = existente.get("nombre", indice["nombre"])
+
+        os.makedirs(os.path.join(destino, capa), exist_ok=True)
+        escala = 100 if fraccion else 1
+        escritos = 0
+        for fila in range(math.ceil(fuente.height / tile)):
+            for col in range(math.ceil(fuente.width / tile)):
+                ventana = Window(col * tile, fila * tile, min(tile, fuente.width - col * tile),
+                                 min(tile, fuente.height - fila * tile))
+                datos = fuente.read(1, window=ventana, masked=True)
+                valores = np.clip(datos.filled(0).astype(np.float64) * escala, 0, 100).astype(np.uint8)
+                valores[np.ma.getmaskarray(datos)] = SIN_DATO
+                np.save(os.path.join(destino, capa, f"{fila}_{col}.npy"), valores)
+                escritos += 1
+    with open(os.path.join(destino, 'indice.json'), 'w', encoding='utf-8') as f:
+        json.dump(indice, f, indent=2)
+    _rasters.pop(destino, None)
+    log(f"Capa '{capa}': {escritos} tiles de {tile}×{tile} en {destino}")
+    return escritos
@@ -0,0 +1,252 @@
+# backend/busqueda.py
+"""
+Filtros estructurados del historial y búsqueda por nombre de finca.
+
+Parámetros GET (opcionales y combinables con month/from/to):
+- finca: parte del nombre de la finca, sin distinguir mayúsculas ni tildes
+- tipo_procesamiento, tipo_fertilizante: un valor o varios separados por coma
+- huella_min / huella_max (kg CO₂e/kg) y area_min / area_max (ha), inclusivos
+- search: una fecha YYYY-MM-DD como siempre; cualquier otro texto se busca
+  como nombre de finca (antes se ignoraba en silencio)
+
+Cada filtro tiene su índice (user_id, columna, fecha, id) en calculos_eudr:
+las claves de la página salen solo del índice y después se leen por id las
+filas de esa página (historial.pagina).
+
+Un LIKE '%texto%' no puede usar un índice B-tree, así que la parte del
+nombre se resuelve antes en memoria, con un índice de trigramas de los
+nombres distintos de cada usuario (muchos menos que las filas), y la
+consulta filtra nombre_finca IN (...) por ix_calculos_eudr_user_finca.
+El índice es de cada app (app.extensions, como su base), se carga una
+vez, se pone al día leyendo solo los ids nuevos (los cálculos no se
+borran ni cambian de nombre) y se rearma cada BUSQUEDA_RECARGA segundos.
+Un id que falta entre los leídos puede ser de una transacción que todavía
+no confirmó: se vuelve a buscar en cada puesta al día durante
+ESPERA_HUECOS segundos.
+"""
+import math
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from flask import current_app
+
+from models import db, CalculoEUDR
+import huella
+
+TIPOS = {'tipo_procesamiento': huella.TIPOS_PROCESAMIENTO, 'tipo_fertilizante': huella.TIPOS_FERTILIZANTE}
+RANGOS = {'huella': 'huella_por_kg', 'area': 'area_cultivada'}   # prefijo de _min/_max → columna
+LARGO_MAXIMO = 100          # = CalculoEUDR.nombre_finca
+MAX_NOMBRES = 500           # más coincidencias que esto → LIKE (SQL Server admite 2100 parámetros)
+RECARGA = int(os.getenv("BUSQUEDA_RECARGA", 600))
+ESPERA_HUECOS = 60          # segundos que se espera un id menor sin confirmar (o de un rollback)
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+# --- PARÁMETROS ---
+def _es_fecha(texto):
+    try:
+        time.strptime(texto, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
+
+
+def _numero(args, nombre):
+    valor = args.get(nombre, '').strip()
+    if not valor:
+        return None
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise FiltroInvalido(f"{nombre} debe ser un número")
+    if not math.isfinite(numero):
+        raise FiltroInvalido(f"{nombre} debe ser un número")
+    return numero
+
+
+def leer(args):
+    """Query string → {filtro: valor}; vacío si no hay filtros. FiltroInvalido si alguno no sirve."""
+    filtros = {}
+
+    finca = args.get('finca', '').strip()
+    search = args.get('search', '').strip()
+    if not finca and search and not _es_fecha(search):
+        finca = search
+    if finca:
+        if len(finca) > LARGO_MAXIMO:
+            raise FiltroInvalido(f"finca admite hasta {LARGO_MAXIMO} caracteres")
+        filtros['finca'] = finca
+
+    for columna, permitidos in TIPOS.items():
+        valores = {v.strip().lower() for v in args.get(columna, '').split(',') if v.strip()}
+        if not valores:
+            continue
+        if valores - permitidos:
+            raise FiltroInvalido(f"{columna} debe ser {', '.join(sorted(permitidos))}")
+        filtros[columna] = sorted(valores)
+
+    for prefijo in RANGOS:
+        minimo, maximo = _numero(args, f'{prefijo}_min'), _numero(args, f'{prefijo}_max')
+        if minimo is not None and maximo is not None and minimo > maximo:
+            raise FiltroInvalido(f"{prefijo}_min no puede ser mayor que {prefijo}_max")
+        if minimo is not None:
+            filtros[f'{prefijo}_min'] = minimo
+        if maximo is not None:
+            filtros[f'{prefijo}_max'] = maximo
+    return filtros
+
+
+def _patron_like(texto):
+    return '%' + texto.replace('/', '//').replace('%', '/%').replace('_', '/_') + '%'
+
+
+def condiciones(filtros, user_id):
+    """
+    Filtros → (nombres de condición, parámetros). Los nombres fijan la forma
+    del SQL (qué columna y qué operador, ver `expresion`); los parámetros
+    llevan los valores. historial.py arma una sentencia por cada forma.
+    """
+    nombres, parametros = [], {}
+    if 'finca' in filtros:
+        coincidencias = indice_nombres().buscar(user_id, filtros['finca'])
+        if not coincidencias:
+            nombres.append('nada')
+        elif len(coincidencias) > MAX_NOMBRES:
+            nombres.append('finca_like')
+            parametros['finca'] = _patron_like(filtros['finca'])
+        else:
+            nombres.append('finca')
+            parametros['nombres'] = coincidencias
+
+    for columna in TIPOS:
+        if columna in filtros:
+            nombres.append(columna)
+            parametros[columna] = filtros[columna]
+
+    for prefijo in RANGOS:
+        for limite in (f'{prefijo}_min', f'{prefijo}_max'):
+            if limite in filtros:
+                nombres.append(limite)
+                parametros[limite] = filtros[limite]
+    return tuple(nombres), parametros
+
+
+def expresion(nombre):
+    """Condición SQL, con bindparam, de un nombre devuelto por `condiciones`."""
+    if nombre == 'nada':
+        return db.false()
+    if nombre == 'finca':
+        return CalculoEUDR.nombre_finca.in_(db.bindparam('nombres', expanding=True))
+    if nombre == 'finca_like':
+        return CalculoEUDR.nombre_finca.like(db.bindparam('finca'), escape='/')
+    if nombre in TIPOS:
+        return getattr(CalculoEUDR, nombre).in_(db.bindparam(nombre, expanding=True))
+    prefijo, _, extremo = nombre.rpartition('_')
+    columna = getattr(CalculoEUDR, RANGOS[prefijo])
+    return columna >= db.bindparam(nombre) if extremo == 'min' else columna <= db.bindparam(nombre)
+
+
+# --- ÍNDICE DE NOMBRES DE FINCA ---
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Café Altamira' → 'cafe altamira'."""
+    descompuesto = unicodedata.normalize('NFKD', texto.casefold())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNombres:
+    """Trigramas → nombres de finca distintos, con los nombres de cada usuario."""
+
+    def __init__(self):
+        self.nombres = []                     # nombre_id → nombre tal cual está en la base
+        self.normalizados = []
+        self._ids = {}
+        self.trigramas = defaultdict(set)     # trigrama → nombre_ids
+        self.por_usuario = defaultdict(set)   # user_id → nombre_ids
+        self.ultimo_id = 0                    # último CalculoEUDR.id leído
+        self.huecos = {}                      # id menor a ultimo_id no leído → cuándo se vio que faltaba
+        self.cargado = time.monotonic()
+
+    def agregar(self, user_id, nombre):
+        nombre_id = self._ids.get(nombre)
+        if nombre_id is None:
+            nombre_id = self._ids[nombre] = len(self.nombres)
+            normalizado = normalizar(nombre)
+            self.nombres.append(nombre)
+            self.normalizados.append(normalizado)
+            for trigrama in _trigramas(normalizado):
+                self.trigramas[trigrama].add(nombre_id)
+        self.por_usuario[user_id].add(nombre_id)
+
+    def buscar(self, user_id, texto):
+        """Nombres del usuario que contienen `texto` (normalizado), ordenados."""
+        texto = normalizar(texto)
+        candidatos = self.por_usuario.get(user_id, set())
+        # Del trigrama menos frecuente al más frecuente: el conjunto se achica rápido.
+        # Con menos de 3 letras no hay trigramas y se revisan los nombres del usuario
+        for trigrama in sorted(_trigramas(texto), key=lambda t: len(self.trigramas.get(t, ()))):
+            candidatos = candidatos & self.trigramas.get(trigrama, set())
+            if not candidatos:
+                return []
+        return sorted(self.nombres[i] for i in candidatos if texto in self.normalizados[i])
+
+
+def preparar(app):
+    """Se llama en create_app: cada app (y su base) tiene su propio índice."""
+    app.extensions['busqueda'] = {"nombres": None, "lock": threading.Lock()}
+
+
+def _cargar():
+    indice = IndiceNombres()
+    tope = db.session.query(db.func.max(CalculoEUDR.id)).scalar() or 0
+    # Pares distintos (user_id, nombre): se recorre solo ix_calculos_eudr_user_finca
+    filas = db.session.query(CalculoEUDR.user_id, CalculoEUDR.nombre_finca) \
+        .filter(CalculoEUDR.id <= tope).distinct()
+    for user_id, nombre in filas:
+        indice.agregar(user_id, nombre)
+    indice.ultimo_id = tope
+    return indice
+
+
+def _poner_al_dia(indice):
+    """
+    Agrega los nombres de los cálculos con id > ultimo_id (rango de la clave
+    primaria), y desde el hueco más viejo si quedaron ids sin leer.
+    """
+    desde = min(min(indice.huecos, default=indice.ultimo_id + 1) - 1, indice.ultimo_id)
+    filas = db.session.query(CalculoEUDR.id, CalculoEUDR.user_id, CalculoEUDR.nombre_finca) \
+        .filter(CalculoEUDR.id > desde).order_by(CalculoEUDR.id).all()
+    leidos = set()
+    for calculo_id, user_id, nombre in filas:
+        indice.agregar(user_id, nombre)
+        leidos.add(calculo_id)
+
+    ahora = time.monotonic()
+    huecos = {i: visto for i, visto in indice.huecos.items()
+              if i not in leidos and ahora - visto < ESPERA_HUECOS}
+    tope = max(indice.ultimo_id, filas[-1].id if filas else 0)
+    for i in range(indice.ultimo_id + 1, tope):
+        if i not in leidos:
+            huecos[i] = ahora
+    indice.huecos = huecos
+    indice.ultimo_id = tope
+
+
+def indice_nombres():
+    estado = current_app.extensions['busqueda']
+    with estado["lock"]:
+        indice = estado["nombres"]
+        if indice is None or time.monotonic() - indice.cargado > RECARGA:
+            indice = estado["nombres"] = _cargar()
+        else:
+            _poner_al_dia(indice)
+        return indice
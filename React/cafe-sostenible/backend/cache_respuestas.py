@@ -0,0 +1,206 @@
+# backend/cache_respuestas.py
+"""
+Caché de respuestas GET con ETag/304 e invalidación selectiva.
+
+Cada respuesta se guarda bajo (espacio, versión, ruta + query). Un espacio
+agrupa lo que cambia junto (p. ej. `historial:<user_id>`); invalidarlo solo
+cambia su versión, así las entradas viejas dejan de encontrarse.
+
+Backends (CACHE_BACKEND, en la config de la app o en el entorno):
+- archivos (por defecto): directorio compartido entre los workers de la
+  máquina (CACHE_DIR); las entradas vencidas se borran cada LIMPIEZA segundos
+- redis: servidor Redis (CACHE_REDIS_URL), requiere `pip install redis`
+- memoria: LRU en el proceso, solo para un único proceso: con varios
+  workers `invalidar` no llega a los demás y sirven datos viejos hasta el TTL
+
+El backend es de cada app (app.extensions), no del módulo.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+TTL = int(os.getenv("CACHE_TTL", 300))
+
+
+# --- BACKENDS ---
+class MemoriaLRU:
+    def __init__(self, maximo=2048):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            valor, expira = item
+            if expira is not None and expira < time.time():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl=None):
+        with self._lock:
+            self._datos[clave] = (valor, time.time() + ttl if ttl else None)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+
+class ArchivosCache:
+    LIMPIEZA = 600
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._proxima_limpieza = time.monotonic() + self.LIMPIEZA
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, hashlib.sha256(clave.encode()).hexdigest())
+
+    def get(self, clave):
+        try:
+            with open(self._ruta(clave), 'rb') as f:
+                expira = float(f.readline())
+                if expira and expira < time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, clave, valor, ttl=None):
+        # Escritura atómica: otro worker nunca lee un archivo a medias
+        fd, temporal = tempfile.mkstemp(dir=self.directorio)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(f"{time.time() + ttl if ttl else 0}\n".encode())
+            f.write(valor)
+        os.replace(temporal, self._ruta(clave))
+        if time.monotonic() > self._proxima_limpieza:
+            self._proxima_limpieza = time.monotonic() + self.LIMPIEZA
+            self.limpiar()
+
+    def limpiar(self):
+        """Borra las entradas vencidas (las de versiones viejas vencen por TTL)."""
+        ahora = time.time()
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                with open(ruta, 'rb') as f:
+                    expira = float(f.readline())
+                if expira and expira < ahora:
+                    os.remove(ruta)
+            except (OSError, ValueError):
+                pass   # otro worker ya la borró, o un temporal a medio escribir
+
+
+class RedisCache:
+    def __init__(self, url):
+        import redis
+        self.cliente = redis.Redis.from_url(url)
+
+    def get(self, clave):
+        return self.cliente.get(clave)
+
+    def set(self, clave, valor, ttl=None):
+        self.cliente.set(clave, valor, ex=ttl)
+
+
+def crear_backend(config=None):
+    config = config or {}
+
+    def valor(nombre, defecto):
+        return config.get(nombre, os.getenv(nombre, defecto))
+
+    tipo = valor("CACHE_BACKEND", "archivos")
+    if tipo == 'memoria':
+        return MemoriaLRU(int(valor("CACHE_MAX_ITEMS", 2048)))
+    if tipo == 'redis':
+        return RedisCache(valor("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    if tipo != 'archivos':
+        raise RuntimeError(f"CACHE_BACKEND desconocido: {tipo} (archivos, redis o memoria)")
+    return ArchivosCache(valor("CACHE_DIR", os.path.join(tempfile.gettempdir(), "cafe-cache")))
+
+
+def preparar(app):
+    """Se llama en create_app: el backend de la caché de esta app."""
+    app.extensions['cache_respuestas'] = crear_backend(app.config)
+
+
+def _backend():
+    return current_app.extensions['cache_respuestas']
+
+
+# --- VERSIONES E INVALIDACIÓN ---
+def _version(backend, espacio):
+    version = backend.get(f"ver:{espacio}")
+    if version is None:
+        version = uuid.uuid4().hex.encode()
+        backend.set(f"ver:{espacio}", version)
+    return version.decode() if isinstance(version, bytes) else version
+
+
+def invalidar(*espacios):
+    """Descarta todo lo cacheado en esos espacios (en todos los workers si el backend es compartido)."""
+    backend = _backend()
+    for espacio in espacios:
+        backend.set(f"ver:{espacio}", uuid.uuid4().hex.encode())
+
+
+# --- DECORADOR ---
+def _empaquetar(cuerpo, mimetype, etag):
+    return json.dumps({"mimetype": mimetype, "etag": etag}).encode() + b"\n" + cuerpo
+
+
+def _desempaquetar(valor):
+    cabecera, _, cuerpo = valor.partition(b"\n")
+    meta = json.loads(cabecera)
+    return cuerpo, meta["mimetype"], meta["etag"]
+
+
+def _responder(cuerpo, mimetype, etag, publica, estado_cache):
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(cuerpo, mimetype=mimetype)
+    response.set_etag(etag)
+    # no-cache: el navegador guarda la respuesta pero revalida (304) en cada navegación
+    response.headers['Cache-Control'] = ('public' if publica else 'private') + ', no-cache'
+    response.headers['X-Cache'] = estado_cache
+    return response
+
+
+def cacheada(espacio, ttl=TTL, publica=False):
+    """
+    Cachea respuestas 200 de una vista GET. `espacio` es una función que
+    devuelve el espacio de invalidación de la petición actual.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envuelta(*args, **kwargs):
+            backend = _backend()
+            nombre = espacio()
+            clave = f"resp:{nombre}:{_version(backend, nombre)}:{request.full_path}"
+
+            guardado = backend.get(clave)
+            if guardado is not None:
+                return _responder(*_desempaquetar(guardado), publica, 'HIT')
+
+            response = make_response(vista(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+            cuerpo = response.get_data()
+            etag = hashlib.sha256(cuerpo).hexdigest()[:32]
+            backend.set(clave, _empaquetar(cuerpo, response.mimetype, etag), ttl)
+            return _responder(cuerpo, response.mimetype, etag, publica, 'MISS')
+        return envuelta
+    return decorador
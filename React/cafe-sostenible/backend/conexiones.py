@@ -0,0 +1,141 @@
+# backend/conexiones.py
+"""
+Engines de la base de datos: pool del primario, réplica de lectura y
+enrutamiento de cada consulta.
+
+Con DATABASE_READ_URL las peticiones GET/HEAD leen de un engine propio
+(bind 'lectura', con su pool), así los listados no compiten por
+conexiones con las escrituras. Todo lo demás va al primario, y también
+cualquier escritura aunque ocurra dentro de un GET (flush, INSERT,
+UPDATE, DELETE, SQL en texto). Sin DATABASE_READ_URL todo va al primario.
+
+La réplica puede ir atrasada: después de una escritura confirmada
+(commit de una transacción que escribió), los GET de ese navegador leen
+del primario durante DB_LECTURA_PEGAJOSA_S segundos, para que el
+historial muestre enseguida el cálculo recién guardado.
+
+Pool (por engine; en SQLite en memoria no aplica):
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE
+    DB_LECTURA_POOL_SIZE, ... (por defecto, los mismos del primario)
+"""
+import os
+import time
+
+from flask import g, has_app_context, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+LECTURA = 'lectura'                 # bind key de la réplica
+METODOS_LECTURA = ('GET', 'HEAD')
+MARCA_ESCRITURA = '_escritura'      # clave en la cookie de sesión
+
+# Opción del engine → (variable, tipo). Solo se pasan las que están definidas.
+OPCIONES_POOL = {
+    'pool_size': ('POOL_SIZE', int),
+    'max_overflow': ('MAX_OVERFLOW', int),
+    'pool_timeout': ('POOL_TIMEOUT', float),
+    'pool_recycle': ('POOL_RECYCLE', int),
+}
+
+
+def _config(app, nombre, defecto=None):
+    return app.config.get(nombre, os.getenv(nombre, defecto))
+
+
+def _opciones_pool(app, prefijo, url, base):
+    """pool_* desde la configuración; `base` da los valores que no se definieron."""
+    opciones = dict(base)
+    for opcion, (sufijo, tipo) in OPCIONES_POOL.items():
+        valor = _config(app, f"{prefijo}{sufijo}")
+        if valor not in (None, ''):
+            opciones[opcion] = tipo(valor)
+    # Solo los pools con cola admiten tamaño, desborde y espera
+    url = make_url(url)
+    if not issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        for opcion in ('pool_size', 'max_overflow', 'pool_timeout'):
+            opciones.pop(opcion, None)
+    return opciones
+
+
+def preparar(app):
+    """
+    Se llama en create_app antes de db.init_app: opciones del pool del
+    primario y, si hay DATABASE_READ_URL, el bind de lectura.
+    """
+    opciones = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    opciones.update(_opciones_pool(app, 'DB_', app.config['SQLALCHEMY_DATABASE_URI'], opciones))
+
+    url_lectura = _config(app, 'DATABASE_READ_URL')
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    if url_lectura and LECTURA not in binds:
+        # Los binds no heredan SQLALCHEMY_ENGINE_OPTIONS: se copian las del primario
+        base = {k: v for k, v in opciones.items() if k != 'poolclass'}
+        binds[LECTURA] = {'url': url_lectura, **_opciones_pool(app, 'DB_LECTURA_', url_lectura, base)}
+    app.config['DB_LECTURA_PEGAJOSA_S'] = float(_config(app, 'DB_LECTURA_PEGAJOSA_S', 5))
+
+
+class SesionRuteada(Session):
+    """Session de Flask-SQLAlchemy que manda las lecturas de peticiones GET a la réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and getattr(clause, 'is_select', False) and _leer_de_replica():
+            engine = self._db.engines.get(LECTURA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _leer_de_replica():
+    """Decisión memorizada por petición; fuera de una petición (CLI, tareas) siempre primario."""
+    return has_app_context() and g.get('_bd_lectura', False)
+
+
+# --- ESCRITURAS CONFIRMADAS ---
+def _escribio(sesion, *args):
+    sesion.info['_escribio'] = True
+
+
+def _sentencia_de_escritura(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        _escribio(estado.session)
+
+
+def _confirmada(sesion):
+    # Solo si la transacción escribió algo: un commit después de leer no cuenta
+    if sesion.info.pop('_escribio', False) and has_request_context():
+        g._bd_escrita = True
+
+
+def _descartada(sesion):
+    sesion.info.pop('_escribio', None)
+
+
+def _escuchar_escrituras():
+    eventos = (('after_flush', _escribio), ('do_orm_execute', _sentencia_de_escritura),
+               ('after_commit', _confirmada), ('after_rollback', _descartada))
+    for nombre, funcion in eventos:
+        if not event.contains(SesionRuteada, nombre, funcion):
+            event.listen(SesionRuteada, nombre, funcion)
+
+
+def iniciar(app, db):
+    """Se llama después de db.init_app; sin réplica no registra nada."""
+    if LECTURA not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    pegajosa = app.config['DB_LECTURA_PEGAJOSA_S']
+    _escuchar_escrituras()
+
+    def antes_de_peticion():
+        escrita = session.get(MARCA_ESCRITURA, 0)
+        g._bd_lectura = request.method in METODOS_LECTURA and time.time() - escrita >= pegajosa
+
+    def despues_de_peticion(response):
+        # La marca se pone solo si hubo commit con escrituras (no tras un logout ni un POST fallido)
+        if g.pop('_bd_escrita', False) and pegajosa > 0:
+            session[MARCA_ESCRITURA] = time.time()
+        return response
+
+    app.before_request(antes_de_peticion)
+    app.after_request(despues_de_peticion)
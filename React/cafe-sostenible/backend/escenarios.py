@@ -0,0 +1,177 @@
+# backend/escenarios.py
+"""
+Escenarios "¿qué pasaría si…?" para recomendar reducciones.
+
+A partir de un cálculo guardado se arma la grilla de todas las
+combinaciones de intervenciones (palancas), se replica la fila una vez por
+combinación y se calcula todo con huella.calcular_lote en una sola pasada.
+Las combinaciones se ordenan por reducción de kg CO₂e por kg de café.
+
+Los árboles de sombra no entran en la grilla: el motor no descuenta captura
+de carbono, así que no cambian la huella. Se informan aparte como
+co-beneficio de cobertura.
+"""
+import numpy as np
+
+import huella
+
+# Palanca → opciones por defecto. La primera opción de cada palanca es "sin cambio".
+PALANCAS = {
+    'tipo_fertilizante': ('actual', 'organico'),
+    'fraccion_compost': ('actual', 25, 50, 75, 100),          # % de residuos compostados
+    'tipo_procesamiento': ('actual', 'lavado', 'miel', 'natural'),
+    'reduccion_combustible': (0, 10, 25, 50),                 # % menos litros
+    'reduccion_fertilizante': (0, 10, 20, 30),                # % menos kg
+    'reduccion_energia': (0, 10, 25, 50),                     # % menos kWh
+}
+# Intervenciones que no reducen emisiones: fuera del ranking, una fila por opción
+COBENEFICIOS = {
+    'arboles_adicionales_ha': (0, 25, 50, 100),               # árboles de sombra por ha
+}
+TEXTO = {'tipo_fertilizante': ('sintetico', 'organico'), 'tipo_procesamiento': ('lavado', 'miel', 'natural')}
+PORCENTAJES = ('fraccion_compost', 'reduccion_combustible', 'reduccion_fertilizante', 'reduccion_energia')
+MAX_COMBINACIONES = 200000
+MAX_OPCIONES = 20
+
+
+def opciones_desde_args(args):
+    """Permite cambiar las opciones de una palanca (?reduccion_combustible=0,15,30) o quitarla (=0 / =actual)."""
+    opciones = {**PALANCAS, **COBENEFICIOS}
+    for palanca in list(opciones):
+        valor = args.get(palanca)
+        if valor is None:
+            continue
+        lista = [v.strip() for v in valor.split(',') if v.strip()]
+        if palanca in TEXTO:
+            if any(v not in TEXTO[palanca] + ('actual',) for v in lista):
+                raise ValueError(f"'{palanca}' admite: actual, {', '.join(TEXTO[palanca])}")
+        else:
+            try:
+                lista = [float(v) for v in lista]
+            except ValueError:
+                raise ValueError(f"'{palanca}' debe ser una lista de números")
+            if any(v < 0 or (palanca in PORCENTAJES and v > 100) for v in lista):
+                raise ValueError(f"'{palanca}' fuera de rango")
+        if len(lista) > MAX_OPCIONES:
+            raise ValueError(f"Máximo {MAX_OPCIONES} opciones por palanca")
+        sin_cambio = 'actual' if palanca in TEXTO or palanca == 'fraccion_compost' else 0
+        opciones[palanca] = (sin_cambio,) + tuple(v for v in lista if v != sin_cambio)
+    return opciones
+
+
+def _utiles(opciones, base):
+    """Quita opciones que no cambian nada para esta finca (p. ej. orgánico si ya lo es)."""
+    utiles = {}
+    for palanca, valores in opciones.items():
+        if palanca in TEXTO:
+            actual = base[palanca][0]
+            valores = (valores[0],) + tuple(v for v in valores[1:] if v != actual)
+        elif palanca == 'fraccion_compost':
+            residuos = base['residuos_totales'][0]
+            actual = base['residuos_compostados'][0] / residuos * 100 if residuos > 0 else None
+            # Sin residuos no hay nada que compostar; solo se proponen fracciones mayores a la actual
+            valores = (valores[0],) + tuple(v for v in valores[1:] if actual is not None and v > actual)
+        utiles[palanca] = valores
+    return utiles
+
+
+def grilla(base, opciones):
+    """
+    Columnas de huella con una fila por combinación y la matriz de índices
+    (combinación × palanca) de la opción elegida en cada una.
+    """
+    palancas = list(opciones)
+    forma = tuple(len(opciones[p]) for p in palancas)
+    n = int(np.prod(forma))
+    if n > MAX_COMBINACIONES:
+        raise ValueError(f"La grilla tiene {n} combinaciones (máximo {MAX_COMBINACIONES})")
+    indices = np.stack(np.unravel_index(np.arange(n), forma), axis=1)
+
+    columnas = {campo: np.repeat(np.asarray(valores), n) for campo, valores in base.items()}
+    for j, palanca in enumerate(palancas):
+        elegidas = np.asarray(opciones[palanca], dtype=object)[indices[:, j]]
+        if palanca in TEXTO:
+            columnas[palanca] = np.where(elegidas == 'actual', columnas[palanca], elegidas)
+            continue
+        if palanca == 'fraccion_compost':
+            cambia = elegidas != 'actual'
+            fraccion = np.where(cambia, elegidas, 0).astype(float) / 100
+            columnas['residuos_compostados'] = np.where(
+                cambia, columnas['residuos_totales'] * fraccion, columnas['residuos_compostados'])
+            continue
+        valor = elegidas.astype(float)
+        if palanca == 'arboles_adicionales_ha':
+            columnas['arboles_sombra'] = np.nan_to_num(columnas['arboles_sombra']) + valor * columnas['area_cultivada']
+        else:
+            campo = {'reduccion_combustible': 'combustible_litros',
+                     'reduccion_fertilizante': 'fertilizante_total',
+                     'reduccion_energia': 'energia_electrica'}[palanca]
+            columnas[campo] = columnas[campo] * (1 - valor / 100)
+    return columnas, indices
+
+
+def cobeneficios(base, opciones, factores=None):
+    """Árboles por ha y cobertura de sombra para cada opción de las palancas sin efecto en la huella."""
+    salida = {}
+    for palanca, valores in opciones.items():
+        if len(valores) < 2:
+            continue
+        columnas, _ = grilla(base, {palanca: valores})
+        resultado = huella.calcular_lote(columnas, factores)
+        salida[palanca] = [{
+            "valor": valores[i],
+            "arboles_por_ha": round(float(resultado['arboles_por_ha'][i]), 0),
+            "cobertura_porc": round(float(resultado['cobertura_porc'][i]), 1),
+        } for i in range(1, len(valores))]
+    return salida
+
+
+def evaluar(registro, opciones=PALANCAS, top=10, max_cambios=None, factores=None):
+    """Ranking de combinaciones para un cálculo (dict con nombres de columna)."""
+    base = huella.columnas_desde_registros([registro])
+    actual = huella.calcular_lote(base, factores)
+    if not actual['valido'][0]:
+        raise ValueError("El cálculo no tiene área y producción válidas")
+    extra = {p: v for p, v in opciones.items() if p in COBENEFICIOS}
+    opciones = _utiles({p: v for p, v in opciones.items() if p not in COBENEFICIOS}, base)
+    palancas = list(opciones)
+
+    columnas, indices = grilla(base, opciones)
+    resultado = huella.calcular_lote(columnas, factores)
+
+    por_kg_base = float(actual['por_kg'][0])
+    reduccion = por_kg_base - resultado['por_kg']
+    cambios = (indices > 0).sum(axis=1)
+    candidatas = cambios > 0
+    if max_cambios is not None:
+        candidatas &= cambios <= max_cambios
+    orden = np.flatnonzero(candidatas)
+    # Mayor reducción primero; a igual reducción, menos cambios
+    orden = orden[np.lexsort((cambios[orden], -reduccion[orden]))]
+
+    def describir(i):
+        return {
+            "cambios": {p: opciones[p][indices[i, j]] for j, p in enumerate(palancas) if indices[i, j]},
+            "huella_por_kg": round(float(resultado['por_kg'][i]), 4),
+            "huella_total": round(float(resultado['total'][i]), 2),
+            "reduccion_por_kg": round(float(reduccion[i]), 4),
+            "reduccion_porc": round(float(reduccion[i] / por_kg_base * 100), 1) if por_kg_base else None,
+            "cobertura_porc": round(float(resultado['cobertura_porc'][i]), 1),
+            "desglose": {cat: round(float(resultado[cat][i]), 2) for cat in huella.CATEGORIAS},
+        }
+
+    # Cada intervención por separado (una sola palanca cambiada), también ordenadas
+    individuales = orden[cambios[orden] == 1]
+    return {
+        "base": {
+            "huella_por_kg": round(por_kg_base, 4),
+            "huella_total": round(float(actual['total'][0]), 2),
+            "cobertura_porc": round(float(actual['cobertura_porc'][0]), 1),
+            "desglose": huella.desglose(actual, 0),
+        },
+        "palancas": {p: list(v[1:]) for p, v in opciones.items()},
+        "combinaciones": int(len(indices)),
+        "ranking": [describir(i) for i in orden[:top]],
+        "individuales": [describir(i) for i in individuales],
+        "cobeneficios": cobeneficios(base, extra, factores),
+    }
@@ -0,0 +1,163 @@
+# backend/exportar.py
+"""
+Exportación del historial a CSV o Excel en streaming.
+
+Las filas se leen con un cursor del lado del servidor (yield_per) y cada
+bloque se escribe y se entrega enseguida, así la memoria no crece con el
+número de filas y el primer byte sale antes de que termine la consulta.
+El .xlsx se arma como un zip en streaming (hoja con cadenas en línea),
+sin pasar por un archivo temporal.
+"""
+import csv
+import io
+import math
+import zipfile
+from xml.sax.saxutils import escape
+
+from models import db, User, CalculoEUDR
+import serializacion
+
+TAMANO_BLOQUE = 1000
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+COLUMNAS = serializacion.COLUMNAS
+
+
+def consulta(user_id=None, desde=None, hasta=None):
+    """SELECT de las columnas exportadas (con el usuario si es toda la cooperativa)."""
+    columnas = [getattr(CalculoEUDR, c) for c in COLUMNAS]
+    if user_id is None:
+        query = db.select(User.username, *columnas).join(User, User.id == CalculoEUDR.user_id)
+    else:
+        query = db.select(*columnas).where(CalculoEUDR.user_id == user_id)
+    if desde is not None:
+        query = query.where(CalculoEUDR.fecha >= desde)
+    if hasta is not None:
+        query = query.where(CalculoEUDR.fecha < hasta)
+    return query.order_by(CalculoEUDR.fecha, CalculoEUDR.id)
+
+
+def encabezados(user_id=None):
+    return (('username',) if user_id is None else ()) + COLUMNAS
+
+
+def filas(query, tamano=TAMANO_BLOQUE):
+    """Recorre el resultado por bloques con un cursor del servidor."""
+    return db.session.execute(query.execution_options(yield_per=tamano)).partitions()
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat(sep=' ')
+    return valor
+
+
+# --- CSV ---
+def generar_csv(cabecera, bloques):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')   # BOM: Excel abre el CSV como UTF-8
+    escritor.writerow(cabecera)
+    for bloque in bloques:
+        escritor.writerows([_texto(v) for v in fila] for fila in bloque)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# --- XLSX ---
+class _Salida:
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se retira."""
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+_XLSX_FIJOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Historial" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _celda(valor):
+    if valor is None:
+        return '<c/>'
+    # NaN e infinito no son números válidos en <v> (Excel rechaza el archivo):
+    # van como texto, igual que en el CSV
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool) and math.isfinite(valor):
+        return f'<c><v>{valor!r}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(_texto(valor)))}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return ('<row>' + ''.join(_celda(v) for v in valores) + '</row>').encode('utf-8')
+
+
+def generar_xlsx(cabecera, bloques):
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _XLSX_FIJOS.items():
+            libro.writestr(nombre, contenido)
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                       b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                       b'<sheetData>')
+            hoja.write(_fila_xml(cabecera))
+            yield salida.retirar()
+            for bloque in bloques:
+                hoja.write(b''.join(_fila_xml(fila) for fila in bloque))
+                yield salida.retirar()
+            hoja.write(b'</sheetData></worksheet>')
+    yield salida.retirar()
+
+
+def generar(formato, cabecera, bloques):
+    if formato == 'xlsx':
+        return generar_xlsx(cabecera, bloques)
+    return generar_csv(cabecera, bloques)
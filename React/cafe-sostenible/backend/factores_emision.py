@@ -0,0 +1,114 @@
+# backend/factores_emision.py
+"""
+Registro versionado de factores de emisión.
+
+Cada versión guarda el juego completo de factores (JSON) en
+versiones_factores y una sola está activa: la que usan los cálculos
+nuevos. Cada CalculoEUDR guarda con qué versión se calculó
+(factores_version_id); para pasar el historial a otra versión está
+recalcular.py.
+"""
+import json
+
+import numpy as np
+
+from models import db, VersionFactores
+import huella
+
+BASE = 'base'   # versión sembrada por la migración con huella.FACTORES
+
+
+def valores(version):
+    """Factores de una versión; los que no guarda (agregados después al código) salen de huella.FACTORES."""
+    factores = dict(huella.FACTORES)
+    if version is not None:
+        factores.update(json.loads(version.valores))
+    return factores
+
+
+def activa():
+    """(versión activa o None si no hay ninguna, factores)."""
+    version = VersionFactores.query.filter_by(activa=True).first()
+    return version, valores(version)
+
+
+def validar(cambios):
+    if not isinstance(cambios, dict) or not cambios:
+        raise ValueError("Los factores deben ser un objeto {factor: valor}")
+    desconocidos = set(cambios) - set(huella.FACTORES)
+    if desconocidos:
+        raise ValueError(f"Factores desconocidos: {', '.join(sorted(desconocidos))}")
+    validos = {}
+    for factor, valor in cambios.items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not np.isfinite(valor) or valor < 0:
+            raise ValueError(f"'{factor}' debe ser un número mayor o igual a 0")
+        validos[factor] = float(valor)
+    return validos
+
+
+def crear(nombre, cambios, descripcion=None, activar_ya=False):
+    """Nueva versión = factores de la versión activa con `cambios` encima."""
+    if VersionFactores.query.filter_by(nombre=nombre).first() is not None:
+        raise ValueError(f"Ya existe la versión '{nombre}'")
+    factores = activa()[1]
+    factores.update(validar(cambios))
+    version = VersionFactores(nombre=nombre, descripcion=descripcion, valores=json.dumps(factores))
+    db.session.add(version)
+    db.session.commit()
+    if activar_ya:
+        activar(version)
+    return version
+
+
+def activar(version):
+    """Marca `version` como la activa (la anterior deja de serlo en la misma transacción)."""
+    db.session.query(VersionFactores).filter(VersionFactores.activa.is_(True)) \
+        .update({VersionFactores.activa: False}, synchronize_session=False)
+    db.session.flush()   # el índice único no admite dos activas ni por un instante
+    version.activa = True
+    db.session.commit()
+
+
+def buscar(id_o_nombre):
+    """Versión por id (número) o por nombre; None si no existe."""
+    if str(id_o_nombre).isdigit():
+        return db.session.get(VersionFactores, int(id_o_nombre))
+    return VersionFactores.query.filter_by(nombre=str(id_o_nombre)).first()
+
+
+def por_fila(version_ids):
+    """
+    {factor: arreglo (filas,)} con los factores de la versión de cada fila,
+    para calcular_lote. Las filas sin versión usan la 'base'.
+    """
+    version_ids = list(version_ids)
+    distintas = {v for v in version_ids if v is not None}
+    versiones = {v.id: valores(v) for v in VersionFactores.query.filter(VersionFactores.id.in_(distintas))} \
+        if distintas else {}
+    base = VersionFactores.query.filter_by(nombre=BASE).first()
+    versiones[None] = valores(base)
+    version_ids = [v if v in versiones else None for v in version_ids]
+    if len(set(version_ids)) <= 1:
+        return versiones[version_ids[0] if version_ids else None]   # una sola versión: escalares
+    return {factor: np.array([versiones[v][factor] for v in version_ids]) for factor in huella.FACTORES}
+
+
+def describir(version):
+    return {
+        "id": version.id,
+        "nombre": version.nombre,
+        "descripcion": version.descripcion,
+        "activa": version.activa,
+        "creada": version.creada.isoformat(),
+        "factores": valores(version),
+    }
+
+
+def sembrar_base():
+    """Crea la versión 'base' (activa) con huella.FACTORES si la tabla está vacía."""
+    if db.session.query(VersionFactores.id).first() is not None:
+        return False
+    db.session.add(VersionFactores(nombre=BASE, descripcion="Factores originales del frontend",
+                                   valores=json.dumps(huella.FACTORES), activa=True))
+    db.session.commit()
+    return True
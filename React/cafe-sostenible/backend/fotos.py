@@ -0,0 +1,282 @@
+# backend/fotos.py
+"""
+Fotos de perfil direccionadas por contenido.
+
+Cada imagen se guarda una sola vez en fotos_perfil con el SHA-256 de lo
+que se subió como clave; los usuarios solo guardan el hash. La URL se
+puede cachear indefinidamente: bajo un hash siempre está la misma imagen.
+Por eso una fila de fotos_perfil no se modifica nunca: todo lo que sale
+de la transcodificación va a fotos_variantes.
+
+Ingesta:
+- La subida llega en un SpooledTemporaryFile de Werkzeug (a disco pasado
+  cierto tamaño) y la petición se corta con 413 si supera BYTES_PETICION.
+- `recibir` la lee por bloques calculando el hash, corta en BYTES_MAXIMOS
+  y verifica el formato real por la cabecera (no el mimetype del cliente).
+- Después del commit, `programar` la transcodifica en un pool de hilos
+  acotado: se crean las variantes WebP de VARIANTES en fotos_variantes
+  ('grande' es el original reducido a LADO_MAXIMO). La petición no espera
+  la transcodificación.
+- `flask fotos-reducir` hace lo mismo con las fotos ya guardadas.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app, url_for
+from sqlalchemy.exc import IntegrityError
+
+from models import db, FotoPerfil, FotoVariante
+
+FOTO_POR_DEFECTO = "/img/usuarios/default-user.png"
+MIMES_PERMITIDOS = {'image/png', 'image/jpeg', 'image/webp', 'image/gif'}
+FORMATOS = {'PNG': 'image/png', 'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+
+BYTES_MAXIMOS = int(os.getenv("FOTO_MAX_BYTES", 5 * 1024 * 1024))
+BYTES_PETICION = BYTES_MAXIMOS + 64 * 1024      # margen para los demás campos del formulario
+PIXELES_MAXIMOS = int(os.getenv("FOTO_MAX_PIXELES", 40_000_000))
+BLOQUE = 64 * 1024
+
+LADO_MAXIMO = int(os.getenv("FOTO_LADO_MAXIMO", 1280))
+VARIANTES = {'grande': LADO_MAXIMO, 'avatar': 256, 'miniatura': 64}    # nombre → lado máximo en px
+CALIDAD_WEBP = 80
+
+HILOS = int(os.getenv("FOTOS_HILOS", 2))
+COLA_MAXIMA = int(os.getenv("FOTOS_COLA", 16))
+
+
+class FotoInvalida(ValueError):
+    pass
+
+
+# --- INGESTA ---
+def recibir(archivo):
+    """
+    Lee la foto subida (FileStorage) por bloques. Devuelve (hash, mime, datos)
+    o lanza FotoInvalida sin haber leído más de BYTES_MAXIMOS.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    sha, partes, total = hashlib.sha256(), [], 0
+    while True:
+        bloque = archivo.stream.read(BLOQUE)
+        if not bloque:
+            break
+        total += len(bloque)
+        if total > BYTES_MAXIMOS:
+            raise FotoInvalida(f"Imagen > {BYTES_MAXIMOS // (1024 * 1024)}MB")
+        sha.update(bloque)
+        partes.append(bloque)
+    if not total:
+        raise FotoInvalida("La imagen está vacía")
+    datos = b"".join(partes)
+
+    # Image.open solo lee la cabecera: formato y dimensiones sin decodificar
+    try:
+        with Image.open(io.BytesIO(datos)) as imagen:
+            formato, (ancho, alto) = imagen.format, imagen.size
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise FotoInvalida("Formato no permitido")
+    if formato not in FORMATOS:
+        raise FotoInvalida("Formato no permitido")
+    if ancho * alto > PIXELES_MAXIMOS:
+        raise FotoInvalida("Imagen con demasiados píxeles")
+    return sha.hexdigest(), FORMATOS[formato], datos
+
+
+def guardar_foto(blob, mime, digest=None):
+    """Guarda la foto si no existe (deduplicada) y devuelve su hash. No hace commit."""
+    digest = digest or hashlib.sha256(blob).hexdigest()
+    existe = db.session.query(FotoPerfil.hash).filter_by(hash=digest).scalar()
+    if existe is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(FotoPerfil(hash=digest, mime=mime, datos=blob, tamano=len(blob)))
+        except IntegrityError:
+            # Otra subida guardó la misma foto entre la consulta y el INSERT
+            pass
+    return digest
+
+
+# --- TRANSCODIFICACIÓN ---
+def _webp(imagen, lado):
+    from PIL import Image
+
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+    salida = io.BytesIO()
+    copia.save(salida, 'WEBP', quality=CALIDAD_WEBP, method=4)
+    return salida.getvalue()
+
+
+def transcodificar(datos):
+    """
+    Puede correr en un hilo o en otro proceso (no usa la base). Devuelve
+    {variante: bytes}; 'grande' es None si no pesa menos que el original
+    (entonces el original ya sirve como 'grande').
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = PIXELES_MAXIMOS
+    with Image.open(io.BytesIO(datos)) as imagen:
+        imagen.seek(0)                               # GIF animado: primer cuadro
+        imagen = ImageOps.exif_transpose(imagen)     # fotos del teléfono giradas
+        if imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGBA' if imagen.has_transparency_data else 'RGB')
+        resultado = {nombre: _webp(imagen, lado) for nombre, lado in VARIANTES.items()}
+    if len(resultado['grande']) >= len(datos):
+        resultado['grande'] = None
+    return resultado
+
+
+def aplicar(foto_hash, resultado):
+    """Guarda las variantes de una foto (la fila de fotos_perfil no se toca). No hace commit."""
+    for nombre in VARIANTES:
+        if resultado[nombre] is None:
+            continue
+        db.session.merge(FotoVariante(foto_hash=foto_hash, variante=nombre, mime='image/webp',
+                                      datos=resultado[nombre], tamano=len(resultado[nombre])))
+
+
+def reducir(foto_hash):
+    """Transcodifica una foto guardada y confirma. Devuelve False si no existe o no se pudo."""
+    # Ya reducida (p. ej. la misma foto subida por otro usuario): no se recomprime
+    if db.session.query(FotoVariante.foto_hash).filter_by(foto_hash=foto_hash).first() is not None:
+        return True
+    datos = db.session.query(FotoPerfil.datos).filter_by(hash=foto_hash).scalar()
+    if datos is None:
+        return False
+    try:
+        resultado = transcodificar(datos)
+    except Exception as e:
+        current_app.logger.warning("No se pudo transcodificar la foto %s: %s", foto_hash[:12], e)
+        return False
+    try:
+        aplicar(foto_hash, resultado)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return True
+
+
+# --- POOL EN SEGUNDO PLANO ---
+_pool = None
+_lock = threading.Lock()
+_pendientes = set()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(HILOS, thread_name_prefix='fotos')
+    return _pool
+
+
+def _trabajar(app, foto_hash):
+    try:
+        with app.app_context():
+            reducir(foto_hash)
+    except Exception:
+        app.logger.exception("Error al reducir la foto %s", foto_hash[:12])
+    finally:
+        with _lock:
+            _pendientes.discard(foto_hash)
+
+
+def programar(foto_hash):
+    """
+    Encola la transcodificación (llamar después del commit). Con la cola
+    llena no se encola: la foto se sirve como está y la próxima petición
+    de una variante, o `flask fotos-reducir`, la vuelve a programar.
+    """
+    with _lock:
+        if foto_hash in _pendientes or len(_pendientes) >= COLA_MAXIMA:
+            return False
+        _pendientes.add(foto_hash)
+        pool = _obtener_pool()
+    pool.submit(_trabajar, current_app._get_current_object(), foto_hash)
+    return True
+
+
+# --- REDUCCIÓN DE LAS FOTOS GUARDADAS (flask fotos-reducir) ---
+def _transcodificar_seguro(datos):
+    try:
+        return transcodificar(datos)
+    except Exception:
+        return None
+
+
+def _sin_variantes(desde_hash, tamano_lote):
+    """Fotos sin variantes con hash > desde_hash (keyset): [(hash, datos)]."""
+    tiene_variantes = db.session.query(FotoVariante.foto_hash) \
+        .filter(FotoVariante.foto_hash == FotoPerfil.hash).exists()
+    return db.session.query(FotoPerfil.hash, FotoPerfil.datos) \
+        .filter(FotoPerfil.hash > desde_hash, ~tiene_variantes) \
+        .order_by(FotoPerfil.hash).limit(tamano_lote).all()
+
+
+def reducir_todas(tamano_lote=20, procesos=None, log=print):
+    """
+    Genera las variantes de las fotos guardadas que todavía no las tienen, por lotes.
+    bytes_antes/bytes_despues comparan el original con la variante 'grande'.
+    Los procesos del pool transcodifican; este proceso escribe y confirma
+    cada lote, así que se puede interrumpir y volver a correr.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    reporte = {"reducidas": 0, "con_error": 0, "bytes_antes": 0, "bytes_despues": 0}
+
+    def escribir(foto_hash, antes, resultado):
+        if resultado is None:
+            reporte["con_error"] += 1
+            log(f"No se pudo transcodificar {foto_hash[:12]}")
+            return
+        aplicar(foto_hash, resultado)
+        reporte["reducidas"] += 1
+        reporte["bytes_antes"] += antes
+        reporte["bytes_despues"] += len(resultado['grande']) if resultado['grande'] is not None else antes
+
+    def lotes():
+        ultimo = ''
+        while True:
+            filas = _sin_variantes(ultimo, tamano_lote)
+            if not filas:
+                return
+            ultimo = filas[-1].hash
+            yield [(foto_hash, datos) for foto_hash, datos in filas]
+
+    def confirmar():
+        db.session.commit()
+        db.session.expunge_all()
+        log(f"{reporte['reducidas']} reducidas, {reporte['con_error']} con error "
+            f"({reporte['bytes_antes']:,} → {reporte['bytes_despues']:,} bytes)")
+
+    if procesos == 1:
+        for lote in lotes():
+            for foto_hash, datos in lote:
+                escribir(foto_hash, len(datos), _transcodificar_seguro(datos))
+            confirmar()
+        return reporte
+
+    # Cada lote se consulta después de escribir el anterior: el keyset avanza en orden
+    with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for lote in lotes():
+            pendientes = deque((foto_hash, len(datos), pool.submit(_transcodificar_seguro, datos))
+                               for foto_hash, datos in lote)
+            while pendientes:
+                foto_hash, antes, futuro = pendientes.popleft()
+                escribir(foto_hash, antes, futuro.result())
+            confirmar()
+    return reporte
+
+
+def url_foto(foto_hash, variante='avatar'):
+    if not foto_hash:
+        return FOTO_POR_DEFECTO
+    if variante is None:
+        return url_for('api.foto_usuario', foto_hash=foto_hash, _external=True)
+    return url_for('api.foto_variante', foto_hash=foto_hash, variante=variante, _external=True)
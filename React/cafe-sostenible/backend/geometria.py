@@ -0,0 +1,231 @@
+# backend/geometria.py
+"""
+Polígonos de fincas (GeoJSON, lon/lat WGS84) con NumPy, sin librerías GIS.
+
+- leer: Polygon, MultiPolygon, Feature o FeatureCollection → lista de
+  polígonos, cada uno una lista de anillos (el primero es el borde, los
+  demás huecos) como arrays (n, 2).
+- area_ha: área en hectáreas (proyección equirectangular local; el error
+  es despreciable a escala de finca).
+- mascara: qué centros de píxel de una grilla regular caen dentro
+  (barrido por filas con la regla par-impar, así los huecos se restan).
+- ArbolR: R-tree estático empaquetado con STR para buscar por caja.
+"""
+import json
+import math
+
+import numpy as np
+
+RADIO_TIERRA = 6371008.8          # m (radio medio)
+M_POR_GRADO = math.pi / 180 * RADIO_TIERRA
+MAX_VERTICES = 20000
+
+
+class GeometriaInvalida(ValueError):
+    pass
+
+
+# --- LECTURA Y VALIDACIÓN ---
+def _anillo(coordenadas):
+    try:
+        anillo = np.asarray(coordenadas, dtype=float)
+    except (TypeError, ValueError):
+        raise GeometriaInvalida("Coordenadas no numéricas")
+    if anillo.ndim != 2 or anillo.shape[1] < 2:
+        raise GeometriaInvalida("Cada anillo debe ser una lista de [lon, lat]")
+    anillo = anillo[:, :2]
+    if not np.all(np.isfinite(anillo)):
+        raise GeometriaInvalida("Coordenadas no numéricas")
+    if np.any(np.abs(anillo[:, 0]) > 180) or np.any(np.abs(anillo[:, 1]) > 90):
+        raise GeometriaInvalida("Coordenadas fuera de rango: se esperan [lon, lat] en grados")
+    if not np.array_equal(anillo[0], anillo[-1]):
+        anillo = np.vstack([anillo, anillo[:1]])
+    if len(anillo) < 4:
+        raise GeometriaInvalida("Cada anillo necesita al menos 3 vértices")
+    return anillo
+
+
+def _geometrias(objeto):
+    """Geometrías (dict) de un objeto GeoJSON, con las propiedades de su Feature."""
+    tipo = objeto.get('type') if isinstance(objeto, dict) else None
+    if tipo == 'FeatureCollection':
+        for feature in objeto.get('features') or []:
+            yield from _geometrias(feature)
+    elif tipo == 'Feature':
+        geometria = objeto.get('geometry')
+        if not isinstance(geometria, dict):
+            raise GeometriaInvalida("Feature sin geometría")
+        yield geometria, objeto.get('properties') or {}
+    elif tipo in ('Polygon', 'MultiPolygon'):
+        yield objeto, {}
+    else:
+        raise GeometriaInvalida("Se espera GeoJSON Polygon, MultiPolygon, Feature o FeatureCollection")
+
+
+def leer_geometria(geometria):
+    """Polygon o MultiPolygon → lista de polígonos (listas de anillos)."""
+    if geometria.get('type') == 'Polygon':
+        partes = [geometria.get('coordinates')]
+    elif geometria.get('type') == 'MultiPolygon':
+        partes = geometria.get('coordinates')
+    else:
+        raise GeometriaInvalida("Solo se aceptan polígonos (Polygon o MultiPolygon)")
+    if not isinstance(partes, list) or not partes:
+        raise GeometriaInvalida("Polígono sin coordenadas")
+
+    poligonos = []
+    for parte in partes:
+        if not isinstance(parte, list) or not parte:
+            raise GeometriaInvalida("Polígono sin coordenadas")
+        poligonos.append([_anillo(anillo) for anillo in parte])
+    if sum(len(a) for p in poligonos for a in p) > MAX_VERTICES:
+        raise GeometriaInvalida(f"Máximo {MAX_VERTICES} vértices por polígono")
+    if area_ha(poligonos) <= 0:
+        raise GeometriaInvalida("El polígono no tiene área")
+    return poligonos
+
+
+def leer(geojson):
+    """GeoJSON (dict o texto) → [(polígonos, propiedades)] por cada geometría."""
+    if isinstance(geojson, (str, bytes)):
+        try:
+            geojson = json.loads(geojson)
+        except ValueError:
+            raise GeometriaInvalida("GeoJSON inválido")
+    resultado = [(leer_geometria(g), propiedades) for g, propiedades in _geometrias(geojson)]
+    if not resultado:
+        raise GeometriaInvalida("El GeoJSON no tiene polígonos")
+    return resultado
+
+
+def a_geojson(poligonos):
+    """Lista de polígonos → geometría GeoJSON (dict)."""
+    coordenadas = [[anillo.round(8).tolist() for anillo in poligono] for poligono in poligonos]
+    if len(coordenadas) == 1:
+        return {"type": "Polygon", "coordinates": coordenadas[0]}
+    return {"type": "MultiPolygon", "coordinates": coordenadas}
+
+
+# --- MEDIDAS ---
+def caja(poligonos):
+    """(lon_min, lat_min, lon_max, lat_max) de los bordes exteriores."""
+    puntos = np.vstack([poligono[0] for poligono in poligonos])
+    return (*puntos.min(axis=0), *puntos.max(axis=0))
+
+
+def _area_anillo_m2(anillo, lat0):
+    x = anillo[:, 0] * M_POR_GRADO * math.cos(math.radians(lat0))
+    y = anillo[:, 1] * M_POR_GRADO
+    return abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+
+
+def area_ha(poligonos):
+    _, lat_min, _, lat_max = caja(poligonos)
+    lat0 = (lat_min + lat_max) / 2
+    total = 0.0
+    for poligono in poligonos:
+        total += _area_anillo_m2(poligono[0], lat0) - sum(_area_anillo_m2(h, lat0) for h in poligono[1:])
+    return total / 10000
+
+
+def mascara(poligonos, lon0, lat0, dlon, dlat, columnas, filas):
+    """
+    Píxeles (filas, columnas) cuyo centro cae dentro. La grilla empieza en la
+    esquina noroeste (lon0, lat0); las filas bajan dlat grados cada una.
+    """
+    dentro = np.zeros((filas, columnas), dtype=bool)
+    if not filas or not columnas:
+        return dentro
+    lats = lat0 - (np.arange(filas) + 0.5) * dlat               # centro de cada fila
+    for poligono in poligonos:
+        # Bordes de todos los anillos: la regla par-impar resta los huecos
+        bordes = np.vstack([np.hstack([a[:-1], a[1:]]) for a in poligono])
+        x1, y1, x2, y2 = bordes.T
+        cruza = (y1[None, :] > lats[:, None]) != (y2[None, :] > lats[:, None])     # (filas, bordes)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = x1 + (lats[:, None] - y1) * (x2 - x1) / (y2 - y1)
+        fila, borde = np.nonzero(cruza)
+        # Primer píxel cuyo centro queda a la derecha de cada cruce: ahí cambia la paridad
+        col = np.ceil((x[fila, borde] - lon0) / dlon - 0.5).astype(np.int64)
+        col = np.clip(col, 0, columnas)
+        cambios = np.zeros((filas, columnas + 1), dtype=np.int32)
+        np.add.at(cambios, (fila, col), 1)
+        dentro |= (np.cumsum(cambios, axis=1)[:, :columnas] % 2) == 1
+    return dentro
+
+
+# --- ÍNDICE ESPACIAL ---
+def _orden_str(cajas, capacidad):
+    """Orden Sort-Tile-Recursive: franjas por x, y dentro de cada franja por y."""
+    n = len(cajas)
+    centros = (cajas[:, :2] + cajas[:, 2:]) / 2
+    franjas = max(1, math.ceil(math.sqrt(math.ceil(n / capacidad))))
+    por_franja = franjas * capacidad
+    orden_x = np.argsort(centros[:, 0], kind='stable')
+    partes = []
+    for inicio in range(0, n, por_franja):
+        franja = orden_x[inicio:inicio + por_franja]
+        partes.append(franja[np.argsort(centros[franja, 1], kind='stable')])
+    return np.concatenate(partes)
+
+
+def _rangos(inicio, fin):
+    """Concatena arange(inicio[i], fin[i]) para todo i, sin bucle en Python."""
+    largos = fin - inicio
+    desplazamiento = np.repeat(inicio - np.cumsum(largos) + largos, largos)
+    return np.arange(largos.sum()) + desplazamiento
+
+
+class ArbolR:
+    """
+    R-tree estático (STR) sobre cajas (n, 4) = lon_min, lat_min, lon_max, lat_max.
+    Cada nivel guarda las cajas de sus nodos y el rango [inicio, fin) de
+    hijos en el nivel de abajo; el último nivel apunta a los elementos.
+    """
+
+    def __init__(self, cajas, ids, capacidad=16):
+        cajas = np.asarray(cajas, dtype=float).reshape(-1, 4)
+        self.capacidad = capacidad
+        self.niveles = []
+        if not len(cajas):
+            self.cajas, self.ids = cajas, np.asarray(ids)
+            return
+        orden = _orden_str(cajas, capacidad)
+        self.cajas, self.ids = cajas[orden], np.asarray(ids)[orden]
+
+        hijos = self.cajas
+        while True:
+            inicio = np.arange(0, len(hijos), capacidad)
+            fin = np.minimum(inicio + capacidad, len(hijos))
+            nodos = np.column_stack([
+                np.minimum.reduceat(hijos[:, 0], inicio), np.minimum.reduceat(hijos[:, 1], inicio),
+                np.maximum.reduceat(hijos[:, 2], inicio), np.maximum.reduceat(hijos[:, 3], inicio),
+            ])
+            self.niveles.append((nodos, inicio, fin))
+            if len(nodos) == 1:
+                break
+            # El nivel de arriba agrupa estos nodos en orden STR: se reordenan con sus rangos
+            orden = _orden_str(nodos, capacidad)
+            self.niveles[-1] = (nodos[orden], inicio[orden], fin[orden])
+            hijos = nodos[orden]
+        self.niveles.reverse()   # raíz primero
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _tocan(cajas, q):
+        return (cajas[:, 0] <= q[2]) & (cajas[:, 2] >= q[0]) & (cajas[:, 1] <= q[3]) & (cajas[:, 3] >= q[1])
+
+    def buscar(self, consulta):
+        """Ids de los elementos cuya caja toca la caja `consulta`."""
+        if not self.niveles:
+            return []
+        candidatos = np.arange(len(self.niveles[0][0]))
+        for nodos, inicio, fin in self.niveles:
+            candidatos = candidatos[self._tocan(nodos[candidatos], consulta)]
+            if not len(candidatos):
+                return []
+            candidatos = _rangos(inicio[candidatos], fin[candidatos])
+        candidatos = candidatos[self._tocan(self.cajas[candidatos], consulta)]
+        return self.ids[candidatos].tolist()
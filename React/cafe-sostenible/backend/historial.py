@@ -0,0 +1,187 @@
+# backend/historial.py
+"""
+Consultas de lectura del historial: GET /api/historial y /api/v1/historial
+pasan por `pagina`, que reúne fechas (search/month/from/to), filtros de
+busqueda.py, cursor u offset y total.
+
+Cada forma de consulta (qué columnas, qué condiciones, cursor u offset) se
+arma una sola vez como select() con bindparam y queda en un lru_cache. Una
+petición solo junta los valores en un dict de parámetros: no construye la
+sentencia, su clave de caché ya está calculada y SQLAlchemy encuentra el SQL
+compilado en el caché del engine.
+
+    python benchmarks/historial_consultas.py
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from models import db, CalculoEUDR
+import busqueda
+import serializacion
+
+PER_PAGE_MAXIMO = 100
+LIMITE_CONTEO = 1000   # tope del total aproximado
+ORDEN = (CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc())
+
+
+# --- PARÁMETROS ---
+def rango_fechas(args):
+    """
+    Traduce search (día), month (YYYY-MM), from y to (YYYY-MM-DD, inclusivos)
+    a un rango [desde, hasta) sobre la columna fecha, que sí puede usar el índice.
+    """
+    desde = hasta = None
+
+    search = args.get('search', '').strip()
+    if search:
+        try:
+            desde = datetime.strptime(search, '%Y-%m-%d')
+            hasta = desde + timedelta(days=1)
+        except ValueError:
+            pass  # No es fecha → busqueda.leer la toma como nombre de finca
+
+    month = args.get('month', '').strip()
+    if month:
+        inicio = datetime.strptime(month, '%Y-%m')
+        desde = inicio
+        hasta = (inicio + timedelta(days=32)).replace(day=1)
+
+    if args.get('from'):
+        desde = datetime.strptime(args['from'].strip(), '%Y-%m-%d')
+    if args.get('to'):
+        hasta = datetime.strptime(args['to'].strip(), '%Y-%m-%d') + timedelta(days=1)
+
+    return desde, hasta
+
+
+def _leer_cursor(valor):
+    """Cursor `<fecha ISO>,<id>` del último elemento de la página anterior."""
+    fecha, _, ident = valor.rpartition(',')
+    return datetime.fromisoformat(fecha), int(ident)
+
+
+def _crear_cursor(fila):
+    return f"{fila.fecha.isoformat()},{fila.id}"
+
+
+def _condiciones(user_id, desde, hasta, filtros):
+    """(nombres de condición, parámetros) de fechas y filtros."""
+    nombres, parametros = busqueda.condiciones(filtros, user_id)
+    parametros['user_id'] = user_id
+    if desde is not None:
+        nombres += ('desde',)
+        parametros['desde'] = desde
+    if hasta is not None:
+        nombres += ('hasta',)
+        parametros['hasta'] = hasta
+    return nombres, parametros
+
+
+# --- SENTENCIAS (una por forma) ---
+def _expresion(nombre):
+    if nombre == 'desde':
+        return CalculoEUDR.fecha >= db.bindparam('desde')
+    if nombre == 'hasta':
+        return CalculoEUDR.fecha < db.bindparam('hasta')
+    return busqueda.expresion(nombre)
+
+
+def _filtrada(seleccion, condiciones):
+    return seleccion.where(CalculoEUDR.user_id == db.bindparam('user_id'),
+                           *(_expresion(n) for n in condiciones))
+
+
+@lru_cache(maxsize=64)
+def _sentencia_conteo(condiciones, aproximado):
+    """Total exacto, o contado hasta LIMITE_CONTEO + 1 (TOP/LIMIT fijo)."""
+    if not aproximado:
+        return _filtrada(db.select(db.func.count()).select_from(CalculoEUDR), condiciones)
+    acotada = _filtrada(db.select(CalculoEUDR.id), condiciones).limit(LIMITE_CONTEO + 1).subquery()
+    return db.select(db.func.count()).select_from(acotada)
+
+
+@lru_cache(maxsize=256)
+def _sentencia_pagina(columnas, condiciones, paginacion):
+    """
+    Filas (o solo ids si columnas es None) de una página, en orden fecha, id
+    descendente. paginacion: 'cursor', 'offset' o None (primera página).
+    """
+    if columnas is None:
+        seleccion = db.select(CalculoEUDR.id)
+    else:
+        seleccion = db.select(*(getattr(CalculoEUDR, c) for c in columnas))
+    stmt = _filtrada(seleccion, condiciones).order_by(*ORDEN)
+    if paginacion == 'cursor':
+        fecha, ident = db.bindparam('fecha_cursor', type_=db.DateTime), db.bindparam('id_cursor', type_=db.Integer)
+        stmt = stmt.where(db.or_(CalculoEUDR.fecha < fecha,
+                                 db.and_(CalculoEUDR.fecha == fecha, CalculoEUDR.id < ident)))
+    elif paginacion == 'offset':
+        stmt = stmt.offset(db.bindparam('offset', type_=db.Integer))
+    return stmt.limit(db.bindparam('limite', type_=db.Integer))
+
+
+@lru_cache(maxsize=64)
+def _sentencia_por_ids(columnas):
+    return db.select(*(getattr(CalculoEUDR, c) for c in columnas)) \
+        .where(CalculoEUDR.user_id == db.bindparam('user_id'),
+               CalculoEUDR.id.in_(db.bindparam('ids', expanding=True))) \
+        .order_by(*ORDEN)
+
+
+# --- PÁGINA ---
+def pagina(user_id, args, per_page_defecto, columnas=serializacion.COLUMNAS):
+    """
+    Pagina por cursor (?after=) o, por compatibilidad, por número de página.
+    El total es opcional: total=exact, approx (contado hasta LIMITE_CONTEO) o none.
+    ValueError (busqueda.FiltroInvalido para los filtros) si algún parámetro no sirve.
+    """
+    desde, hasta = rango_fechas(args)
+    filtros = busqueda.leer(args)
+    condiciones, parametros = _condiciones(user_id, desde, hasta, filtros)
+    columnas = tuple(columnas)
+
+    per_page = max(1, min(args.get('per_page', per_page_defecto, type=int), PER_PAGE_MAXIMO))
+    after = args.get('after', '').strip()
+    page = args.get('page', 1, type=int)
+    modo_total = args.get('total', 'none' if after else 'exact')
+
+    # Conteo sobre las mismas condiciones (usa el índice del filtro o user_id, fecha)
+    total = None
+    total_exacto = True
+    if modo_total in ('exact', 'approx'):
+        total = db.session.execute(_sentencia_conteo(condiciones, modo_total == 'approx'), parametros).scalar()
+        if total > LIMITE_CONTEO and modo_total == 'approx':
+            total, total_exacto = LIMITE_CONTEO, False
+
+    paginacion = None
+    if after:
+        paginacion = 'cursor'
+        parametros['fecha_cursor'], parametros['id_cursor'] = _leer_cursor(after)
+        page = None
+    elif page > 1:
+        paginacion = 'offset'
+        parametros['offset'] = (page - 1) * per_page
+    # Se pide un elemento extra para saber si hay página siguiente sin contar
+    parametros['limite'] = per_page + 1
+
+    if filtros:
+        # Primero los ids de la página, que salen del índice del filtro, y después solo esas filas
+        ids = db.session.execute(_sentencia_pagina(None, condiciones, paginacion), parametros).scalars().all()
+        filas = db.session.execute(_sentencia_por_ids(columnas), {'user_id': user_id, 'ids': ids}).all() \
+            if ids else []
+    else:
+        filas = db.session.execute(_sentencia_pagina(columnas, condiciones, paginacion), parametros).all()
+    has_next = len(filas) > per_page
+    items = filas[:per_page]
+
+    return {
+        "items": items,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "total_exacto": total_exacto,
+        "pages": -(-total // per_page) if total is not None else None,
+        "has_next": has_next,
+        "has_prev": bool(after) or (page or 1) > 1,
+        "next_cursor": _crear_cursor(items[-1]) if has_next else None,
+    }
@@ -0,0 +1,243 @@
+# backend/huella.py
+"""
+Motor de cálculo de huella de carbono (EUDR).
+
+Reproduce en el servidor la fórmula de `calcularHuella` (Calculadora.jsx),
+pero sobre columnas NumPy: un lote de miles de fincas se calcula en una
+sola pasada vectorizada.
+"""
+import numpy as np
+
+# --- FACTORES DE EMISIÓN (los mismos del frontend; versión 'base' de versiones_factores) ---
+FACTORES = {
+    'fert_sintetico': 4.5,      # kg CO₂e / kg fertilizante sintético
+    'fert_organico': 1.2,       # kg CO₂e / kg fertilizante orgánico
+    'pc_diesel': 36.0,          # MJ/L
+    'pc_gas': 38.0,             # MJ/L
+    'pc_otro': 45.0,            # MJ/L (gasolina, leña...)
+    'energia_red': 0.45,        # kg CO₂e / kWh
+    'transporte': 0.12,         # kg CO₂e / km
+    'proc_lavado': 0.30,        # kg CO₂e / kg café verde
+    'proc_miel': 0.20,
+    'proc_natural': 0.10,
+    'residuos': 0.5,            # kg CO₂e / kg residuo no compostado
+    'deforestacion': 1500.0,    # kg CO₂e / % deforestado
+}
+
+CATEGORIAS = (
+    'fertilizantes', 'energia', 'transporte',
+    'procesamiento', 'residuos', 'deforestacion',
+)
+
+# Campos numéricos y de texto de entrada (nombres de columna de CalculoEUDR)
+CAMPOS_NUMERICOS = (
+    'area_cultivada', 'produccion_verde', 'fertilizante_total',
+    'energia_electrica', 'combustible_litros', 'arboles_sombra',
+    'area_copa_promedio', 'distancia_km', 'volumen_cargas',
+    'residuos_totales', 'residuos_compostados', 'bosque_base', 'bosque_actual',
+    'area_bosque',
+)
+CAMPOS_TEXTO = ('tipo_fertilizante', 'tipo_combustible', 'tipo_procesamiento')
+# Valores que el motor distingue en los campos de texto con catálogo
+TIPOS_FERTILIZANTE = {'sintetico', 'organico'}
+TIPOS_PROCESAMIENTO = {'lavado', 'miel', 'natural'}
+
+# Nombres que envía el frontend (camelCase) → columna
+CAMPOS_PAYLOAD = {
+    'areaCultivada': 'area_cultivada',
+    'produccionVerde': 'produccion_verde',
+    'fertilizanteTotal': 'fertilizante_total',
+    'tipoFertilizante': 'tipo_fertilizante',
+    'energiaElectrica': 'energia_electrica',
+    'combustibleLitros': 'combustible_litros',
+    'tipoCombustible': 'tipo_combustible',
+    'arbolesSombra': 'arboles_sombra',
+    'areaCopaPromedio': 'area_copa_promedio',
+    'distanciaKm': 'distancia_km',
+    'volumenCargas': 'volumen_cargas',
+    'tipoProcesamiento': 'tipo_procesamiento',
+    'residuosTotales': 'residuos_totales',
+    'residuosCompostados': 'residuos_compostados',
+    'bosqueBase': 'bosque_base',
+    'bosqueActual': 'bosque_actual',
+}
+
+# Indicadores → (columna de CalculoEUDR, decimales usados por el frontend)
+INDICADORES = {
+    'total': ('huella_total', 2),
+    'por_kg': ('huella_por_kg', 3),
+    'fert_por_ha': ('fert_por_ha', 1),
+    'rendimiento': ('rendimiento', 0),
+    'energia_total': ('energia_total', 1),
+    'arboles_por_ha': ('arboles_por_ha', 0),
+    'cobertura_porc': ('cobertura_porc', 1),
+    'distancia_prom': ('distancia_prom', 1),
+    'fraccion_compost': ('fraccion_compost', 0),
+    'deforestacion_porc': ('deforestacion_porc', 1),
+}
+
+
+def _a_numero(valor):
+    """Convierte un valor del formulario a float; vacío o inválido → NaN (como parseFloat)."""
+    if valor is None or valor == '':
+        return np.nan
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def columnas_desde_registros(registros, claves=None):
+    """
+    Transpone una lista de diccionarios a columnas NumPy.
+    `claves` traduce nombres externos a columnas (p. ej. CAMPOS_PAYLOAD);
+    los registros pueden traer indistintamente nombres de columna.
+    """
+    claves = claves or {}
+    normalizados = []
+    for reg in registros:
+        fila = dict(reg)
+        for externo, columna in claves.items():
+            if externo in reg and columna not in reg:
+                fila[columna] = reg[externo]
+        normalizados.append(fila)
+
+    columnas = {}
+    for campo in CAMPOS_NUMERICOS:
+        columnas[campo] = np.array([_a_numero(f.get(campo)) for f in normalizados], dtype=float)
+    for campo in CAMPOS_TEXTO:
+        columnas[campo] = np.array([(f.get(campo) or '') for f in normalizados], dtype=object)
+    return columnas
+
+
+def calcular_lote(columnas, factores=None):
+    """
+    Calcula la huella para todas las filas de `columnas` en una pasada.
+
+    `factores` sobrescribe valores de FACTORES; cada factor puede ser un
+    escalar o un arreglo que haga broadcast con las filas.
+    Devuelve un dict con las emisiones por categoría, los indicadores y
+    `valido` (área y producción > 0). Las filas inválidas quedan en NaN.
+    """
+    f = dict(FACTORES)
+    if factores:
+        f.update(factores)
+
+    def num(campo):
+        return np.asarray(columnas[campo], dtype=float)
+
+    def cero(arr):
+        # Equivalente a `|| 0` de JS: NaN e infinitos → 0
+        return np.where(np.isfinite(arr), arr, 0.0)
+
+    ha = cero(num('area_cultivada'))
+    prod = cero(num('produccion_verde'))
+    valido = (ha > 0) & (prod > 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ha_div = np.where(valido, ha, np.nan)
+        prod_div = np.where(valido, prod, np.nan)
+
+        tipo_fert = np.asarray(columnas['tipo_fertilizante'], dtype=object)
+        tipo_comb = np.asarray(columnas['tipo_combustible'], dtype=object)
+        tipo_proc = np.asarray(columnas['tipo_procesamiento'], dtype=object)
+
+        # Fertilizantes
+        fert_por_ha = cero(num('fertilizante_total')) / ha_div
+        factor_fert = np.where(tipo_fert == 'sintetico', f['fert_sintetico'], f['fert_organico'])
+        fertilizantes = fert_por_ha * factor_fert * ha_div
+
+        # Energía
+        poder_calorifico = np.select(
+            [tipo_comb == 'diesel', tipo_comb == 'gas'],
+            [f['pc_diesel'], f['pc_gas']],
+            f['pc_otro'],
+        )
+        energia_comb = cero(num('combustible_litros')) * poder_calorifico / 3.6
+        energia_total = cero(num('energia_electrica')) + energia_comb
+        energia = energia_total * f['energia_red']
+
+        # Árboles de sombra
+        arboles = num('arboles_sombra')
+        arboles_por_ha = cero(arboles / ha_div)
+        cobertura_porc = cero(num('area_copa_promedio') * arboles / (ha_div * 10000) * 100)
+
+        # Transporte: la distancia solo cuenta si hay cargas registradas
+        volumen = num('volumen_cargas')
+        distancia_prom = cero(num('distancia_km') * volumen / np.where(cero(volumen) != 0, volumen, 1))
+        transporte = distancia_prom * f['transporte']
+
+        # Procesamiento (tipo desconocido → sin emisión)
+        coef_proc = np.select(
+            [tipo_proc == 'lavado', tipo_proc == 'miel', tipo_proc == 'natural'],
+            [f['proc_lavado'], f['proc_miel'], f['proc_natural']],
+            0.0,
+        )
+        procesamiento = prod * coef_proc
+
+        # Residuos
+        residuos_tot = cero(num('residuos_totales'))
+        residuos_comp = cero(num('residuos_compostados'))
+        fraccion_compost = np.where(residuos_tot > 0, residuos_comp / np.where(residuos_tot > 0, residuos_tot, 1), 0.0)
+        residuos = (residuos_tot - residuos_comp) * f['residuos']
+
+        # Deforestación: sobre el área de los polígonos si el bosque se midió en ellos
+        # (mismo porcentaje que la verificación), si no sobre el área cultivada
+        bosque_base = cero(num('bosque_base'))
+        bosque_actual = cero(num('bosque_actual'))
+        area_bosque = cero(num('area_bosque'))
+        area_defo = np.where(area_bosque > 0, area_bosque, ha_div)
+        deforestacion_porc = np.where(
+            bosque_base > 0,
+            np.maximum(0, (bosque_base - bosque_actual) / area_defo) * 100,
+            0.0,
+        )
+        deforestacion = np.where(deforestacion_porc > 0, deforestacion_porc * f['deforestacion'], 0.0)
+
+        total = fertilizantes + energia + transporte + procesamiento + residuos + deforestacion
+        por_kg = total / prod_div
+
+    resultado = {
+        'fertilizantes': fertilizantes,
+        'energia': energia,
+        'transporte': transporte,
+        'procesamiento': procesamiento,
+        'residuos': residuos,
+        'deforestacion': deforestacion,
+        'total': total,
+        'por_kg': por_kg,
+        'fert_por_ha': fert_por_ha,
+        'rendimiento': prod / ha_div,
+        'energia_total': energia_total,
+        'arboles_por_ha': arboles_por_ha,
+        'cobertura_porc': cobertura_porc,
+        'distancia_prom': distancia_prom,
+        'fraccion_compost': fraccion_compost * 100,  # el frontend lo guarda en %
+        'deforestacion_porc': deforestacion_porc,
+    }
+    # Las filas inválidas no producen resultados
+    for clave, arr in resultado.items():
+        resultado[clave] = np.where(valido, arr, np.nan)
+    resultado['valido'] = valido
+    return resultado
+
+
+def columnas_calculo(resultado, i):
+    """Columnas de resultados e indicadores de CalculoEUDR para la fila `i`, redondeadas como en el frontend."""
+    return {
+        columna: round(float(resultado[clave][i]), decimales)
+        for clave, (columna, decimales) in INDICADORES.items()
+    }
+
+
+def desglose(resultado, i):
+    """Emisiones por categoría (kg CO₂e) de la fila `i`."""
+    return {cat: round(float(resultado[cat][i]), 2) for cat in CATEGORIAS}
+
+
+def calcular(registro, claves=CAMPOS_PAYLOAD, factores=None):
+    """Atajo para un único registro. Devuelve (columnas_calculo, desglose) o None si es inválido."""
+    resultado = calcular_lote(columnas_desde_registros([registro], claves), factores)
+    if not resultado['valido'][0]:
+        return None
+    return columnas_calculo(resultado, 0), desglose(resultado, 0)
@@ -0,0 +1,257 @@
+# backend/importador.py
+"""
+Importación masiva de cálculos EUDR desde CSV/Excel.
+
+El archivo se recorre fila por fila (nunca se carga completo en memoria),
+cada fila se valida contra las columnas de CalculoEUDR y se inserta en
+lotes multi-fila, con una transacción acotada por lote.
+"""
+import csv
+import io
+import math
+import time
+from datetime import datetime
+
+from models import db, User, CalculoEUDR
+import huella
+import tendencias
+import benchmark
+import cache_respuestas
+import factores_emision
+import bosque
+
+TAMANO_LOTE = 1000
+MAX_ERRORES = 500   # errores detallados que se devuelven en el reporte
+
+# Encabezados aceptados → columna (además de los nombres de columna tal cual)
+ENCABEZADOS = dict(huella.CAMPOS_PAYLOAD, nombreFinca='nombre_finca')
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+# --- LECTURA EN STREAMING ---
+def leer_csv(stream):
+    """Genera (número de fila, dict) desde un flujo binario CSV."""
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    for numero, fila in enumerate(csv.DictReader(texto, dialect=dialecto), start=2):
+        yield numero, fila
+
+
+def leer_excel(stream):
+    """Genera (número de fila, dict) desde la primera hoja de un .xlsx en modo read_only."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Para importar Excel instala openpyxl: pip install openpyxl")
+
+    libro = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezados = [str(c).strip() if c is not None else '' for c in next(filas, [])]
+        for numero, valores in enumerate(filas, start=2):
+            if all(v is None for v in valores):
+                continue
+            yield numero, dict(zip(encabezados, valores))
+    finally:
+        libro.close()
+
+
+def leer_filas(stream, nombre_archivo):
+    if nombre_archivo.lower().endswith(('.xlsx', '.xlsm')):
+        return leer_excel(stream)
+    return leer_csv(stream)
+
+
+# --- VALIDACIÓN ---
+def _normalizar(fila):
+    normal = {}
+    for clave, valor in fila.items():
+        if clave is None:
+            continue
+        clave = clave.strip()
+        normal[ENCABEZADOS.get(clave, clave)] = valor.strip() if isinstance(valor, str) else valor
+    return normal
+
+
+def _numero(fila, campo, entero=False, requerido=False):
+    valor = fila.get(campo)
+    if valor is None or valor == '':
+        if requerido:
+            raise ErrorFila(f"'{campo}' es obligatorio")
+        return None
+    try:
+        numero = float(str(valor).replace(',', '.')) if isinstance(valor, str) else float(valor)
+    except (TypeError, ValueError):
+        # TypeError: lista u objeto en el JSON de /api/v1/historial/sync
+        raise ErrorFila(f"'{campo}' no es numérico: {valor!r}")
+    if not math.isfinite(numero) or numero < 0:
+        raise ErrorFila(f"'{campo}' debe ser un número positivo")
+    return int(numero) if entero else numero
+
+
+def _texto(fila, campo, permitidos=None, largo=20):
+    valor = fila.get(campo)
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (list, dict)):
+        raise ErrorFila(f"'{campo}' debe ser texto")
+    valor = str(valor).strip().lower()
+    if permitidos and valor not in permitidos:
+        raise ErrorFila(f"'{campo}' inválido: {valor!r}")
+    return valor[:largo]
+
+
+def _fecha(fila):
+    valor = fila.get('fecha')
+    if valor is None or valor == '':
+        return datetime.utcnow()
+    if isinstance(valor, datetime):
+        return valor
+    try:
+        return datetime.fromisoformat(str(valor).strip())
+    except ValueError:
+        raise ErrorFila(f"'fecha' inválida: {valor!r} (use YYYY-MM-DD)")
+
+
+def validar_fila(fila):
+    """Convierte una fila cruda en los valores de entrada de CalculoEUDR."""
+    fila = _normalizar(fila)
+    valores = {
+        'nombre_finca': str(fila.get('nombre_finca') or 'Cálculo sin nombre')[:100],
+        'fecha': _fecha(fila),
+        'area_cultivada': _numero(fila, 'area_cultivada', requerido=True),
+        'produccion_verde': _numero(fila, 'produccion_verde', requerido=True),
+        'fertilizante_total': _numero(fila, 'fertilizante_total'),
+        'tipo_fertilizante': _texto(fila, 'tipo_fertilizante', huella.TIPOS_FERTILIZANTE),
+        'energia_electrica': _numero(fila, 'energia_electrica'),
+        'combustible_litros': _numero(fila, 'combustible_litros'),
+        'tipo_combustible': _texto(fila, 'tipo_combustible'),
+        'arboles_sombra': _numero(fila, 'arboles_sombra', entero=True),
+        'area_copa_promedio': _numero(fila, 'area_copa_promedio'),
+        'distancia_km': _numero(fila, 'distancia_km'),
+        'volumen_cargas': _numero(fila, 'volumen_cargas'),
+        'tipo_procesamiento': _texto(fila, 'tipo_procesamiento', huella.TIPOS_PROCESAMIENTO),
+        'residuos_totales': _numero(fila, 'residuos_totales'),
+        'residuos_compostados': _numero(fila, 'residuos_compostados'),
+        'bosque_base': _numero(fila, 'bosque_base'),
+        'bosque_actual': _numero(fila, 'bosque_actual'),
+    }
+    if valores['area_cultivada'] <= 0 or valores['produccion_verde'] <= 0:
+        raise ErrorFila("Área cultivada y producción deben ser mayores a 0")
+    return valores, fila.get('username'), fila.get('user_id')
+
+
+# --- IMPORTACIÓN ---
+class _Usuarios:
+    """
+    Resuelve username/user_id de cada fila con una caché por importación.
+    Con `forzar` todas las filas son de `por_defecto`: una fila que indica
+    otro usuario (o uno que no existe) es un error.
+    """
+
+    def __init__(self, por_defecto, forzar=False):
+        self.por_defecto = por_defecto
+        self.forzar = forzar
+        self.cache = {}
+
+    def resolver(self, username, user_id):
+        encontrado = self._buscar(username, user_id)
+        if self.forzar and encontrado != self.por_defecto:
+            # Mismo mensaje exista o no el usuario: la importación web no revela usernames
+            raise ErrorFila("Solo se pueden importar cálculos propios (quite 'username'/'user_id')")
+        return encontrado
+
+    def _buscar(self, username, user_id):
+        if user_id not in (None, ''):
+            clave = ('id', str(user_id))
+            if clave not in self.cache:
+                try:
+                    existe = db.session.query(User.id).filter_by(id=int(float(user_id))).scalar()
+                except (ValueError, OverflowError):
+                    existe = None
+                self.cache[clave] = existe
+        elif username not in (None, ''):
+            clave = ('username', str(username))
+            if clave not in self.cache:
+                self.cache[clave] = db.session.query(User.id).filter_by(username=str(username)).scalar()
+        else:
+            if self.por_defecto is None:
+                raise ErrorFila("La fila no indica 'username' ni 'user_id'")
+            return self.por_defecto
+
+        if self.cache[clave] is None:
+            if self.forzar:
+                return None
+            raise ErrorFila(f"Usuario no encontrado: {clave[1]}")
+        return self.cache[clave]
+
+
+def insertar_lote(lote):
+    """Calcula el lote con el motor vectorizado y lo inserta en una sola transacción."""
+    version, factores = factores_emision.activa()
+    bosque.aplicar(lote)    # fincas verificadas: bosque del raster
+    columnas = huella.columnas_desde_registros(lote)
+    resultado = huella.calcular_lote(columnas, factores)
+    for i, fila in enumerate(lote):
+        fila.update(huella.columnas_calculo(resultado, i))
+        fila['factores_version_id'] = version.id if version else None
+    try:
+        db.session.execute(CalculoEUDR.__table__.insert(), lote)
+        tendencias.registrar(lote)
+        benchmark.registrar([f['fecha'] for f in lote], benchmark.valores_lote(resultado, columnas))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    cache_respuestas.invalidar(*{f"historial:{f['user_id']}" for f in lote})
+
+
+def importar(filas, user_id=None, tamano_lote=TAMANO_LOTE, forzar_usuario=False):
+    """
+    Importa un iterable de (número de fila, dict). `user_id` se usa para las
+    filas que no traen 'username' ni 'user_id'; con `forzar_usuario` (la
+    importación web) todas las filas son de `user_id`. Devuelve un reporte.
+    """
+    inicio = time.perf_counter()
+    usuarios = _Usuarios(user_id, forzar=forzar_usuario)
+    lote, errores = [], []
+    procesadas = insertadas = con_error = 0
+
+    for numero, fila in filas:
+        procesadas += 1
+        try:
+            valores, username, uid = validar_fila(fila)
+            valores['user_id'] = usuarios.resolver(username, uid)
+        except ErrorFila as e:
+            con_error += 1
+            if len(errores) < MAX_ERRORES:
+                errores.append({"fila": numero, "error": str(e)})
+            continue
+
+        lote.append(valores)
+        if len(lote) >= tamano_lote:
+            insertar_lote(lote)
+            insertadas += len(lote)
+            lote = []
+
+    if lote:
+        insertar_lote(lote)
+        insertadas += len(lote)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "procesadas": procesadas,
+        "insertadas": insertadas,
+        "con_error": con_error,
+        "errores": errores,
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(procesadas / segundos, 1) if segundos > 0 else None,
+    }
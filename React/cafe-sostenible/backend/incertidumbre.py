@@ -0,0 +1,224 @@
+# backend/incertidumbre.py
+"""
+Bandas de incertidumbre (Monte Carlo) para la huella de carbono.
+
+Los factores de emisión se muestrean N veces desde distribuciones
+configurables y la huella se calcula vectorizada sobre (muestras ×
+cálculos) con huella.calcular_lote, que acepta factores como arreglos.
+Las muestras de factores son comunes a todos los cálculos (la
+incertidumbre de un factor es la misma para todas las fincas) y salen de
+un RNG con semilla, así el resultado es reproducible.
+
+Las distribuciones están escritas alrededor de huella.FACTORES (la versión
+'base'). Para un cálculo se centran en los factores de su versión
+(`ajustar`) y los factores fijos también salen de esa versión.
+
+Con muchas celdas (muestras × cálculos) el trabajo se reparte por bloques
+de cálculos en un pool de procesos; los bloques no dependen del número de
+procesos, así que el resultado es el mismo con o sin pool.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+
+import numpy as np
+
+import huella
+
+# Distribución de cada factor: (tipo, parámetros...), relativas a huella.FACTORES.
+# Los factores que no aparecen quedan fijos en el valor de la versión.
+#   normal: media, desviación    lognormal: mediana, sigma (del logaritmo)
+#   uniforme: mínimo, máximo     triangular: mínimo, moda, máximo
+DISTRIBUCIONES = {
+    'fert_sintetico': ('lognormal', 4.5, 0.35),
+    'fert_organico': ('lognormal', 1.2, 0.5),
+    'energia_red': ('triangular', 0.30, 0.45, 0.60),
+    'transporte': ('uniforme', 0.08, 0.16),
+    'proc_lavado': ('triangular', 0.15, 0.30, 0.45),
+    'proc_miel': ('triangular', 0.10, 0.20, 0.30),
+    'proc_natural': ('triangular', 0.05, 0.10, 0.15),
+    'residuos': ('uniforme', 0.3, 0.7),
+    'deforestacion': ('lognormal', 1500.0, 0.4),
+}
+PARAMETROS = {'normal': 2, 'lognormal': 2, 'uniforme': 2, 'triangular': 3}
+PERCENTILES = (5, 50, 95)
+METRICAS = huella.CATEGORIAS + ('total', 'por_kg')
+
+MUESTRAS_DEFECTO = 5000
+MUESTRAS_MAXIMO = 200000
+CELDAS_BLOQUE = 2_000_000       # muestras × cálculos por bloque (~16 MB por arreglo)
+CELDAS_POOL = 4_000_000         # a partir de aquí se usa el pool de procesos
+CELDAS_MAXIMO = 50_000_000      # tope por petición (unos segundos de CPU repartidos en el pool)
+PROCESOS = int(os.getenv("INCERTIDUMBRE_PROCESOS", os.cpu_count() or 1))
+
+
+def cargar_distribuciones():
+    """DISTRIBUCIONES, con los cambios del JSON indicado en INCERTIDUMBRE_CONFIG (si existe)."""
+    distribuciones = dict(DISTRIBUCIONES)
+    ruta = os.getenv("INCERTIDUMBRE_CONFIG")
+    if ruta:
+        with open(ruta, encoding='utf-8') as f:
+            distribuciones.update(validar(json.load(f)))
+    return distribuciones
+
+
+def validar(distribuciones):
+    """Normaliza {"factor": ["tipo", p1, p2, ...]}; ValueError si algo no cuadra."""
+    if not isinstance(distribuciones, dict):
+        raise ValueError("Las distribuciones deben ser un objeto {factor: [tipo, parámetros...]}")
+    validas = {}
+    for factor, spec in distribuciones.items():
+        if factor not in huella.FACTORES:
+            raise ValueError(f"Factor desconocido: {factor}")
+        if spec is None or spec == 'fija':
+            validas[factor] = None
+            continue
+        if not isinstance(spec, (list, tuple)) or not spec or spec[0] not in PARAMETROS:
+            raise ValueError(f"'{factor}': use [tipo, parámetros...] con tipo {', '.join(PARAMETROS)}")
+        tipo, params = spec[0], spec[1:]
+        if len(params) != PARAMETROS[tipo]:
+            raise ValueError(f"'{factor}': {tipo} lleva {PARAMETROS[tipo]} parámetros")
+        try:
+            params = tuple(float(p) for p in params)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{factor}': los parámetros deben ser números")
+        if tipo in ('uniforme', 'triangular') and not params[0] <= params[-1]:
+            raise ValueError(f"'{factor}': mínimo mayor que máximo")
+        if tipo == 'triangular' and not params[0] <= params[1] <= params[2]:
+            raise ValueError(f"'{factor}': la moda debe estar entre mínimo y máximo")
+        if tipo in ('normal', 'lognormal') and params[1] < 0:
+            raise ValueError(f"'{factor}': la dispersión no puede ser negativa")
+        validas[factor] = (tipo,) + params
+    return validas
+
+
+def ajustar(distribuciones, factores):
+    """
+    Escala cada distribución por valor de la versión / valor en huella.FACTORES:
+    centro y límites se mueven con el factor y la forma relativa se mantiene
+    (la sigma de la lognormal ya es relativa).
+    """
+    ajustadas = {}
+    for factor, spec in distribuciones.items():
+        if spec is None or factores.get(factor, huella.FACTORES[factor]) == huella.FACTORES[factor]:
+            ajustadas[factor] = spec
+            continue
+        escala = factores[factor] / huella.FACTORES[factor]
+        tipo, *p = spec
+        if tipo == 'lognormal':
+            ajustadas[factor] = (tipo, p[0] * escala, p[1])
+        else:
+            ajustadas[factor] = (tipo,) + tuple(v * escala for v in p)
+    return ajustadas
+
+
+def parametros(datos, factores=None):
+    """
+    (n, semilla, distribuciones) desde query args o el objeto JSON 'incertidumbre'.
+    Las distribuciones por defecto se ajustan a `factores` (los de la versión
+    del cálculo); las que llegan en la petición se usan tal cual.
+    """
+    try:
+        n = int(datos.get('n', MUESTRAS_DEFECTO))
+        semilla = int(datos.get('semilla', 0))
+    except (TypeError, ValueError):
+        raise ValueError("'n' y 'semilla' deben ser enteros")
+    if not 1 <= n <= MUESTRAS_MAXIMO:
+        raise ValueError(f"n debe estar entre 1 y {MUESTRAS_MAXIMO}")
+    if semilla < 0:
+        raise ValueError("La semilla no puede ser negativa")
+    distribuciones = cargar_distribuciones()
+    if factores is not None:
+        distribuciones = ajustar(distribuciones, factores)
+    cambios = datos.get('distribuciones')
+    if isinstance(cambios, str):      # en query string llega como JSON
+        try:
+            cambios = json.loads(cambios)
+        except ValueError:
+            raise ValueError("'distribuciones' no es un JSON válido")
+    if cambios:
+        distribuciones.update(validar(cambios))
+    return n, semilla, distribuciones
+
+
+def muestrear(distribuciones, n, semilla):
+    """{factor: arreglo (n, 1)} listo para hacer broadcast contra las filas."""
+    rng = np.random.default_rng(semilla)
+    factores = {}
+    # Orden fijo: la misma semilla da las mismas muestras aunque cambie el dict
+    for factor in sorted(distribuciones):
+        spec = distribuciones[factor]
+        if spec is None:
+            continue
+        tipo, *p = spec
+        if tipo == 'normal':
+            valores = np.maximum(rng.normal(p[0], p[1], n), 0)
+        elif tipo == 'lognormal':
+            valores = p[0] * np.exp(rng.normal(0, p[1], n))
+        elif tipo == 'uniforme':
+            valores = rng.uniform(p[0], p[1], n)
+        else:
+            valores = rng.triangular(p[0], p[1], p[2], n) if p[0] < p[2] else np.full(n, p[0])
+        factores[factor] = valores[:, None]
+    return factores
+
+
+def _bloque(columnas, factores):
+    """Percentiles por cálculo de un bloque de filas: {métrica: arreglo (len(PERCENTILES), filas)}."""
+    resultado = huella.calcular_lote(columnas, factores)
+    filas = len(next(iter(columnas.values())))
+    # Una categoría cuyos factores están todos fijos sale con forma (filas,)
+    return {m: np.percentile(np.atleast_2d(resultado[m]).reshape(-1, filas), PERCENTILES, axis=0)
+            for m in METRICAS}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    """Pool creado una sola vez por worker (spawn: el hijo no hereda conexiones ni hilos)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(PROCESOS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def bandas(columnas, n=MUESTRAS_DEFECTO, semilla=0, distribuciones=None, usar_pool=None, factores=None):
+    """
+    Percentiles p5/p50/p95 de cada categoría, del total y de la huella por kg
+    para cada fila de `columnas`. `factores` son los de la versión (por
+    defecto huella.FACTORES): de ahí salen los fijos. Devuelve {métrica:
+    arreglo (3, filas)}.
+    """
+    filas = len(next(iter(columnas.values())))
+    if n * filas > CELDAS_MAXIMO:
+        raise ValueError(f"Demasiadas muestras para {filas} cálculos (n × cálculos ≤ {CELDAS_MAXIMO})")
+    if distribuciones is None:
+        distribuciones = ajustar(cargar_distribuciones(), factores or {})
+    factores = {**(factores or {}), **muestrear(distribuciones, n, semilla)}
+
+    por_bloque = max(1, CELDAS_BLOQUE // n)
+    bloques = [{k: v[i:i + por_bloque] for k, v in columnas.items()} for i in range(0, filas, por_bloque)]
+    if usar_pool is None:
+        usar_pool = PROCESOS > 1 and len(bloques) > 1 and n * filas >= CELDAS_POOL
+
+    if usar_pool:
+        pool = _obtener_pool()
+        partes = list(pool.map(_bloque, bloques, [factores] * len(bloques)))
+    else:
+        partes = [_bloque(b, factores) for b in bloques]
+    return {m: np.concatenate([p[m] for p in partes], axis=1) for m in METRICAS}
+
+
+def resumen(percentiles, i, decimales=2):
+    """{"fertilizantes": {"p5", "p50", "p95"}, ...} de la fila `i`."""
+    salida = {}
+    for m in METRICAS:
+        valores = percentiles[m][:, i]
+        salida[m] = {f"p{p}": (round(float(v), 4 if m == 'por_kg' else decimales) if np.isfinite(v) else None)
+                     for p, v in zip(PERCENTILES, valores)}
+    return salida
@@ -0,0 +1,251 @@
+# backend/metricas.py
+"""
+Métricas de latencia y SQL en formato Prometheus (/metrics).
+
+Se activan con METRICAS=1. Desactivadas no se registra ningún hook: las
+peticiones, las consultas y el pool funcionan exactamente igual que sin
+este módulo.
+
+- Por endpoint: histograma de latencia, consultas por petición y tiempo SQL por petición.
+- Por consulta: histograma de duración y log de consultas lentas con la sentencia
+  (METRICAS_SQL_LENTO_MS, 500 ms por defecto).
+- Pool: espera para obtener una conexión y conexiones en uso (por bind: primario / lectura).
+- `medir('nombre')` para tramos que no son SQL (p. ej. el scraping de noticias).
+
+Cada worker de gunicorn tiene sus propios contadores; Prometheus los
+distingue por instancia.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+log = logging.getLogger(__name__)
+
+CUBETAS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CUBETAS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+LARGO_SENTENCIA = 2000   # caracteres del SQL que se escriben en el log de lentas
+
+activas = False
+_sql_lento = 0.5
+
+
+# --- HISTOGRAMAS ---
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.cubetas = cubetas
+        self._series = {}          # valores de etiquetas → [conteos por cubeta..., suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        i = bisect_left(self.cubetas, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [0] * (len(self.cubetas) + 2)
+            if i < len(self.cubetas):
+                serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for valores, serie in sorted(series.items()):
+            base = _etiquetas(self.etiquetas, valores)
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas, serie):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{base}le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{base}le="+Inf"}} {serie[-1]}')
+            sufijo = f"{{{base.rstrip(',')}}}" if base else ""
+            lineas.append(f"{self.nombre}_sum{sufijo} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{sufijo} {serie[-1]}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas):
+        with self._lock:
+            self._series[etiquetas] = self._series.get(etiquetas, 0) + 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for valores, total in sorted(series.items()):
+            base = _etiquetas(self.etiquetas, valores).rstrip(',')
+            lineas.append(f"{self.nombre}{{{base}}} {total}" if base else f"{self.nombre} {total}")
+        return lineas
+
+
+def _etiquetas(nombres, valores):
+    return ''.join(f'{n}="{_escapar(v)}",' for n, v in zip(nombres, valores))
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+PETICIONES = Histograma('cafe_http_request_duration_seconds', 'Latencia de las peticiones HTTP',
+                        ('endpoint', 'method', 'status'))
+CONSULTAS_POR_PETICION = Histograma('cafe_http_request_queries', 'Consultas SQL por petición',
+                                    ('endpoint',), CUBETAS_CONSULTAS)
+SQL_POR_PETICION = Histograma('cafe_http_request_sql_seconds', 'Tiempo en SQL por petición', ('endpoint',))
+CONSULTAS = Histograma('cafe_sql_query_duration_seconds', 'Duración de cada consulta SQL')
+CONSULTAS_LENTAS = Contador('cafe_sql_slow_queries_total', 'Consultas más lentas que el umbral', ('endpoint',))
+ESPERA_POOL = Histograma('cafe_db_pool_checkout_wait_seconds', 'Espera para obtener una conexión del pool')
+OPERACIONES = Histograma('cafe_operation_duration_seconds', 'Duración de operaciones fuera de SQL',
+                         ('operacion',))
+
+REGISTRO = (PETICIONES, CONSULTAS_POR_PETICION, SQL_POR_PETICION, CONSULTAS, CONSULTAS_LENTAS,
+            ESPERA_POOL, OPERACIONES)
+
+
+# --- POOL ---
+class PoolMedido(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout (incluye abrir conexiones nuevas)."""
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            ESPERA_POOL.observar(time.perf_counter() - inicio)
+
+
+def _usar_pool_medido(app):
+    engines = [(app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}), app.config['SQLALCHEMY_DATABASE_URI'])]
+    engines += [(b, b['url']) for b in app.config.get('SQLALCHEMY_BINDS', {}).values() if isinstance(b, dict)]
+    for opciones, url in engines:
+        url = make_url(url)
+        # Solo donde el dialecto usaría QueuePool (no en SQLite en memoria, por ejemplo)
+        if 'poolclass' not in opciones and issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+            opciones['poolclass'] = PoolMedido
+
+
+# --- HOOKS ---
+def _endpoint():
+    return request.endpoint or 'sin_ruta'
+
+
+def _antes_de_peticion():
+    g._metricas = [time.perf_counter(), 0, 0.0]   # inicio, consultas, segundos en SQL
+
+
+def _despues_de_peticion(response):
+    datos = g.pop('_metricas', None)
+    if datos is not None:
+        endpoint = _endpoint()
+        PETICIONES.observar(time.perf_counter() - datos[0], endpoint, request.method, response.status_code)
+        CONSULTAS_POR_PETICION.observar(datos[1], endpoint)
+        SQL_POR_PETICION.observar(datos[2], endpoint)
+    return response
+
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    context._metricas_inicio = time.perf_counter()
+
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    segundos = time.perf_counter() - context._metricas_inicio
+    CONSULTAS.observar(segundos)
+
+    endpoint = None
+    if has_app_context() and '_metricas' in g:
+        g._metricas[1] += 1
+        g._metricas[2] += segundos
+        endpoint = _endpoint()
+    if segundos >= _sql_lento:
+        CONSULTAS_LENTAS.incrementar(endpoint or 'fuera_de_peticion')
+        log.warning("SQL lento (%.0f ms) en %s: %s", segundos * 1000, endpoint or '-',
+                    statement[:LARGO_SENTENCIA])
+
+
+def medir(operacion):
+    """Context manager que registra la duración de `operacion`; sin costo si las métricas están apagadas."""
+    if not activas:
+        return nullcontext()
+    return _medir(operacion)
+
+
+@contextmanager
+def _medir(operacion):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERACIONES.observar(time.perf_counter() - inicio, operacion)
+
+
+# --- EXPOSICIÓN ---
+def _pool_actual(db):
+    lineas = []
+    for nombre, metodo, ayuda in (('cafe_db_pool_checked_out', 'checkedout', 'Conexiones en uso'),
+                                  ('cafe_db_pool_size', 'size', 'Tamaño configurado del pool'),
+                                  ('cafe_db_pool_overflow', 'overflow', 'Conexiones por encima del tamaño')):
+        series = [(bind or 'primario', engine.pool) for bind, engine in db.engines.items()
+                  if hasattr(engine.pool, metodo)]
+        if series:
+            lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+            lineas += [f'{nombre}{{bind="{bind}"}} {getattr(pool, metodo)()}' for bind, pool in series]
+    return lineas
+
+
+def exponer(db):
+    lineas = []
+    for metrica in REGISTRO:
+        lineas += metrica.exponer()
+    lineas += _pool_actual(db)
+    return '\n'.join(lineas) + '\n'
+
+
+def preparar(app):
+    """
+    Se llama en create_app antes de db.init_app (el pool se elige al crear
+    el engine). Con METRICAS distinto de 1 no hace nada.
+    """
+    global activas, _sql_lento
+    activas = str(app.config.get('METRICAS', os.getenv('METRICAS', '0'))) == '1'
+    if activas:
+        _sql_lento = float(app.config.get('METRICAS_SQL_LENTO_MS', os.getenv('METRICAS_SQL_LENTO_MS', 500))) / 1000
+        _usar_pool_medido(app)
+
+
+def iniciar(app, db):
+    """Se llama después de db.init_app: engancha los eventos y expone /metrics."""
+    if not activas:
+        return
+    token = app.config.get('METRICAS_TOKEN', os.getenv('METRICAS_TOKEN'))
+
+    with app.app_context():   # db.engines ya existe; no abre conexiones
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _antes_de_consulta):
+                event.listen(engine, 'before_cursor_execute', _antes_de_consulta)
+                event.listen(engine, 'after_cursor_execute', _despues_de_consulta)
+
+    app.before_request(_antes_de_peticion)
+    app.after_request(_despues_de_peticion)
+
+    def vista_metricas():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return app.response_class(status=401)
+        return app.response_class(exponer(db), mimetype='text/plain; version=0.0.4')
+    app.add_url_rule('/metrics', 'metricas', vista_metricas)
@@ -0,0 +1,165 @@
+# backend/migraciones.py
+"""
+Migraciones del esquema (idempotentes).
+
+`db.create_all()` crea tablas nuevas pero no modifica las existentes; los
+pasos de aquí agregan columnas y mueven datos. Se ejecutan con:
+
+    flask --app app migrar
+"""
+import hashlib
+
+from models import db, User, FotoPerfil
+import factores_emision
+
+
+def _columnas(tabla):
+    return {c['name'] for c in db.inspect(db.engine).get_columns(tabla)}
+
+
+def _agregar_columna(tabla, columna, tipo_sql):
+    """ALTER TABLE ... ADD si la columna no existe (sintaxis válida en MSSQL y SQLite)."""
+    if columna in _columnas(tabla):
+        return False
+    db.session.execute(db.text(f"ALTER TABLE {tabla} ADD {columna} {tipo_sql} NULL"))
+    db.session.commit()
+    return True
+
+
+def verificar_conexion():
+    db.session.execute(db.text("SELECT 1"))
+    db.session.commit()
+
+
+def crear_tablas():
+    db.create_all()
+
+
+def agregar_foto_hash():
+    if _agregar_columna('users', 'foto_hash', 'VARCHAR(64)') and db.engine.dialect.name == 'mssql':
+        db.session.execute(db.text(
+            "ALTER TABLE users ADD CONSTRAINT fk_users_foto_hash "
+            "FOREIGN KEY (foto_hash) REFERENCES fotos_perfil (hash)"
+        ))
+        db.session.commit()
+
+
+def agregar_finca_id():
+    """users.finca_id (FK a fincas) rellenado a partir de codigo_asociado_hash."""
+    if _agregar_columna('users', 'finca_id', 'INT') and db.engine.dialect.name == 'mssql':
+        db.session.execute(db.text(
+            "ALTER TABLE users ADD CONSTRAINT fk_users_finca_id "
+            "FOREIGN KEY (finca_id) REFERENCES fincas (id)"
+        ))
+        db.session.commit()
+
+    resultado = db.session.execute(db.text(
+        "UPDATE users SET finca_id = ("
+        "  SELECT fincas.id FROM fincas WHERE fincas.codigo_hash = users.codigo_asociado_hash"
+        ") WHERE finca_id IS NULL"
+        " AND codigo_asociado_hash IN (SELECT codigo_hash FROM fincas)"
+    ))
+    db.session.commit()
+    return resultado.rowcount
+
+
+def agregar_clave_idempotencia():
+    """calculos_eudr.clave_idempotencia; el índice único lo crea crear_indices."""
+    return _agregar_columna('calculos_eudr', 'clave_idempotencia', 'VARCHAR(64)')
+
+
+def agregar_factores_version():
+    """
+    calculos_eudr.factores_version_id (FK a versiones_factores). Siembra la
+    versión 'base' y se la asigna a los cálculos que aún no tienen versión:
+    todos se calcularon con los factores originales.
+    """
+    if _agregar_columna('calculos_eudr', 'factores_version_id', 'INT') and db.engine.dialect.name == 'mssql':
+        db.session.execute(db.text(
+            "ALTER TABLE calculos_eudr ADD CONSTRAINT fk_calculos_eudr_factores_version "
+            "FOREIGN KEY (factores_version_id) REFERENCES versiones_factores (id)"
+        ))
+        db.session.commit()
+
+    factores_emision.sembrar_base()
+    resultado = db.session.execute(db.text(
+        "UPDATE calculos_eudr SET factores_version_id = ("
+        "  SELECT id FROM versiones_factores WHERE nombre = :base"
+        ") WHERE factores_version_id IS NULL"
+    ), {"base": factores_emision.BASE})
+    db.session.commit()
+    return resultado.rowcount
+
+
+def agregar_verificacion_bosque():
+    """calculos_eudr.verificacion_id (FK a verificaciones_bosque)."""
+    agregada = _agregar_columna('calculos_eudr', 'verificacion_id', 'INT')
+    if agregada and db.engine.dialect.name == 'mssql':
+        db.session.execute(db.text(
+            "ALTER TABLE calculos_eudr ADD CONSTRAINT fk_calculos_eudr_verificacion "
+            "FOREIGN KEY (verificacion_id) REFERENCES verificaciones_bosque (id)"
+        ))
+        db.session.commit()
+    return agregada
+
+
+def agregar_area_bosque():
+    """calculos_eudr.area_bosque (base de deforestacion_porc en fincas verificadas)."""
+    return _agregar_columna('calculos_eudr', 'area_bosque', 'FLOAT')
+
+
+def crear_indices():
+    """Crea los índices declarados en los modelos que falten en tablas ya existentes."""
+    inspector = db.inspect(db.engine)
+    creados = 0
+    for tabla in db.metadata.sorted_tables:
+        existentes = {i['name'] for i in inspector.get_indexes(tabla.name)}
+        for indice in tabla.indexes:
+            if indice.name not in existentes:
+                indice.create(bind=db.engine)
+                creados += 1
+    return creados
+
+
+def mover_fotos(tamano_lote=50):
+    """Mueve users.foto_perfil a fotos_perfil (deduplicando) por lotes de usuarios."""
+    movidas = 0
+    while True:
+        filas = db.session.query(User.id, User.foto_perfil, User.foto_mime) \
+            .filter(User.foto_perfil.isnot(None), User.foto_hash.is_(None)) \
+            .order_by(User.id).limit(tamano_lote).all()
+        if not filas:
+            break
+        for user_id, blob, mime in filas:
+            digest = hashlib.sha256(blob).hexdigest()
+            if db.session.get(FotoPerfil, digest) is None:
+                db.session.add(FotoPerfil(hash=digest, mime=mime or 'image/png', datos=blob, tamano=len(blob)))
+                db.session.flush()
+            db.session.query(User).filter_by(id=user_id).update(
+                {User.foto_hash: digest, User.foto_perfil: None}, synchronize_session=False
+            )
+        db.session.commit()
+        db.session.expunge_all()
+        movidas += len(filas)
+    return movidas
+
+
+PASOS = [
+    ("Verificar conexión", verificar_conexion),
+    ("Crear tablas nuevas", crear_tablas),
+    ("Agregar users.foto_hash", agregar_foto_hash),
+    ("Mover fotos a fotos_perfil", mover_fotos),
+    ("Agregar users.finca_id", agregar_finca_id),
+    ("Agregar calculos_eudr.clave_idempotencia", agregar_clave_idempotencia),
+    ("Agregar calculos_eudr.factores_version_id", agregar_factores_version),
+    ("Agregar calculos_eudr.verificacion_id", agregar_verificacion_bosque),
+    ("Agregar calculos_eudr.area_bosque", agregar_area_bosque),
+    ("Crear índices", crear_indices),
+]
+
+
+def migrar(log=print):
+    for nombre, paso in PASOS:
+        resultado = paso()
+        detalle = "" if resultado is None or isinstance(resultado, bool) else f" ({resultado})"
+        log(f"✓ {nombre}{detalle}")
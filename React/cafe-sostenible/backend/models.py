@@ -2,7 +2,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+from conexiones import SesionRuteada
+
+# Las lecturas de peticiones GET van a la réplica si hay una (conexiones.py)
+db = SQLAlchemy(session_options={'class_': SesionRuteada})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -12,8 +15,14 @@ class User(db.Model):
     nombre = db.Column(db.String(100), nullable=False)
     apellido = db.Column(db.String(100), nullable=False)
     codigo_asociado_hash = db.Column(db.String(255), nullable=False)
-    foto_perfil = db.Column(db.LargeBinary, nullable=True)
+    # Columna heredada: las fotos viven en fotos_perfil. Diferida para que
+    # cargar un usuario no traiga el binario.
+    foto_perfil = db.deferred(db.Column(db.LargeBinary, nullable=True))
     foto_mime = db.Column(db.String(50), default='image/png')
+    foto_hash = db.Column(db.String(64), db.ForeignKey('fotos_perfil.hash'), nullable=True)
+    finca_id = db.Column(db.Integer, db.ForeignKey('fincas.id'), nullable=True, index=True)
+
+    finca = db.relationship('Finca', backref='usuarios', lazy=True)
 
     # Relación con cálculos
     calculos = db.relationship('CalculoEUDR', backref='user', lazy=True)
@@ -21,6 +30,31 @@ class User(db.Model):
     def __repr__(self):
         return f"<User {self.username}>"
 
+# === FOTOS DE PERFIL (direccionadas por contenido) ===
+class FotoPerfil(db.Model):
+    __tablename__ = 'fotos_perfil'
+    hash = db.Column(db.String(64), primary_key=True)  # SHA-256 del contenido
+    mime = db.Column(db.String(50), nullable=False, default='image/png')
+    datos = db.Column(db.LargeBinary, nullable=False)
+    tamano = db.Column(db.Integer, nullable=False)
+    creada = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<FotoPerfil {self.hash[:12]} ({self.tamano} bytes)>"
+
+# Tamaños reducidos (WebP) de cada foto, generados en segundo plano (fotos.py)
+class FotoVariante(db.Model):
+    __tablename__ = 'fotos_variantes'
+    foto_hash = db.Column(db.String(64), db.ForeignKey('fotos_perfil.hash'), primary_key=True)
+    variante = db.Column(db.String(20), primary_key=True)   # 'grande', 'avatar', 'miniatura'
+    mime = db.Column(db.String(50), nullable=False, default='image/webp')
+    datos = db.Column(db.LargeBinary, nullable=False)
+    tamano = db.Column(db.Integer, nullable=False)
+    creada = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<FotoVariante {self.foto_hash[:12]} {self.variante} ({self.tamano} bytes)>"
+
 class Finca(db.Model):
     __tablename__ = 'fincas'
     id = db.Column(db.Integer, primary_key=True)
@@ -31,9 +65,82 @@ class Finca(db.Model):
     def __repr__(self):
         return f"<Finca {self.nombre}>"
 
+# === POLÍGONOS DE FINCAS Y VERIFICACIÓN DE DEFORESTACIÓN (EUDR) ===
+class PoligonoFinca(db.Model):
+    __tablename__ = 'poligonos_finca'
+    id = db.Column(db.Integer, primary_key=True)
+    finca_id = db.Column(db.Integer, db.ForeignKey('fincas.id'), nullable=False, index=True)
+    nombre = db.Column(db.String(100), nullable=True)           # parcela
+    geojson = db.Column(db.Text, nullable=False)                # Polygon/MultiPolygon, lon/lat WGS84
+    # Caja envolvente (para el índice espacial y filtros sin leer el GeoJSON)
+    min_lon = db.Column(db.Float, nullable=False)
+    min_lat = db.Column(db.Float, nullable=False)
+    max_lon = db.Column(db.Float, nullable=False)
+    max_lat = db.Column(db.Float, nullable=False)
+    area_ha = db.Column(db.Float, nullable=False)
+    creado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PoligonoFinca {self.id} finca {self.finca_id} ({self.area_ha:.2f} ha)>"
+
+# Bosque dentro de los polígonos de una finca según el raster local (bosque.py)
+class VerificacionBosque(db.Model):
+    __tablename__ = 'verificaciones_bosque'
+    __table_args__ = (
+        db.Index('ix_verificaciones_bosque_finca', 'finca_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    finca_id = db.Column(db.Integer, db.ForeignKey('fincas.id'), nullable=False)
+    raster = db.Column(db.String(100), nullable=False)          # nombre y huella del raster usado
+    poligonos = db.Column(db.Integer, nullable=False)
+    area_ha = db.Column(db.Float, nullable=False)
+    bosque_base_ha = db.Column(db.Float, nullable=False)        # cobertura 2020
+    bosque_actual_ha = db.Column(db.Float, nullable=False)
+    deforestacion_porc = db.Column(db.Float, nullable=False)    # pérdida / área de los polígonos
+    sin_datos_porc = db.Column(db.Float, nullable=False)        # píxeles sin dato en el raster
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "raster": self.raster,
+            "poligonos": self.poligonos,
+            "area_ha": self.area_ha,
+            "bosque_base_ha": self.bosque_base_ha,
+            "bosque_actual_ha": self.bosque_actual_ha,
+            "deforestacion_porc": self.deforestacion_porc,
+            "sin_datos_porc": self.sin_datos_porc,
+            "fecha": self.fecha.isoformat(),
+        }
+
+    def __repr__(self):
+        return f"<VerificacionBosque finca {self.finca_id}: {self.deforestacion_porc:.2f}%>"
+
 # === NUEVO MODELO: CÁLCULO EUDR ===
 class CalculoEUDR(db.Model):
     __tablename__ = 'calculos_eudr'
+    __table_args__ = (
+        # Historial por usuario ordenado por fecha (paginación por cursor)
+        db.Index('ix_calculos_eudr_user_fecha', 'user_id', 'fecha', 'id'),
+        # Sincronización offline: una clave del cliente se guarda una sola vez por usuario.
+        # Filtrado: SQL Server trata los NULL como iguales en un índice único
+        db.Index('ux_calculos_eudr_idempotencia', 'user_id', 'clave_idempotencia', unique=True,
+                 mssql_where=db.text('clave_idempotencia IS NOT NULL'),
+                 sqlite_where=db.text('clave_idempotencia IS NOT NULL')),
+        # Filtros del historial (busqueda.py): igualdad o rango por usuario + clave de paginación.
+        # En SQL Server incluyen las demás columnas filtrables: combinar filtros no sale del índice
+        db.Index('ix_calculos_eudr_user_finca', 'user_id', 'nombre_finca', 'fecha', 'id',
+                 mssql_include=['tipo_procesamiento', 'tipo_fertilizante', 'huella_por_kg', 'area_cultivada']),
+        db.Index('ix_calculos_eudr_user_procesamiento', 'user_id', 'tipo_procesamiento', 'fecha', 'id',
+                 mssql_include=['tipo_fertilizante', 'huella_por_kg', 'area_cultivada']),
+        db.Index('ix_calculos_eudr_user_fertilizante', 'user_id', 'tipo_fertilizante', 'fecha', 'id',
+                 mssql_include=['tipo_procesamiento', 'huella_por_kg', 'area_cultivada']),
+        db.Index('ix_calculos_eudr_user_huella', 'user_id', 'huella_por_kg', 'fecha', 'id',
+                 mssql_include=['tipo_procesamiento', 'tipo_fertilizante', 'area_cultivada']),
+        db.Index('ix_calculos_eudr_user_area', 'user_id', 'area_cultivada', 'fecha', 'id',
+                 mssql_include=['tipo_procesamiento', 'tipo_fertilizante', 'huella_por_kg']),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -41,6 +148,8 @@ class CalculoEUDR(db.Model):
     # Información básica
     nombre_finca = db.Column(db.String(100), nullable=False)
     fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    clave_idempotencia = db.Column(db.String(64), nullable=True)  # generada por la app de campo
+    factores_version_id = db.Column(db.Integer, db.ForeignKey('versiones_factores.id'), nullable=True)
     
     # Parámetros EUDR
     area_cultivada = db.Column(db.Float, nullable=False)  # ha
@@ -66,6 +175,9 @@ class CalculoEUDR(db.Model):
     
     bosque_base = db.Column(db.Float, nullable=True)  # ha (2020)
     bosque_actual = db.Column(db.Float, nullable=True)  # ha
+    # Si la finca tiene polígono verificado, bosque_base/actual salen de esa verificación
+    verificacion_id = db.Column(db.Integer, db.ForeignKey('verificaciones_bosque.id'), nullable=True)
+    area_bosque = db.Column(db.Float, nullable=True)  # ha de los polígonos verificados (base de deforestacion_porc)
     
     # Resultados calculados
     huella_total = db.Column(db.Float, nullable=False)  # kg CO₂e
@@ -112,7 +224,95 @@ class CalculoEUDR(db.Model):
             "distancia_prom": self.distancia_prom,
             "fraccion_compost": self.fraccion_compost,
             "deforestacion_porc": self.deforestacion_porc,
+            "factores_version_id": self.factores_version_id,
+            "verificacion_id": self.verificacion_id,
+            "area_bosque": self.area_bosque,
         }
 
     def __repr__(self):
-        return f"<CalculoEUDR {self.nombre_finca} - {self.huella_por_kg} kg CO₂e/kg>"
\ No newline at end of file
+        return f"<CalculoEUDR {self.nombre_finca} - {self.huella_por_kg} kg CO₂e/kg>"
+
+# === FACTORES DE EMISIÓN (versionados) ===
+class VersionFactores(db.Model):
+    __tablename__ = 'versiones_factores'
+    __table_args__ = (
+        # Una sola versión activa
+        db.Index('ux_versiones_factores_activa', 'activa', unique=True,
+                 mssql_where=db.text('activa = 1'), sqlite_where=db.text('activa = 1')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(50), nullable=False, unique=True)   # base, 2025-IPCC...
+    descripcion = db.Column(db.String(255), nullable=True)
+    valores = db.Column(db.Text, nullable=False)                     # JSON {factor: valor}
+    activa = db.Column(db.Boolean, nullable=False, default=False)
+    creada = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<VersionFactores {self.nombre}{' (activa)' if self.activa else ''}>"
+
+# Avance de un recálculo del historial (para retomarlo si se interrumpe)
+class RecalculoHistorial(db.Model):
+    __tablename__ = 'recalculos_historial'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version_id = db.Column(db.Integer, db.ForeignKey('versiones_factores.id'), nullable=False)
+    estado = db.Column(db.String(12), nullable=False, default='en_curso')   # en_curso/terminado
+    hasta_id = db.Column(db.Integer, nullable=False)          # último cálculo existente al empezar
+    ultimo_id = db.Column(db.Integer, nullable=False, default=0)
+    procesados = db.Column(db.Integer, nullable=False, default=0)
+    omitidos = db.Column(db.Integer, nullable=False, default=0)   # sin área o producción válidas
+    iniciado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    actualizado = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<RecalculoHistorial v{self.version_id} {self.estado} hasta {self.ultimo_id}/{self.hasta_id}>"
+
+# === TENDENCIAS: AGREGADOS POR FINCA Y PERIODO ===
+class TendenciaCalculo(db.Model):
+    __tablename__ = 'tendencias_calculo'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'nombre_finca', 'tipo_periodo', 'periodo', name='uq_tendencias_clave'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    nombre_finca = db.Column(db.String(100), nullable=False)
+    tipo_periodo = db.Column(db.String(10), nullable=False)  # mes/temporada
+    periodo = db.Column(db.String(9), nullable=False)        # 2025-03 / 2024-2025
+    n = db.Column(db.Integer, nullable=False, default=0)
+
+    # Suma, cantidad, mínimo y máximo de cada métrica (los nulos no cuentan)
+    suma_huella_por_kg = db.Column(db.Float, nullable=False, default=0)
+    n_huella_por_kg = db.Column(db.Integer, nullable=False, default=0)
+    min_huella_por_kg = db.Column(db.Float, nullable=True)
+    max_huella_por_kg = db.Column(db.Float, nullable=True)
+
+    suma_rendimiento = db.Column(db.Float, nullable=False, default=0)
+    n_rendimiento = db.Column(db.Integer, nullable=False, default=0)
+    min_rendimiento = db.Column(db.Float, nullable=True)
+    max_rendimiento = db.Column(db.Float, nullable=True)
+
+    suma_fert_por_ha = db.Column(db.Float, nullable=False, default=0)
+    n_fert_por_ha = db.Column(db.Integer, nullable=False, default=0)
+    min_fert_por_ha = db.Column(db.Float, nullable=True)
+    max_fert_por_ha = db.Column(db.Float, nullable=True)
+
+    def __repr__(self):
+        return f"<TendenciaCalculo {self.nombre_finca} {self.periodo}>"
+
+# === BENCHMARK: SKETCHES DE CUANTILES (cubetas logarítmicas) ===
+class BenchmarkBucket(db.Model):
+    __tablename__ = 'benchmark_buckets'
+    __table_args__ = (
+        db.UniqueConstraint('metrica', 'temporada', 'indice', name='uq_benchmark_cubeta'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    metrica = db.Column(db.String(20), nullable=False)    # huella_por_kg, fertilizantes, ...
+    temporada = db.Column(db.String(9), nullable=False)   # 2024-2025 o 'todas'
+    indice = db.Column(db.Integer, nullable=False)        # ceil(log(valor) / log(γ))
+    conteo = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<BenchmarkBucket {self.metrica} {self.temporada} [{self.indice}]={self.conteo}>"
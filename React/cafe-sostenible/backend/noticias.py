@@ -0,0 +1,238 @@
+# backend/noticias.py
+"""
+Caché de noticias de soppexcca.org.ni.
+
+- TTL + stale-while-revalidate: dentro del TTL se responde desde memoria;
+  pasado el TTL se sirve la copia vieja y se refresca en segundo plano.
+- Un hilo de fondo refresca periódicamente la caché.
+- Varias peticiones sin caché comparten una sola descarga (single-flight).
+- Si el sitio cae, se sigue sirviendo la última copia buena.
+
+En modo ASGI (asgi.py) las descargas se hacen con httpx en el event loop
+(preparar_async) y la vista de Flask solo lee la caché: ningún hilo
+queda esperando al sitio.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import metricas
+
+log = logging.getLogger(__name__)   # corre en hilos y tareas de fondo, sin contexto de app
+
+URL_NOTICIAS = os.getenv("NOTICIAS_URL", "https://soppexcca.org.ni/noticias")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
+}
+TIMEOUT = 15
+
+
+class ErrorRed(Exception):
+    """No se pudo descargar la página (conexión, timeout o HTTP de error)."""
+
+
+def _registrar_error(e):
+    # Sitio caído: esperable, sin traceback. Cualquier otra cosa (p. ej. el parseo) con traceback
+    if isinstance(e, ErrorRed):
+        log.warning("No se pudieron descargar las noticias: %s", e)
+    else:
+        log.error("Error al refrescar noticias", exc_info=e)
+
+
+def descargar():
+    import requests   # diferido: no cargarlo en workers que nunca hacen scraping
+    try:
+        response = requests.get(URL_NOTICIAS, headers=HEADERS, timeout=TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise ErrorRed(str(e)) from e
+    return response.text
+
+
+async def descargar_async(cliente):
+    """Igual que descargar() con un httpx.AsyncClient compartido (reutiliza conexiones)."""
+    import httpx
+    try:
+        response = await cliente.get(URL_NOTICIAS, headers=HEADERS, timeout=TIMEOUT)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise ErrorRed(str(e) or type(e).__name__) from e
+    return response.text
+
+
+def parsear(html):
+    """Extrae las noticias; solo se construye el árbol de los nodos article.post."""
+    from bs4 import BeautifulSoup, SoupStrainer
+    solo_articulos = SoupStrainer('article', class_='post')
+    soup = BeautifulSoup(html, 'html.parser', parse_only=solo_articulos)
+    noticias = []
+
+    for article in soup.find_all('article', class_='post'):
+        # Título y enlace
+        title_tag = article.select_one('.entry-title a')
+        title = title_tag.get_text(strip=True) if title_tag else "Sin título"
+        link = title_tag['href'] if title_tag else ""
+
+        # Fecha
+        date_tag = article.select_one('time.entry-date')
+        date = date_tag.get_text(strip=True) if date_tag else "Sin fecha"
+
+        # Snippet
+        snippet_tag = article.select_one('.entry-content p')
+        snippet = snippet_tag.get_text(strip=True) if snippet_tag else ""
+
+        # Imagen destacada (la última del srcset es la más grande)
+        img_tag = article.select_one('.post-thumbnail img')
+        image = ""
+        if img_tag and img_tag.get('src'):
+            image = img_tag['src']
+            if img_tag.get('srcset'):
+                image = img_tag['srcset'].split(',')[-1].strip().split(' ')[0]
+
+        noticias.append({
+            "title": title,
+            "date": date,
+            "snippet": snippet,
+            "url": link,
+            "image": image
+        })
+
+    return noticias
+
+
+class CacheNoticias:
+    def __init__(self, ttl=600, stale=86400, cargar=None):
+        self.ttl = ttl              # segundos en que la copia se considera fresca
+        self.stale = stale          # segundos extra en que se sirve vieja mientras se refresca
+        self.cargar = cargar or (lambda: parsear(descargar()))
+        self._lock = threading.Lock()
+        self._datos = None
+        self._actualizado = 0.0
+        self._en_curso = None       # Future de la descarga compartida
+        self._hilo = None
+        self.modo_async = False     # asgi.py: descarga preparar_async, obtener() solo lee
+        self._tarea = None          # asyncio.Task de la descarga compartida (modo async)
+        self._error = None          # último error, para responder sin copia buena
+
+    def _refrescar(self):
+        """Descarga una vez; las llamadas concurrentes esperan el mismo Future."""
+        with self._lock:
+            if self._en_curso is not None:
+                return self._en_curso, False
+            futuro = self._en_curso = Future()
+
+        try:
+            with metricas.medir('noticias'):
+                datos = self.cargar()
+        except Exception as e:
+            _registrar_error(e)
+            futuro.set_exception(e)
+        else:
+            self._guardar(datos)
+            futuro.set_result(datos)
+        finally:
+            with self._lock:
+                self._en_curso = None
+        return futuro, True
+
+    def _guardar(self, datos):
+        with self._lock:
+            self._datos = datos
+            self._actualizado = time.monotonic()
+            self._error = None
+
+    def _refrescar_en_fondo(self):
+        threading.Thread(target=self._refrescar, daemon=True).start()
+
+    def _bucle(self):
+        while True:
+            time.sleep(self.ttl)
+            self._refrescar()
+
+    def iniciar_refresco(self):
+        """Arranca (una sola vez) el hilo que refresca la caché cada TTL."""
+        with self._lock:
+            if self._hilo is not None:
+                return
+            self._hilo = threading.Thread(target=self._bucle, daemon=True, name='refresco-noticias')
+        self._hilo.start()
+
+    def obtener(self):
+        """
+        Devuelve (noticias, estado) con estado 'HIT', 'STALE' o 'MISS'.
+        Lanza la excepción de la descarga solo si nunca hubo una copia buena.
+        """
+        if self.modo_async:
+            with self._lock:
+                if self._datos is None:
+                    raise self._error or ErrorRed("Noticias aún no descargadas")
+                fresca = time.monotonic() - self._actualizado < self.ttl
+                return self._datos, 'HIT' if fresca else 'STALE'
+
+        self.iniciar_refresco()
+        with self._lock:
+            datos = self._datos
+            edad = time.monotonic() - self._actualizado
+
+        if datos is not None:
+            if edad < self.ttl:
+                return datos, 'HIT'
+            if edad < self.ttl + self.stale:
+                self._refrescar_en_fondo()
+                return datos, 'STALE'
+
+        futuro, _ = self._refrescar()
+        try:
+            return futuro.result(timeout=TIMEOUT + 5), 'MISS'
+        except Exception:
+            if datos is not None:
+                return datos, 'STALE'   # sitio caído: última copia buena
+            raise
+
+
+    # --- MODO ASYNC (asgi.py) ---
+    async def _refrescar_async(self, cliente):
+        try:
+            with metricas.medir('noticias'):
+                html = await descargar_async(cliente)
+                # El parseo es CPU: fuera del event loop
+                datos = await asyncio.to_thread(parsear, html)
+        except Exception as e:
+            _registrar_error(e)
+            with self._lock:
+                self._error = e
+            raise
+        self._guardar(datos)
+        return datos
+
+    async def preparar_async(self, cliente):
+        """
+        Deja la caché lista para la vista sin bloquear ningún hilo: fresca no
+        hace nada, vieja lanza el refresco en fondo, vacía espera la descarga
+        (compartida por todas las peticiones que lleguen mientras tanto).
+        """
+        with self._lock:
+            datos = self._datos
+            edad = time.monotonic() - self._actualizado
+        if datos is not None and edad < self.ttl:
+            return
+
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.ensure_future(self._refrescar_async(cliente))
+            # Si nadie la espera (refresco en fondo) el error ya quedó en self._error
+            self._tarea.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if datos is not None and edad < self.ttl + self.stale:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._tarea), TIMEOUT + 5)
+        except Exception:
+            pass   # la vista responde con la última copia buena o con el error
+
+
+cache = CacheNoticias(
+    ttl=int(os.getenv("NOTICIAS_TTL", 600)),
+    stale=int(os.getenv("NOTICIAS_STALE", 86400)),
+)
@@ -0,0 +1,139 @@
+# backend/recalcular.py
+"""
+Recálculo del historial con otra versión de factores de emisión.
+
+El proceso principal recorre calculos_eudr por id (keyset, en bloques),
+los workers de un pool de procesos calculan cada bloque con
+huella.calcular_lote y el principal escribe los resultados con UPDATEs
+por lotes (executemany). Un solo escritor: no hay bloqueos entre procesos
+y cada bloque se confirma en una transacción junto con el avance en
+recalculos_historial, así que si el proceso se interrumpe se retoma
+desde el último bloque confirmado.
+"""
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from models import db, CalculoEUDR, RecalculoHistorial
+import cache_respuestas
+import factores_emision
+import huella
+
+EN_CURSO = 'en_curso'
+TERMINADO = 'terminado'
+
+ENTRADAS = ('id', 'user_id') + huella.CAMPOS_NUMERICOS + huella.CAMPOS_TEXTO
+
+
+def calcular_bloque(filas, factores):
+    """
+    Corre en los workers. `filas` son tuplas con ENTRADAS.
+    Devuelve (parámetros del UPDATE por cálculo, usuarios afectados, omitidos, último id).
+    """
+    registros = [dict(zip(ENTRADAS, fila)) for fila in filas]
+    resultado = huella.calcular_lote(huella.columnas_desde_registros(registros), factores)
+    cambios, usuarios, omitidos = [], set(), 0
+    for i, registro in enumerate(registros):
+        if not resultado['valido'][i]:
+            omitidos += 1
+            continue
+        valores = huella.columnas_calculo(resultado, i)
+        valores['id'] = registro['id']
+        cambios.append(valores)
+        usuarios.add(registro['user_id'])
+    return cambios, usuarios, omitidos, registros[-1]['id']
+
+
+def _trabajo(version, reiniciar):
+    """Trabajo en curso para esta versión, o uno nuevo hasta el último id actual."""
+    trabajo = RecalculoHistorial.query.filter_by(version_id=version.id, estado=EN_CURSO) \
+        .order_by(RecalculoHistorial.id.desc()).first()
+    if trabajo is not None and reiniciar:
+        trabajo.estado = TERMINADO
+        trabajo = None
+    if trabajo is None:
+        hasta_id = db.session.query(db.func.max(CalculoEUDR.id)).scalar() or 0
+        trabajo = RecalculoHistorial(version_id=version.id, hasta_id=hasta_id, ultimo_id=0,
+                                     procesados=0, omitidos=0, estado=EN_CURSO)
+        db.session.add(trabajo)
+    db.session.commit()
+    return trabajo
+
+
+def _bloques(desde_id, hasta_id, tamano_lote):
+    """Tuplas de ENTRADAS por bloques de id (keyset), sin objetos ORM."""
+    columnas = [getattr(CalculoEUDR, c) for c in ENTRADAS]
+    ultimo_id = desde_id
+    while True:
+        filas = db.session.query(*columnas) \
+            .filter(CalculoEUDR.id > ultimo_id, CalculoEUDR.id <= hasta_id) \
+            .order_by(CalculoEUDR.id).limit(tamano_lote).all()
+        if not filas:
+            return
+        ultimo_id = filas[-1].id
+        yield [tuple(fila) for fila in filas]
+
+
+def _escribir(trabajo, version_id, resultado):
+    """UPDATE por lotes de un bloque + avance del trabajo, en una transacción."""
+    cambios, usuarios, omitidos, ultimo_id = resultado
+    for valores in cambios:
+        valores['factores_version_id'] = version_id
+    try:
+        if cambios:
+            db.session.execute(db.update(CalculoEUDR), cambios)
+        trabajo.ultimo_id = ultimo_id
+        trabajo.procesados += len(cambios)
+        trabajo.omitidos += omitidos
+        trabajo.actualizado = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    cache_respuestas.invalidar(*{f"historial:{u}" for u in usuarios})
+
+
+def recalcular(version, tamano_lote=5000, procesos=None, reiniciar=False, log=print):
+    """
+    Recalcula todo el historial (hasta el último id al empezar) con los
+    factores de `version`. Devuelve el RecalculoHistorial terminado.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    factores = factores_emision.valores(version)
+    trabajo = _trabajo(version, reiniciar)
+    if trabajo.ultimo_id:
+        log(f"Retomando desde el cálculo {trabajo.ultimo_id} ({trabajo.procesados} ya recalculados)")
+
+    inicio, procesados_antes = time.perf_counter(), trabajo.procesados
+
+    def avance():
+        segundos = time.perf_counter() - inicio
+        por_segundo = (trabajo.procesados - procesados_antes) / segundos if segundos else 0
+        log(f"{trabajo.procesados} recalculados, {trabajo.omitidos} omitidos "
+            f"(id {trabajo.ultimo_id}/{trabajo.hasta_id}, {por_segundo:.0f}/s)")
+
+    bloques = _bloques(trabajo.ultimo_id, trabajo.hasta_id, tamano_lote)
+    if procesos == 1:
+        for filas in bloques:
+            _escribir(trabajo, version.id, calcular_bloque(filas, factores))
+            avance()
+    else:
+        # Los resultados se escriben en orden: el avance guardado nunca salta un bloque
+        with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+            pendientes = deque()
+            for filas in bloques:
+                pendientes.append(pool.submit(calcular_bloque, filas, factores))
+                if len(pendientes) >= 2 * procesos:
+                    _escribir(trabajo, version.id, pendientes.popleft().result())
+                    avance()
+            while pendientes:
+                _escribir(trabajo, version.id, pendientes.popleft().result())
+                avance()
+
+    trabajo.estado = TERMINADO
+    trabajo.actualizado = datetime.utcnow()
+    db.session.commit()
+    return trabajo
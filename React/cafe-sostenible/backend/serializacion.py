@@ -0,0 +1,80 @@
+# backend/serializacion.py
+"""
+Lectura y serialización rápidas del historial.
+
+En lugar de hidratar objetos CalculoEUDR (identity map incluido) y armar
+un dict por fila con to_dict(), se seleccionan solo las columnas pedidas
+como tuplas y se codifican de una vez con orjson (si está instalado) o con
+json. Dos formas de respuesta:
+
+- objetos: [{"id": 1, "fecha": ..., ...}, ...]  (la de siempre)
+- columnar: {"columns": ["id", "fecha", ...], "rows": [[1, ...], ...]}
+"""
+import json
+
+from flask import current_app
+
+from models import db, CalculoEUDR
+
+try:
+    import orjson
+except ImportError:   # opcional: pip install orjson
+    orjson = None
+
+# Mismo orden que CalculoEUDR.to_dict()
+COLUMNAS = (
+    'id', 'nombre_finca', 'fecha',
+    'area_cultivada', 'produccion_verde', 'fertilizante_total', 'tipo_fertilizante',
+    'energia_electrica', 'combustible_litros', 'tipo_combustible',
+    'arboles_sombra', 'area_copa_promedio', 'distancia_km', 'volumen_cargas',
+    'tipo_procesamiento', 'residuos_totales', 'residuos_compostados',
+    'bosque_base', 'bosque_actual',
+    'huella_total', 'huella_por_kg', 'fert_por_ha', 'rendimiento', 'energia_total',
+    'arboles_por_ha', 'cobertura_porc', 'distancia_prom', 'fraccion_compost', 'deforestacion_porc',
+    'factores_version_id', 'verificacion_id', 'area_bosque',
+)
+OBLIGATORIAS = ('id', 'fecha')   # las necesita el cursor de paginación
+FORMAS = ('objetos', 'columnar')
+
+
+def columnas_pedidas(fields):
+    """`fields=a,b,c` → columnas en el orden de COLUMNAS; vacío = todas. ValueError si alguna no existe."""
+    if not fields:
+        return COLUMNAS
+    pedidas = {c.strip() for c in fields.split(',') if c.strip()}
+    desconocidas = pedidas - set(COLUMNAS)
+    if desconocidas:
+        raise ValueError(f"Campos desconocidos: {', '.join(sorted(desconocidas))}")
+    pedidas.update(OBLIGATORIAS)
+    return tuple(c for c in COLUMNAS if c in pedidas)
+
+
+def consulta(user_id, columnas=COLUMNAS):
+    """Query de tuplas (Row) con solo esas columnas, sin objetos ORM."""
+    return db.session.query(*(getattr(CalculoEUDR, c) for c in columnas)) \
+        .filter(CalculoEUDR.user_id == user_id)
+
+
+def _fecha_iso(valor):
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def dumps(datos):
+    """JSON compacto en bytes; las fechas salen en ISO 8601 como en to_dict()."""
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return json.dumps(datos, separators=(',', ':'), ensure_ascii=False, default=_fecha_iso).encode('utf-8')
+
+
+def objetos(columnas, filas):
+    return [dict(zip(columnas, fila)) for fila in filas]
+
+
+def columnar(columnas, filas):
+    return {"columns": list(columnas), "rows": [list(fila) for fila in filas]}
+
+
+def respuesta(datos):
+    return current_app.response_class(dumps(datos), mimetype='application/json')
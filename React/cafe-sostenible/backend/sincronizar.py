@@ -0,0 +1,86 @@
+# backend/sincronizar.py
+"""
+Sincronización por lotes de la app de campo (Capacitor) con claves de idempotencia.
+
+La app guarda los cálculos sin conexión, cada uno con una clave generada
+en el teléfono (p. ej. un UUID), y al reconectarse los envía todos juntos.
+Las claves que ya existen para el usuario se saltan (índice único
+ux_calculos_eudr_idempotencia); las nuevas se insertan en una sola
+transacción. Reintentar el mismo lote no crea duplicados.
+"""
+from sqlalchemy.exc import IntegrityError
+
+from models import db, CalculoEUDR
+import importador
+
+SYNC_MAXIMO = 500
+LARGO_CLAVE = 64
+
+CREADO = 'creado'
+EXISTENTE = 'existente'
+ERROR = 'error'
+
+
+def _clave(item):
+    clave = item.get('clave') or item.get('idempotencyKey')
+    if not isinstance(clave, str) or not clave.strip():
+        raise importador.ErrorFila("Falta la clave de idempotencia ('clave')")
+    clave = clave.strip()
+    if len(clave) > LARGO_CLAVE:
+        raise importador.ErrorFila(f"La clave no puede tener más de {LARGO_CLAVE} caracteres")
+    return clave
+
+
+def _existentes(user_id, claves):
+    """{clave: id} de las claves que ya están guardadas para el usuario."""
+    if not claves:
+        return {}
+    filas = db.session.query(CalculoEUDR.clave_idempotencia, CalculoEUDR.id).filter(
+        CalculoEUDR.user_id == user_id, CalculoEUDR.clave_idempotencia.in_(claves))
+    return dict(filas)
+
+
+def sincronizar(user_id, items):
+    """
+    Devuelve un estado por item, en el mismo orden:
+    {"clave", "estado": creado|existente|error, "id" | "error"}.
+    """
+    resultados = [None] * len(items)
+    nuevos = {}          # clave → (posición, valores)
+    repetidas = []       # (posición, clave) repetida dentro del mismo lote
+
+    for i, item in enumerate(items):
+        clave = None
+        try:
+            if not isinstance(item, dict):
+                raise importador.ErrorFila("Cada cálculo debe ser un objeto")
+            clave = _clave(item)
+            if clave in nuevos:
+                repetidas.append((i, clave))
+                continue
+            valores, _, _ = importador.validar_fila({k: v for k, v in item.items() if k not in ('username', 'user_id')})
+        except importador.ErrorFila as e:
+            resultados[i] = {"clave": clave, "estado": ERROR, "error": str(e)}
+            continue
+        valores.update(user_id=user_id, clave_idempotencia=clave)
+        nuevos[clave] = (i, valores)
+
+    # Un reintento si otra sincronización concurrente insertó alguna de las mismas claves
+    for intento in range(2):
+        existentes = _existentes(user_id, list(nuevos))
+        lote = [valores for clave, (_, valores) in nuevos.items() if clave not in existentes]
+        try:
+            if lote:
+                importador.insertar_lote(lote)
+            break
+        except IntegrityError:
+            if intento:
+                raise
+
+    ids = _existentes(user_id, list(nuevos))
+    creadas = {valores['clave_idempotencia'] for valores in lote}
+    for clave, (i, _) in nuevos.items():
+        resultados[i] = {"clave": clave, "estado": CREADO if clave in creadas else EXISTENTE, "id": ids.get(clave)}
+    for i, clave in repetidas:
+        resultados[i] = {"clave": clave, "estado": EXISTENTE, "id": ids.get(clave)}
+    return resultados
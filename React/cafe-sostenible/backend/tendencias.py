@@ -0,0 +1,141 @@
+# backend/tendencias.py
+"""
+Series de tiempo por finca (mes y temporada cafetalera).
+
+Cada inserción en calculos_eudr suma sus métricas a tendencias_calculo
+dentro de la misma transacción, con un UPDATE atómico (n = n + 1, ...),
+así las páginas leen la tendencia ya agregada sin recorrer el historial.
+"""
+from sqlalchemy.exc import IntegrityError
+
+from models import db, CalculoEUDR, TendenciaCalculo
+
+METRICAS = ('huella_por_kg', 'rendimiento', 'fert_por_ha')
+TIPOS_PERIODO = ('mes', 'temporada')
+MES_INICIO_TEMPORADA = 10   # la cosecha en Nicaragua va de octubre a septiembre
+
+
+def temporada(fecha):
+    inicio = fecha.year if fecha.month >= MES_INICIO_TEMPORADA else fecha.year - 1
+    return f"{inicio}-{inicio + 1}"
+
+
+def periodos(fecha):
+    return (
+        ('mes', f"{fecha.year}-{fecha.month:02d}"),
+        ('temporada', temporada(fecha)),
+    )
+
+
+def _valor(fila, campo):
+    return fila[campo] if isinstance(fila, dict) else getattr(fila, campo)
+
+
+def _acumular(filas):
+    """Agrupa las filas por (usuario, finca, tipo, periodo) en memoria."""
+    grupos = {}
+    for fila in filas:
+        for tipo, periodo in periodos(_valor(fila, 'fecha')):
+            clave = (_valor(fila, 'user_id'), _valor(fila, 'nombre_finca'), tipo, periodo)
+            acc = grupos.get(clave)
+            if acc is None:
+                acc = grupos[clave] = {'n': 0, **{m: [0.0, 0, None, None] for m in METRICAS}}
+            acc['n'] += 1
+            for m in METRICAS:
+                v = _valor(fila, m)
+                if v is None:
+                    continue
+                suma, n, minimo, maximo = acc[m]
+                acc[m] = [suma + v, n + 1,
+                          v if minimo is None else min(minimo, v),
+                          v if maximo is None else max(maximo, v)]
+    return grupos
+
+
+def _aplicar(clave, acc):
+    t = TendenciaCalculo.__table__
+    user_id, nombre_finca, tipo, periodo = clave
+    condicion = db.and_(
+        t.c.user_id == user_id, t.c.nombre_finca == nombre_finca,
+        t.c.tipo_periodo == tipo, t.c.periodo == periodo,
+    )
+
+    valores = {t.c.n: t.c.n + acc['n']}
+    for m in METRICAS:
+        suma, n, minimo, maximo = acc[m]
+        if not n:
+            continue
+        col_min, col_max = t.c[f'min_{m}'], t.c[f'max_{m}']
+        valores[t.c[f'suma_{m}']] = t.c[f'suma_{m}'] + suma
+        valores[t.c[f'n_{m}']] = t.c[f'n_{m}'] + n
+        valores[col_min] = db.case((db.or_(col_min.is_(None), col_min > minimo), minimo), else_=col_min)
+        valores[col_max] = db.case((db.or_(col_max.is_(None), col_max < maximo), maximo), else_=col_max)
+
+    if db.session.execute(t.update().where(condicion).values(valores)).rowcount:
+        return
+
+    nueva = {'user_id': user_id, 'nombre_finca': nombre_finca, 'tipo_periodo': tipo,
+             'periodo': periodo, 'n': acc['n']}
+    for m in METRICAS:
+        suma, n, minimo, maximo = acc[m]
+        nueva.update({f'suma_{m}': suma, f'n_{m}': n, f'min_{m}': minimo, f'max_{m}': maximo})
+    try:
+        with db.session.begin_nested():
+            db.session.execute(t.insert().values(nueva))
+    except IntegrityError:
+        # Otra petición creó la fila entre el UPDATE y el INSERT
+        db.session.execute(t.update().where(condicion).values(valores))
+
+
+def registrar(filas):
+    """Suma las filas (dicts o CalculoEUDR) a sus agregados. No hace commit."""
+    for clave, acc in _acumular(filas).items():
+        _aplicar(clave, acc)
+
+
+def reconstruir(tamano_lote=5000, log=print):
+    """
+    Recalcula todos los agregados recorriendo calculos_eudr por id en bloques.
+    Solo hasta el último id que había al borrar: los cálculos que llegan
+    mientras tanto ya los suma `registrar` sobre la tabla vacía.
+    """
+    columnas = [CalculoEUDR.id, CalculoEUDR.user_id, CalculoEUDR.nombre_finca,
+                CalculoEUDR.fecha, *(getattr(CalculoEUDR, m) for m in METRICAS)]
+    tope = db.session.query(db.func.max(CalculoEUDR.id)).scalar() or 0
+    db.session.query(TendenciaCalculo).delete()
+    db.session.commit()
+
+    ultimo_id, total = 0, 0
+    while True:
+        filas = db.session.query(*columnas) \
+            .filter(CalculoEUDR.id > ultimo_id, CalculoEUDR.id <= tope) \
+            .order_by(CalculoEUDR.id).limit(tamano_lote).all()
+        if not filas:
+            break
+        registrar([fila._asdict() for fila in filas])
+        db.session.commit()
+        ultimo_id = filas[-1].id
+        total += len(filas)
+        log(f"{total} cálculos procesados")
+    return total
+
+
+def serie(user_id, tipo_periodo, nombre_finca=None):
+    """Puntos de la serie agrupados por finca, en orden cronológico."""
+    query = TendenciaCalculo.query.filter_by(user_id=user_id, tipo_periodo=tipo_periodo)
+    if nombre_finca:
+        query = query.filter_by(nombre_finca=nombre_finca)
+
+    fincas = {}
+    for fila in query.order_by(TendenciaCalculo.nombre_finca, TendenciaCalculo.periodo):
+        punto = {"periodo": fila.periodo, "n": fila.n}
+        for m in METRICAS:
+            n = getattr(fila, f'n_{m}')
+            punto[m] = {
+                "promedio": round(getattr(fila, f'suma_{m}') / n, 3) if n else None,
+                "min": getattr(fila, f'min_{m}'),
+                "max": getattr(fila, f'max_{m}'),
+            }
+        fincas.setdefault(fila.nombre_finca, []).append(punto)
+
+    return [{"finca": finca, "puntos": puntos} for finca, puntos in fincas.items()]
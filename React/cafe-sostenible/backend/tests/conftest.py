@@ -0,0 +1,52 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.py crea la app al importarse: que no intente conectar a SQL Server
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import create_app, hash_text
+from models import db, Finca, User
+
+
+@pytest.fixture
+def configuracion(tmp_path):
+    """Config de la app de prueba; otra create_app con la misma es otro worker."""
+    return {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SESSION_COOKIE_SECURE': False,
+        'CACHE_DIR': str(tmp_path / 'cache'),
+    }
+
+
+@pytest.fixture
+def app(configuracion):
+    app = create_app(configuracion)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def usuario(app):
+    finca = Finca(nombre='Finca La Prueba', codigo_hash=hash_text('ASOC-0001'), codigo_original='ASOC-0001')
+    user = User(username='productor', password_hash=hash_text('clave'), nombre='Ana', apellido='Pérez',
+                codigo_asociado_hash=hash_text('ASOC-0001'), finca=finca)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def cliente(app, usuario):
+    """Cliente con la sesión de `usuario` iniciada."""
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = usuario.id
+    return cliente
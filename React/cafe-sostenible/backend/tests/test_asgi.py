@@ -0,0 +1,44 @@
+# backend/tests/test_asgi.py
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import noticias
+
+RETRASO = 0.5
+
+
+@pytest.fixture
+def asgi():
+    import asgi
+    yield asgi
+    noticias.cache.modo_async = False   # lo activa asgi.py al importarse
+
+
+def test_consultas_lentas_no_frenan_el_login(app, usuario, asgi):
+    def lenta():
+        time.sleep(RETRASO)   # una consulta pesada del historial
+        return 'ok'
+    app.add_url_rule('/lenta', 'lenta', lenta)
+    servidor = asgi.WsgiEnHilos(app)
+
+    async def medir():
+        transporte = httpx.ASGITransport(app=servidor)
+        async with httpx.AsyncClient(transport=transporte, base_url='http://prueba') as cliente:
+            inicio = time.perf_counter()
+            lentas = [asyncio.create_task(cliente.get('/lenta')) for _ in range(4)]
+            await asyncio.sleep(0.05)
+            antes = time.perf_counter()
+            login = await cliente.post('/api/login', data={'username': 'productor', 'password': 'clave'})
+            latencia_login = time.perf_counter() - antes
+            respuestas = await asyncio.gather(*lentas)
+            return login, latencia_login, respuestas, time.perf_counter() - inicio
+
+    login, latencia_login, respuestas, total = asyncio.run(medir())
+    assert login.status_code == 200 and login.json()['status'] == 'success'
+    assert all(r.status_code == 200 for r in respuestas)
+    # El login no espera detrás de las lentas y las lentas corren a la vez
+    assert latencia_login < RETRASO / 2
+    assert total < 2 * RETRASO
@@ -0,0 +1,21 @@
+# backend/tests/test_benchmark.py
+import benchmark
+from models import db, BenchmarkBucket, CalculoEUDR
+
+PAYLOAD = {'nombreFinca': 'Finca La Prueba', 'areaCultivada': 2, 'produccionVerde': 1500}
+
+
+def test_reconstruir_no_cuenta_dos_veces_los_calculos_nuevos(usuario, cliente):
+    for _ in range(3):
+        assert cliente.post('/api/historial', json=PAYLOAD).status_code == 201
+
+    def guardar_otro(_):
+        # Un cálculo que llega a mitad de la reconstrucción (lo cuenta registrar)
+        if CalculoEUDR.query.count() == 3:
+            assert cliente.post('/api/historial', json=PAYLOAD).status_code == 201
+
+    assert benchmark.reconstruir(tamano_lote=1, log=guardar_otro) == 3
+    db.session.expire_all()
+    conteo = db.session.query(db.func.sum(BenchmarkBucket.conteo)).filter_by(
+        metrica='huella_por_kg', temporada=benchmark.TODAS).scalar()
+    assert conteo == 4
@@ -0,0 +1,98 @@
+# backend/tests/test_bosque.py
+import json
+
+import numpy as np
+import pytest
+
+import bosque
+import huella
+import importador
+from models import db, CalculoEUDR
+
+# 1024 x 1024 píxeles de 0.001° en 4 tiles; solo el tile 0_0 tiene archivos
+ORIGEN = (-84.0, 11.0)
+PIXEL = 0.001
+
+
+@pytest.fixture
+def raster(tmp_path):
+    ruta = tmp_path / 'raster'
+    for capa in ('base', 'actual'):
+        (ruta / capa).mkdir(parents=True)
+    (ruta / 'indice.json').write_text(json.dumps({
+        'nombre': 'prueba', 'origen': ORIGEN, 'pixel': [PIXEL, PIXEL],
+        'filas': 1024, 'columnas': 1024, 'tile': 512,
+    }))
+    np.save(ruta / 'base' / '0_0.npy', np.full((512, 512), 80, dtype=np.uint8))
+    np.save(ruta / 'actual' / '0_0.npy', np.full((512, 512), 60, dtype=np.uint8))
+    return str(ruta)
+
+
+def _cuadrado(lon, lat, lado=0.05):
+    return {'type': 'Polygon', 'coordinates': [[
+        [lon, lat], [lon + lado, lat], [lon + lado, lat - lado], [lon, lat - lado], [lon, lat],
+    ]]}
+
+
+def _verificar(usuario, raster, geometria):
+    bosque.guardar_poligonos(usuario.finca_id, bosque.geometria.leer(geometria))
+    db.session.commit()
+    verificacion, = bosque.verificar([usuario.finca_id], procesos=1, ruta=raster, log=lambda _: None)
+    return verificacion
+
+
+def _guardar(cliente):
+    respuesta = cliente.post('/api/historial', json={
+        'nombreFinca': 'Finca La Prueba', 'areaCultivada': 3, 'produccionVerde': 2000,
+        'bosqueBase': 2, 'bosqueActual': 0.5,
+    })
+    assert respuesta.status_code == 201, respuesta.get_json()
+    return CalculoEUDR.query.order_by(CalculoEUDR.id.desc()).first()
+
+
+@pytest.mark.parametrize('lon, lat', [
+    (ORIGEN[0] + 0.7, ORIGEN[1] - 0.7),    # tile 1_1, sin archivos
+    (ORIGEN[0] + 2.0, ORIGEN[1] - 0.2),    # al este del raster
+], ids=['tile_faltante', 'fuera_del_raster'])
+def test_sin_datos_conserva_bosque_manual(usuario, cliente, raster, lon, lat):
+    verificacion = _verificar(usuario, raster, _cuadrado(lon, lat))
+    assert verificacion.sin_datos_porc == 100.0
+    assert bosque.vigentes([usuario.id]) == {}
+
+    calculo = _guardar(cliente)
+    assert (calculo.bosque_base, calculo.bosque_actual, calculo.verificacion_id) == (2.0, 0.5, None)
+
+    filas = bosque.aplicar([{'user_id': usuario.id, 'bosque_base': 2.0, 'bosque_actual': 0.5}])
+    assert filas[0] == {'user_id': usuario.id, 'bosque_base': 2.0, 'bosque_actual': 0.5,
+                       'verificacion_id': None, 'area_bosque': None}
+
+
+def test_verificacion_con_datos_reemplaza_bosque(usuario, cliente, raster):
+    verificacion = _verificar(usuario, raster, _cuadrado(ORIGEN[0] + 0.1, ORIGEN[1] - 0.1))
+    assert verificacion.sin_datos_porc == 0.0
+    assert bosque.vigentes([usuario.id])[usuario.id].id == verificacion.id
+
+    calculo = _guardar(cliente)
+    assert calculo.verificacion_id == verificacion.id
+    assert calculo.bosque_base == pytest.approx(verificacion.bosque_base_ha)
+    assert calculo.bosque_actual == pytest.approx(verificacion.bosque_actual_ha)
+    assert calculo.area_bosque == pytest.approx(verificacion.area_ha)
+
+
+def test_deforestacion_guardada_igual_a_la_verificada(usuario, cliente, raster):
+    # Polígono de ~3000 ha y 3 ha cultivadas: sobre el área cultivada daría otro porcentaje
+    verificacion = _verificar(usuario, raster, _cuadrado(ORIGEN[0] + 0.1, ORIGEN[1] - 0.1))
+    assert verificacion.deforestacion_porc == pytest.approx(20.0)   # 80 % → 60 % de cobertura
+
+    calculo = _guardar(cliente)
+    assert calculo.deforestacion_porc == round(verificacion.deforestacion_porc, 1)
+
+    # Mismo porcentaje por importación y al recalcular desde la fila guardada
+    importador.insertar_lote([{
+        'user_id': usuario.id, 'nombre_finca': 'Importado', 'fecha': calculo.fecha,
+        'area_cultivada': 3.0, 'produccion_verde': 2000.0, 'bosque_base': 2.0, 'bosque_actual': 0.5,
+    }])
+    importado = CalculoEUDR.query.filter_by(nombre_finca='Importado').one()
+    assert importado.deforestacion_porc == calculo.deforestacion_porc
+    resultado = huella.calcular_lote(huella.columnas_desde_registros([calculo.to_dict()]))
+    assert round(float(resultado['deforestacion_porc'][0]), 1) == calculo.deforestacion_porc
@@ -0,0 +1,109 @@
+# backend/tests/test_busqueda.py
+import random
+import time
+from datetime import datetime
+
+import pytest
+
+import busqueda
+import importador
+from app import create_app
+from models import db, CalculoEUDR
+
+NOMBRES = ['Café Altamira', 'CAFE ALTAMIRA', 'La Esperanza', 'Finca Ñandú', 'El Porvenir', 'San José',
+           'Porvenir del Norte', 'Los Ángeles', 'Las Brisas 50%', 'lote_2', 'Güegüense', 'San Jose']
+
+
+def _insertar(usuario, nombres, **extra):
+    importador.insertar_lote([{'user_id': usuario.id, 'nombre_finca': nombre, 'fecha': datetime(2025, 1, 1),
+                               'area_cultivada': 2.0, 'produccion_verde': 1500.0, **extra}
+                              for nombre in nombres])
+
+
+def _finca(cliente, texto):
+    respuesta = cliente.get('/api/v1/historial', query_string={'finca': texto, 'per_page': 100})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return sorted(item['nombre_finca'] for item in respuesta.get_json()['data']['items'])
+
+
+def _oraculo(usuario, texto):
+    """LIKE sobre los nombres normalizados en Python: lo que la búsqueda debe devolver."""
+    buscado = busqueda.normalizar(texto)
+    return sorted(c.nombre_finca for c in CalculoEUDR.query.filter_by(user_id=usuario.id)
+                  if buscado in busqueda.normalizar(c.nombre_finca))
+
+
+@pytest.fixture
+def fincas(usuario):
+    _insertar(usuario, NOMBRES)
+
+
+@pytest.mark.parametrize('texto', ['altamira', 'ALTAMÍRA', 'cafe', 'nandu', 'jose', 'josé', 'porvenir',
+                                   'an', 'e', 'ángeles', '50%', '%', 'lote_', '_', 'gueg', 'xyz', 'a a'])
+def test_igual_que_like(fincas, usuario, cliente, texto):
+    assert _finca(cliente, texto) == _oraculo(usuario, texto)
+
+
+def test_igual_que_like_aleatorio(usuario, cliente):
+    rng = random.Random(7)
+    letras = 'aábcdeéinñoóstuü %_'
+    nombres = [''.join(rng.choice(letras) for _ in range(rng.randint(3, 12))) for _ in range(60)]
+    _insertar(usuario, nombres)
+    for _ in range(100):
+        texto = ''.join(rng.choice(letras) for _ in range(rng.randint(1, 4))).strip() or 'a'
+        assert _finca(cliente, texto) == _oraculo(usuario, texto), texto
+
+
+def test_search_no_fecha_busca_finca(fincas, usuario, cliente):
+    items = cliente.get('/api/historial', query_string={'search': 'esperanza'}).get_json()['items']
+    assert [item['nombre_finca'] for item in items] == ['La Esperanza']
+
+
+def test_solo_nombres_del_usuario(fincas, usuario, cliente):
+    from models import User
+    otro = User(username='otro', password_hash='x', nombre='O', apellido='T', codigo_asociado_hash='x')
+    db.session.add(otro)
+    db.session.commit()
+    _insertar(otro, ['Altamira de Otro'])
+    assert _finca(cliente, 'altamira') == ['CAFE ALTAMIRA', 'Café Altamira']
+
+
+def test_id_menor_confirmado_tarde(app, usuario, cliente):
+    _insertar(usuario, ['Primera'])
+    primera = CalculoEUDR.query.one().id
+    assert _finca(cliente, 'primera') == ['Primera']
+    # Otra transacción tomó primera + 1 pero confirma después que primera + 2
+    _insertar(usuario, ['Tercera'])
+    db.session.execute(db.text("UPDATE calculos_eudr SET id = :nuevo WHERE nombre_finca = 'Tercera'"),
+                       {'nuevo': primera + 2})
+    db.session.commit()
+    assert _finca(cliente, 'tercera') == ['Tercera']
+    indice = app.extensions['busqueda']['nombres']
+    assert indice.huecos.keys() == {primera + 1}
+
+    _insertar(usuario, ['Segunda tardía'])
+    db.session.execute(db.text("UPDATE calculos_eudr SET id = :nuevo WHERE nombre_finca = 'Segunda tardía'"),
+                       {'nuevo': primera + 1})
+    db.session.commit()
+    assert _finca(cliente, 'tardía') == ['Segunda tardía']
+    assert indice.huecos == {}
+
+
+def test_huecos_viejos_se_olvidan(app, usuario, cliente):
+    _insertar(usuario, ['Uno'])
+    _finca(cliente, 'uno')
+    indice = app.extensions['busqueda']['nombres']
+    # Visto hace mucho: rollback o transacción abandonada
+    indice.huecos = {0: time.monotonic() - busqueda.ESPERA_HUECOS - 1}
+    _finca(cliente, 'un')   # otro texto: la respuesta anterior está en la caché
+    assert indice.huecos == {}
+
+
+def test_indice_por_app(configuracion, tmp_path, fincas, cliente):
+    assert _finca(cliente, 'altamira') == ['CAFE ALTAMIRA', 'Café Altamira']
+    otra = create_app({**configuracion, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'otra.db'}"})
+    with otra.app_context():
+        db.create_all()
+        assert otra.extensions['busqueda']['nombres'] is None
+        assert busqueda.indice_nombres().buscar(1, 'altamira') == []
+        db.engine.dispose()
@@ -0,0 +1,42 @@
+# backend/tests/test_cache_respuestas.py
+from app import create_app
+import cache_respuestas
+
+PAYLOAD = {'nombreFinca': 'Finca La Prueba', 'areaCultivada': 2, 'produccionVerde': 1500}
+
+
+def _cliente(app, usuario):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = usuario.id
+    return cliente
+
+
+def test_guardar_en_un_worker_invalida_en_los_demas(configuracion, usuario, cliente):
+    # Otra app con la misma config: otro worker de gunicorn con su propio proceso
+    otro = _cliente(create_app(configuracion), usuario)
+
+    primera = otro.get('/api/historial')
+    assert primera.headers['X-Cache'] == 'MISS' and primera.get_json()['total'] == 0
+    assert cliente.get('/api/historial').headers['X-Cache'] == 'HIT'   # caché compartida
+
+    assert cliente.post('/api/historial', json=PAYLOAD).status_code == 201
+    despues = otro.get('/api/historial', headers={'If-None-Match': primera.headers['ETag'].strip('"')})
+    assert despues.status_code == 200 and despues.headers['X-Cache'] == 'MISS'
+    assert despues.get_json()['total'] == 1
+
+
+def test_backend_por_defecto_compartido(configuracion, app):
+    assert isinstance(app.extensions['cache_respuestas'], cache_respuestas.ArchivosCache)
+    memoria = create_app({**configuracion, 'CACHE_BACKEND': 'memoria'})
+    assert isinstance(memoria.extensions['cache_respuestas'], cache_respuestas.MemoriaLRU)
+
+
+def test_limpiar_borra_las_entradas_vencidas(tmp_path):
+    cache = cache_respuestas.ArchivosCache(str(tmp_path))
+    cache.set('vencida', b'x', ttl=-1)
+    cache.set('vigente', b'y', ttl=60)
+    cache.set('ver:espacio', b'z')
+    cache.limpiar()
+    assert (cache.get('vencida'), cache.get('vigente'), cache.get('ver:espacio')) == (None, b'y', b'z')
+    assert len(list(tmp_path.iterdir())) == 2
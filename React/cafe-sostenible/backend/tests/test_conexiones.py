@@ -0,0 +1,91 @@
+# backend/tests/test_conexiones.py
+import pytest
+
+import conexiones
+from app import create_app, hash_text
+from models import db, CalculoEUDR, Finca, User
+
+CALCULO = {'nombreFinca': 'Finca La Prueba', 'areaCultivada': 2, 'produccionVerde': 1500}
+
+
+@pytest.fixture
+def replica(configuracion, tmp_path):
+    """App con réplica: otro archivo SQLite con el mismo esquema y los mismos usuarios, sin cálculos."""
+    app = create_app({**configuracion, 'DATABASE_READ_URL': f"sqlite:///{tmp_path / 'replica.db'}",
+                      'DB_LECTURA_PEGAJOSA_S': 60})
+
+    @app.route('/calculos')
+    def calculos():
+        return {'total': CalculoEUDR.query.count()}
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[conexiones.LECTURA])
+        for engine in (db.engine, db.engines[conexiones.LECTURA]):
+            with engine.begin() as conn:
+                conn.execute(Finca.__table__.insert(), {'id': 1, 'nombre': 'Finca La Prueba',
+                                                        'codigo_hash': hash_text('ASOC-0001')})
+                conn.execute(User.__table__.insert(), {
+                    'id': 1, 'username': 'productor', 'password_hash': hash_text('clave'), 'nombre': 'Ana',
+                    'apellido': 'Pérez', 'codigo_asociado_hash': hash_text('ASOC-0001'), 'finca_id': 1})
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registra un MetaData por bind en el `db` global; las apps siguientes no tienen réplica
+    db.metadatas.pop(conexiones.LECTURA, None)
+
+
+def _cliente(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 1
+    return cliente
+
+
+def _marca(cliente):
+    with cliente.session_transaction() as sesion:
+        return sesion.get(conexiones.MARCA_ESCRITURA)
+
+
+def test_lecturas_a_la_replica_y_pegajosa_tras_escribir(replica):
+    cliente = _cliente(replica)
+    assert cliente.get('/calculos').get_json()['total'] == 0   # réplica vacía
+
+    assert cliente.post('/api/historial', json=CALCULO).status_code == 201
+    assert _marca(cliente) is not None
+    assert cliente.get('/calculos').get_json()['total'] == 1   # primario mientras dure la marca
+
+    otro = _cliente(replica)   # otro navegador, sin marca
+    assert otro.get('/calculos').get_json()['total'] == 0
+
+    with cliente.session_transaction() as sesion:
+        sesion[conexiones.MARCA_ESCRITURA] -= 61
+    assert cliente.get('/calculos').get_json()['total'] == 0   # vencida: de nuevo la réplica
+
+
+@pytest.mark.parametrize('peticion', [
+    lambda c: c.post('/api/logout'),
+    lambda c: c.post('/api/historial', json=[1]),                                # rechazado antes de escribir
+    lambda c: c.post('/api/historial', json={**CALCULO, 'areaCultivada': -1}),   # validación del motor
+    lambda c: c.post('/api/login', data={'username': 'productor', 'password': 'clave'}),
+], ids=['logout', 'json_invalido', 'calculo_invalido', 'login'])
+def test_sin_commit_no_hay_marca(replica, peticion):
+    cliente = _cliente(replica)
+    peticion(cliente)
+    assert _marca(cliente) is None
+    with replica.app_context():
+        assert CalculoEUDR.query.count() == 0
+
+
+def test_commit_fallido_no_deja_marca(replica, monkeypatch):
+    import tendencias
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("sin espacio")
+    monkeypatch.setattr(tendencias, 'registrar', falla)   # después del flush, antes del commit
+
+    cliente = _cliente(replica)
+    assert cliente.post('/api/historial', json=CALCULO).status_code == 400
+    assert _marca(cliente) is None
+    assert cliente.get('/calculos').get_json()['total'] == 0
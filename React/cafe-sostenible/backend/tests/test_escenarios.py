@@ -0,0 +1,43 @@
+# backend/tests/test_escenarios.py
+import escenarios
+from models import CalculoEUDR
+
+CALCULO = {
+    'nombreFinca': 'Finca La Prueba', 'areaCultivada': 2, 'produccionVerde': 1500,
+    'fertilizanteTotal': 400, 'tipoFertilizante': 'sintetico', 'energiaElectrica': 300,
+    'combustibleLitros': 120, 'tipoCombustible': 'diesel', 'arbolesSombra': 100,
+    'areaCopaPromedio': 20, 'tipoProcesamiento': 'lavado', 'residuosTotales': 900, 'residuosCompostados': 90,
+}
+
+
+def _escenarios(cliente, **args):
+    assert cliente.post('/api/historial', json=CALCULO).status_code == 201
+    calculo = CalculoEUDR.query.one()
+    respuesta = cliente.get(f'/api/v1/escenarios/{calculo.id}', query_string=args)
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return respuesta.get_json()['data']
+
+
+def test_arboles_de_sombra_fuera_del_ranking(cliente):
+    data = _escenarios(cliente, top=100)
+
+    assert 'arboles_adicionales_ha' not in data['palancas']
+    assert data['combinaciones'] == 2 * 5 * 3 * 4 * 4 * 4   # sin multiplicar por las opciones de árboles
+    assert all('arboles_adicionales_ha' not in r['cambios'] for r in data['ranking'] + data['individuales'])
+    assert all(r['reduccion_por_kg'] > 0 for r in data['ranking'])
+
+
+def test_arboles_de_sombra_como_cobeneficio(cliente):
+    data = _escenarios(cliente)
+    arboles = data['cobeneficios']['arboles_adicionales_ha']
+
+    assert [a['valor'] for a in arboles] == list(escenarios.COBENEFICIOS['arboles_adicionales_ha'][1:])
+    assert [a['arboles_por_ha'] for a in arboles] == [75, 100, 150]
+    # 20 m² de copa por árbol: cada árbol por ha suma 0,2 % de cobertura
+    assert [a['cobertura_porc'] for a in arboles] == [15.0, 20.0, 30.0]
+    assert data['base']['cobertura_porc'] == 10.0
+
+
+def test_cobeneficio_desactivable(cliente):
+    data = _escenarios(cliente, arboles_adicionales_ha='0')
+    assert data['cobeneficios'] == {}
@@ -0,0 +1,25 @@
+# backend/tests/test_exportar.py
+import io
+import zipfile
+from xml.etree import ElementTree
+
+import exportar
+
+NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def _xlsx(filas):
+    datos = b''.join(exportar.generar_xlsx(['a', 'b', 'c'], [filas]))
+    with zipfile.ZipFile(io.BytesIO(datos)) as libro:
+        hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+    return [[c for c in fila.findall('x:c', NS)] for fila in hoja.findall('.//x:row', NS)][1:]
+
+
+def test_xlsx_no_finitos_como_texto():
+    fila, = _xlsx([(float('nan'), float('inf'), 1.5)])
+    assert [c.findtext('x:is/x:t', namespaces=NS) for c in fila[:2]] == ['nan', 'inf']
+    assert all(c.find('x:v', NS) is None for c in fila[:2])
+    assert fila[2].findtext('x:v', namespaces=NS) == '1.5'
+
+    csv = b''.join(exportar.generar_csv(['a', 'b', 'c'], [[(float('nan'), float('inf'), 1.5)]]))
+    assert csv.decode('utf-8-sig').splitlines()[1] == 'nan,inf,1.5'
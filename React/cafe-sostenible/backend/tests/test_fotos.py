@@ -0,0 +1,159 @@
+# backend/tests/test_fotos.py
+import hashlib
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import fotos
+from models import db, FotoPerfil, FotoVariante, User
+
+
+@pytest.fixture(autouse=True)
+def sin_pool(monkeypatch):
+    """La transcodificación se corre a mano con fotos.reducir, no en el pool de hilos."""
+    monkeypatch.setattr(fotos, 'programar', lambda foto_hash: True)
+
+
+def _imagen(formato, imagen):
+    salida = io.BytesIO()
+    imagen.save(salida, formato, quality=90)
+    return salida.getvalue()
+
+
+def _subir(cliente, datos, nombre):
+    respuesta = cliente.post('/api/cambiar-foto', data={'foto_perfil': (io.BytesIO(datos), nombre)})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return hashlib.sha256(datos).hexdigest()
+
+
+def test_reducir_no_modifica_la_foto_original(usuario, cliente):
+    ruido = (np.random.default_rng(0).random((1200, 1600, 3)) * 255).astype('uint8')
+    datos = _imagen('JPEG', Image.fromarray(ruido))
+    foto_hash = _subir(cliente, datos, 'foto.jpg')
+
+    assert fotos.reducir(foto_hash)
+    db.session.expire_all()
+    foto = db.session.get(FotoPerfil, foto_hash)
+    assert (foto.datos, foto.mime, foto.tamano) == (datos, 'image/jpeg', len(datos))
+    assert hashlib.sha256(foto.datos).hexdigest() == foto_hash
+    assert db.session.get(User, usuario.id).foto_mime == 'image/jpeg'
+
+    grande = db.session.get(FotoVariante, (foto_hash, 'grande'))
+    assert grande.mime == 'image/webp' and grande.tamano < len(datos)
+    with Image.open(io.BytesIO(grande.datos)) as imagen:
+        assert max(imagen.size) == fotos.LADO_MAXIMO
+
+    # Bajo el hash sigue el contenido que da ese hash
+    respuesta = cliente.get(f'/api/user/foto/{foto_hash}')
+    assert respuesta.data == datos and respuesta.mimetype == 'image/jpeg'
+    respuesta = cliente.get(f'/api/user/foto/{foto_hash}/grande')
+    assert respuesta.data == grande.datos
+    assert 'immutable' in respuesta.headers['Cache-Control']
+
+
+def test_grande_es_el_original_si_no_pesa_menos(usuario, cliente):
+    datos = _imagen('GIF', Image.new('P', (1, 1)))
+    foto_hash = _subir(cliente, datos, 'punto.gif')
+
+    assert fotos.reducir(foto_hash)
+    assert db.session.get(FotoVariante, (foto_hash, 'grande')) is None
+    assert db.session.get(FotoVariante, (foto_hash, 'avatar')) is not None
+
+    respuesta = cliente.get(f'/api/user/foto/{foto_hash}/grande')
+    assert respuesta.data == datos and respuesta.mimetype == 'image/gif'
+    assert 'immutable' in respuesta.headers['Cache-Control']
+
+
+def test_misma_foto_se_guarda_una_sola_vez(app, usuario, cliente):
+    datos = _imagen('PNG', Image.new('RGB', (8, 8), 'green'))
+    foto_hash = _subir(cliente, datos, 'foto.png')
+
+    respuesta = app.test_client().post('/api/register', data={
+        'username': 'vecina', 'password': 'clave', 'nombre': 'Rosa', 'apellido': 'López',
+        'codigo_asociado': 'ASOC-0001', 'foto_perfil': (io.BytesIO(datos), 'misma.png'),
+    })
+    assert respuesta.status_code == 200, respuesta.get_json()
+
+    assert FotoPerfil.query.count() == 1
+    assert {u.foto_hash for u in User.query} == {foto_hash}
+    assert cliente.get('/api/user').get_json()['foto_src'].endswith(f'/api/user/foto/{foto_hash}/avatar')
+
+
+def test_subida_concurrente_de_la_misma_foto(app, usuario, cliente, monkeypatch):
+    datos = _imagen('PNG', Image.new('RGB', (8, 8), 'blue'))
+    consultar = db.session.query
+
+    class Carrera:
+        """La consulta de existencia no encuentra la foto y otra subida la guarda justo después."""
+        def __init__(self, *columnas):
+            self.consulta = consultar(*columnas)
+
+        def filter_by(self, **filtros):
+            self.consulta = self.consulta.filter_by(**filtros)
+            return self
+
+        def scalar(self):
+            existe = self.consulta.scalar()
+            with db.engine.begin() as conn:
+                conn.execute(FotoPerfil.__table__.insert().values(
+                    hash=hashlib.sha256(datos).hexdigest(), mime='image/png', datos=datos, tamano=len(datos)))
+            return existe
+
+    with monkeypatch.context() as m:
+        m.setattr(db.session, 'query', Carrera)
+        foto_hash = _subir(cliente, datos, 'foto.png')
+
+    assert FotoPerfil.query.count() == 1
+    assert db.session.get(User, usuario.id).foto_hash == foto_hash
+
+
+def test_foto_por_hash_cacheable(usuario, cliente):
+    datos = _imagen('PNG', Image.new('RGB', (8, 8), 'red'))
+    foto_hash = _subir(cliente, datos, 'foto.png')
+
+    respuesta = cliente.get(f'/api/user/foto/{foto_hash}')
+    assert (respuesta.status_code, respuesta.data, respuesta.mimetype) == (200, datos, 'image/png')
+    assert respuesta.headers['ETag'] == f'"{foto_hash}"'
+    assert respuesta.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    revalidada = cliente.get(f'/api/user/foto/{foto_hash}', headers={'If-None-Match': f'"{foto_hash}"'})
+    assert revalidada.status_code == 304 and revalidada.data == b''
+
+    # Sin transcodificar todavía: la variante es el original, sin cachear
+    avatar = cliente.get(f'/api/user/foto/{foto_hash}/avatar')
+    assert avatar.data == datos and avatar.headers['Cache-Control'] == 'no-cache'
+
+    assert cliente.get(f'/api/user/foto/{"0" * 64}').status_code == 404
+    assert cliente.get(f'/api/user/foto/{foto_hash}/enorme').status_code == 404
+
+
+def test_migracion_mueve_fotos_heredadas_deduplicando(app, usuario):
+    import migraciones
+
+    datos = _imagen('PNG', Image.new('RGB', (4, 4), 'blue'))
+    otro = User(username='otro', password_hash='x', nombre='Otro', apellido='Más',
+                codigo_asociado_hash='x', foto_perfil=datos, foto_mime='image/png')
+    usuario.foto_perfil = datos
+    db.session.add(otro)
+    db.session.commit()
+
+    assert migraciones.mover_fotos(tamano_lote=1) == 2
+    db.session.expire_all()
+    foto_hash = hashlib.sha256(datos).hexdigest()
+    assert [f.hash for f in FotoPerfil.query] == [foto_hash]
+    assert {(u.foto_hash, u.foto_perfil) for u in User.query} == {(foto_hash, None)}
+
+
+@pytest.mark.parametrize('tamano, estado', [(2048, 400), (80 * 1024, 413)])
+def test_limite_de_tamano(usuario, cliente, monkeypatch, tamano, estado):
+    monkeypatch.setattr(fotos, 'BYTES_MAXIMOS', 1024)
+    monkeypatch.setattr(fotos, 'BYTES_PETICION', 1024 + 64 * 1024)
+    datos = _imagen('PNG', Image.new('RGB', (1, 1))) + b'\0' * tamano
+
+    respuesta = cliente.post('/api/cambiar-foto', data={'foto_perfil': (io.BytesIO(datos), 'grande.png')})
+    assert respuesta.status_code == estado
+    assert respuesta.get_json()['status'] == 'error'
+    assert FotoPerfil.query.count() == 0
+    assert db.session.get(User, usuario.id).foto_hash is None
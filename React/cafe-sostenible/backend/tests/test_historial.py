@@ -0,0 +1,177 @@
+# backend/tests/test_historial.py
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import historial
+import importador
+from models import CalculoEUDR
+
+
+@pytest.mark.parametrize('cuerpo', [[1], 5, 'texto', None])
+def test_guardar_rechaza_cuerpo_que_no_es_objeto(cliente, cuerpo):
+    respuesta = cliente.post('/api/historial', json=cuerpo)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['status'] == 'error'
+    assert CalculoEUDR.query.count() == 0
+
+
+@pytest.mark.parametrize('registro', [[1], 5, 'texto', None])
+def test_lote_rechaza_registro_que_no_es_objeto(cliente, registro):
+    registros = [{'areaCultivada': 2, 'produccionVerde': 1500}, registro]
+    respuesta = cliente.post('/api/calcular/lote', json={'registros': registros})
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['message'] == 'Cada registro debe ser un objeto'
+
+
+def _sembrar(usuario, fechas):
+    """Un cálculo por fecha (las repetidas empatan); devuelve los ids en el orden del historial."""
+    importador.insertar_lote([{
+        'user_id': usuario.id, 'nombre_finca': f'Finca {i}', 'fecha': fecha,
+        'area_cultivada': 2.0, 'produccion_verde': 1000.0 + i,
+    } for i, fecha in enumerate(fechas)])
+    filas = CalculoEUDR.query.order_by(CalculoEUDR.fecha.desc(), CalculoEUDR.id.desc())
+    return [c.id for c in filas]
+
+
+def _recorrer(cliente, ruta, **args):
+    ids, after, paginas = [], None, 0
+    while True:
+        consulta = dict(args, **({'after': after} if after else {}))
+        data = cliente.get(ruta, query_string=consulta).get_json()
+        data = data['data'] if 'data' in data else data
+        ids += [item['id'] for item in data['items']]
+        after = data.get('pagination', data)['next_cursor']
+        paginas += 1
+        if after is None:
+            return ids, paginas
+        assert paginas < 20, "el cursor no avanza"
+
+
+def test_cursor_recorre_todo_con_fechas_empatadas(usuario, cliente):
+    # Cinco cálculos en el mismo instante: el cursor cae en medio del empate
+    empate = datetime(2025, 3, 10, 8, 30)
+    esperado = _sembrar(usuario, [datetime(2025, 3, 9), empate, empate, empate, empate, empate,
+                                  datetime(2025, 3, 11), datetime(2025, 2, 1)])
+
+    for ruta in ('/api/historial', '/api/v1/historial'):
+        ids, paginas = _recorrer(cliente, ruta, per_page=3)
+        assert ids == esperado
+        assert paginas == 3
+
+    primera = cliente.get('/api/v1/historial', query_string={'per_page': 3}).get_json()['data']['pagination']
+    assert primera['next_cursor'] == f"{empate.isoformat()},{esperado[2]}"
+    segunda = cliente.get('/api/v1/historial', query_string={'per_page': 3, 'after': primera['next_cursor']})
+    pagination = segunda.get_json()['data']['pagination']
+    assert (pagination['page'], pagination['total'], pagination['has_prev']) == (None, None, True)
+
+
+def test_cursor_y_numero_de_pagina_coinciden(usuario, cliente):
+    esperado = _sembrar(usuario, [datetime(2025, 1, 1 + i % 3) for i in range(7)])
+    por_pagina = []
+    for page in (1, 2, 3):
+        data = cliente.get('/api/v1/historial', query_string={'per_page': 3, 'page': page}).get_json()['data']
+        por_pagina += [item['id'] for item in data['items']]
+        assert (data['pagination']['total'], data['pagination']['pages']) == (7, 3)
+    assert por_pagina == esperado == _recorrer(cliente, '/api/v1/historial', per_page=3)[0]
+
+
+def test_rangos_de_fecha_inclusivos(usuario, cliente):
+    fechas = [datetime(2025, 2, 28, 23, 59), datetime(2025, 3, 1), datetime(2025, 3, 31, 23, 59),
+              datetime(2025, 4, 1)]
+    _sembrar(usuario, fechas)
+
+    def nombres(**args):
+        items = cliente.get('/api/historial', query_string=args).get_json()['items']
+        return sorted(item['nombre_finca'] for item in items)
+
+    assert nombres(month='2025-03') == ['Finca 1', 'Finca 2']
+    assert nombres(**{'from': '2025-03-01', 'to': '2025-03-31'}) == ['Finca 1', 'Finca 2']
+    assert nombres(search='2025-02-28') == ['Finca 0']
+    assert nombres(**{'to': '2025-02-28'}) == ['Finca 0']
+
+
+@pytest.mark.parametrize('args', [{'after': 'no-es-cursor'}, {'month': '2025-13'}, {'from': 'ayer'}])
+def test_parametros_invalidos(usuario, cliente, args):
+    assert cliente.get('/api/historial', query_string=args).status_code == 400
+    assert cliente.get('/api/v1/historial', query_string=args).get_json()['success'] is False
+
+
+def _pagina(usuario, **args):
+    return historial.pagina(usuario.id, MultiDict(args), per_page_defecto=10)
+
+
+@pytest.fixture
+def variados(usuario):
+    tipos = ['lavado', 'miel', 'natural', None]
+    importador.insertar_lote([{
+        'user_id': usuario.id, 'nombre_finca': ['El Roble', 'La Ceiba', 'El Robledal'][i % 3],
+        'fecha': datetime(2025, 1 + i % 6, 1 + i % 27), 'area_cultivada': 1.0 + i % 5,
+        'produccion_verde': 800.0 + 37 * i, 'tipo_procesamiento': tipos[i % 4],
+        'fertilizante_total': 50.0 * (i % 7), 'tipo_fertilizante': 'sintetico' if i % 2 else 'organico',
+    } for i in range(60)])
+
+
+@pytest.mark.parametrize('args', [
+    {},
+    {'tipo_procesamiento': 'miel,natural'},
+    {'finca': 'roble', 'huella_max': '0.2'},
+    {'area_min': '2', 'area_max': '4', 'month': '2025-03'},
+    {'tipo_fertilizante': 'organico', 'huella_min': '0.05', 'from': '2025-02-01', 'to': '2025-05-31'},
+    {'finca': 'zzz'},
+])
+def test_sentencias_preparadas_igual_que_orm(app, usuario, variados, args):
+    consulta = CalculoEUDR.query.filter_by(user_id=usuario.id)
+    if 'tipo_procesamiento' in args:
+        consulta = consulta.filter(CalculoEUDR.tipo_procesamiento.in_(args['tipo_procesamiento'].split(',')))
+    if 'tipo_fertilizante' in args:
+        consulta = consulta.filter(CalculoEUDR.tipo_fertilizante == args['tipo_fertilizante'])
+    if 'finca' in args:
+        consulta = consulta.filter(CalculoEUDR.nombre_finca.ilike(f"%{args['finca']}%"))
+    for nombre, columna, operador in (('huella_min', 'huella_por_kg', '__ge__'), ('huella_max', 'huella_por_kg', '__le__'),
+                                      ('area_min', 'area_cultivada', '__ge__'), ('area_max', 'area_cultivada', '__le__')):
+        if nombre in args:
+            consulta = consulta.filter(getattr(getattr(CalculoEUDR, columna), operador)(float(args[nombre])))
+    desde, hasta = historial.rango_fechas(MultiDict(args))
+    if desde:
+        consulta = consulta.filter(CalculoEUDR.fecha >= desde)
+    if hasta:
+        consulta = consulta.filter(CalculoEUDR.fecha < hasta)
+    esperado = [c.id for c in consulta.order_by(*historial.ORDEN)]
+
+    ids, after = [], None
+    while True:
+        pagina = _pagina(usuario, per_page=7, **args, **({'after': after} if after else {}))
+        ids += [fila.id for fila in pagina['items']]
+        after = pagina['next_cursor']
+        if after is None:
+            break
+    assert ids == esperado
+    assert _pagina(usuario, **args)['total'] == len(esperado)
+
+
+def test_una_sentencia_por_forma(app, usuario, variados):
+    historial._sentencia_pagina.cache_clear()
+    historial._sentencia_conteo.cache_clear()
+    for minimo in ('1', '2', '3'):
+        _pagina(usuario, area_min=minimo, per_page=5)
+        _pagina(usuario, area_min=minimo, per_page=5, page=2)
+    _pagina(usuario, area_min='1', area_max='2')
+
+    # area_min (primera página y offset) y area_min + area_max: 3 formas, los valores van en parámetros
+    assert historial._sentencia_pagina.cache_info().currsize == 3
+    assert historial._sentencia_pagina.cache_info().hits == 4
+    assert historial._sentencia_conteo.cache_info().currsize == 2
+    clave = (None, ('area_min',), None)
+    assert historial._sentencia_pagina(*clave) is historial._sentencia_pagina(*clave)
+
+
+def test_total_aproximado(app, usuario, variados, monkeypatch):
+    monkeypatch.setattr(historial, 'LIMITE_CONTEO', 25)
+    historial._sentencia_conteo.cache_clear()   # el tope va fijo en la sentencia
+    pagina = _pagina(usuario, total='approx')
+    assert (pagina['total'], pagina['total_exacto'], pagina['pages']) == (25, False, 3)
+    assert _pagina(usuario, total='approx', tipo_procesamiento='miel')['total'] == 15
+    assert _pagina(usuario, total='none')['total'] is None
+    historial._sentencia_conteo.cache_clear()
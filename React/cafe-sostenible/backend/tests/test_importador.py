@@ -0,0 +1,62 @@
+# backend/tests/test_importador.py
+import io
+
+import importador
+from app import hash_text
+from models import db, CalculoEUDR, User
+
+
+def _otro_usuario():
+    otro = User(username='vecino', password_hash=hash_text('clave'), nombre='Luis', apellido='Mora',
+                codigo_asociado_hash=hash_text('ASOC-0002'))
+    db.session.add(otro)
+    db.session.commit()
+    return otro
+
+
+CSV = (
+    "nombreFinca,areaCultivada,produccionVerde,username,user_id\n"
+    "Propia,2,1500,,\n"
+    "Con mi usuario,2,1500,productor,\n"
+    "Ajena por username,2,1500,vecino,\n"
+    "Ajena por id,2,1500,,{otro}\n"
+    "Inexistente,2,1500,nadie,\n"
+)
+
+
+def test_importacion_web_usa_el_usuario_de_la_sesion(usuario, cliente):
+    otro = _otro_usuario()
+    archivo = io.BytesIO(CSV.format(otro=otro.id).encode('utf-8'))
+    respuesta = cliente.post('/api/historial/importar', data={'archivo': (archivo, 'planilla.csv')})
+    reporte = respuesta.get_json()
+
+    assert respuesta.status_code == 200, reporte
+    assert (reporte['insertadas'], reporte['con_error']) == (2, 3)
+    assert [e['fila'] for e in reporte['errores']] == [4, 5, 6]
+    assert len({e['error'] for e in reporte['errores']}) == 1   # no distingue ajeno de inexistente
+    assert {c.user_id for c in CalculoEUDR.query} == {usuario.id}
+    assert CalculoEUDR.query.filter_by(user_id=otro.id).count() == 0
+
+
+def test_importacion_cli_respeta_el_usuario_de_cada_fila(usuario):
+    otro = _otro_usuario()
+    filas = importador.leer_csv(io.BytesIO(CSV.format(otro=otro.id).encode('utf-8')))
+    reporte = importador.importar(filas, user_id=usuario.id)
+
+    assert (reporte['insertadas'], reporte['con_error']) == (4, 1)
+    assert reporte['errores'] == [{'fila': 6, 'error': 'Usuario no encontrado: nadie'}]
+    assert CalculoEUDR.query.filter_by(user_id=otro.id).count() == 2
+
+
+def test_error_inesperado_queda_en_el_log(usuario, cliente, monkeypatch, caplog):
+    def falla(*args, **kwargs):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(importador, 'importar', falla)
+
+    archivo = io.BytesIO(b"nombreFinca,areaCultivada,produccionVerde\nPropia,2,1500\n")
+    respuesta = cliente.post('/api/historial/importar', data={'archivo': (archivo, 'planilla.csv')})
+    assert respuesta.status_code == 500
+    assert respuesta.get_json()['message'] == "Error al importar el archivo"
+    registro, = [r for r in caplog.records if r.levelname == 'ERROR']
+    assert registro.getMessage() == f"Error en importación de planilla.csv (usuario {usuario.id})"
+    assert registro.exc_info[1].args == ("disco lleno",)
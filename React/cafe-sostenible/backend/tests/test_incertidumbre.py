@@ -0,0 +1,56 @@
+# backend/tests/test_incertidumbre.py
+import pytest
+
+import factores_emision
+import huella
+import incertidumbre
+from models import CalculoEUDR
+
+PAYLOAD = {
+    'nombreFinca': 'Finca La Prueba', 'areaCultivada': 2, 'produccionVerde': 1500,
+    'fertilizanteTotal': 300, 'tipoFertilizante': 'sintetico', 'distanciaKm': 80,
+    'tipoProcesamiento': 'lavado',
+}
+
+
+def test_ajustar_escala_centro_y_limites():
+    factores = dict(huella.FACTORES, fert_sintetico=9.0, energia_red=0.9)
+    ajustadas = incertidumbre.ajustar(incertidumbre.DISTRIBUCIONES, factores)
+    assert ajustadas['fert_sintetico'] == ('lognormal', 9.0, 0.35)
+    assert ajustadas['energia_red'] == pytest.approx(('triangular', 0.60, 0.90, 1.20))
+    assert ajustadas['transporte'] == incertidumbre.DISTRIBUCIONES['transporte']
+
+
+def test_bandas_con_los_factores_de_la_version_del_calculo(usuario, cliente):
+    factores_emision.sembrar_base()
+    doble = factores_emision.crear('doble', {'fert_sintetico': 9.0, 'transporte': 0.24}, activar_ya=True)
+    assert cliente.post('/api/historial', json=PAYLOAD).status_code == 201
+    calculo = CalculoEUDR.query.one()
+    assert calculo.factores_version_id == doble.id
+    # La versión activa cambia después: las bandas siguen la del cálculo
+    factores_emision.activar(factores_emision.buscar(factores_emision.BASE))
+
+    esperado = huella.calcular_lote(huella.columnas_desde_registros([calculo.to_dict()]),
+                                    factores_emision.valores(doble))
+    respuesta = cliente.get(f'/api/v1/incertidumbre/{calculo.id}?n=4000&semilla=1'
+                            '&distribuciones={"transporte":"fija"}')
+    assert respuesta.status_code == 200, respuesta.get_json()
+    percentiles = respuesta.get_json()['data']['percentiles']
+
+    # La lognormal se centra en el factor de la versión (su mediana)
+    assert percentiles['fertilizantes']['p50'] == pytest.approx(esperado['fertilizantes'][0], rel=0.03)
+    # Un factor fijo toma el valor de la versión, no el de huella.FACTORES
+    transporte = round(float(esperado['transporte'][0]), 2)
+    assert percentiles['transporte'] == {'p5': transporte, 'p50': transporte, 'p95': transporte}
+
+
+def test_lote_usa_la_version_activa(usuario, cliente):
+    factores_emision.sembrar_base()
+    factores_emision.crear('doble', {'fert_sintetico': 9.0}, activar_ya=True)
+    registro = {'areaCultivada': 2, 'produccionVerde': 1500, 'fertilizanteTotal': 300,
+                'tipoFertilizante': 'sintetico'}
+    respuesta = cliente.post('/api/calcular/lote', json={
+        'registros': [registro], 'incertidumbre': {'n': 4000, 'semilla': 1}})
+    item, = respuesta.get_json()['resultados']
+    assert item['incertidumbre']['fertilizantes']['p50'] == \
+        pytest.approx(item['desglose']['fertilizantes'], rel=0.03)
@@ -0,0 +1,66 @@
+# backend/tests/test_metricas.py
+from contextlib import nullcontext
+
+import pytest
+
+import metricas
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def app_metricas(configuracion):
+    def crear(**extra):
+        app = create_app({**configuracion, 'METRICAS': '1', **extra})
+        with app.app_context():
+            db.create_all()
+        return app
+    yield crear
+    metricas.activas = False
+
+
+def test_apagadas_no_hay_endpoint(app, cliente):
+    assert metricas.activas is False
+    assert cliente.get('/metrics').status_code == 404
+    assert isinstance(metricas.medir('noticias'), nullcontext)
+
+
+@pytest.mark.parametrize('cabecera, estado', [
+    (None, 401),
+    ('Bearer otro', 401),
+    ('secreto', 401),
+    ('Bearer secreto', 200),
+])
+def test_token(app_metricas, cabecera, estado):
+    cliente = app_metricas(METRICAS_TOKEN='secreto').test_client()
+    headers = {'Authorization': cabecera} if cabecera else {}
+    assert cliente.get('/metrics', headers=headers).status_code == estado
+
+
+def test_sin_token_abierto_y_con_peticiones_medidas(app_metricas):
+    app = app_metricas()
+    cliente = app.test_client()
+    assert cliente.get('/api/total-usuarios').status_code == 200
+
+    respuesta = cliente.get('/metrics')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/plain'
+    texto = respuesta.get_data(as_text=True)
+    assert 'cafe_http_request_duration_seconds_bucket{endpoint="api.total_usuarios",method="GET",status="200",le="+Inf"}' in texto
+    assert 'cafe_http_request_queries_count{endpoint="api.total_usuarios"}' in texto
+    assert '# TYPE cafe_sql_query_duration_seconds histogram' in texto
+
+
+def test_histograma_acumula_cubetas():
+    histograma = metricas.Histograma('prueba_segundos', 'Prueba', ('ruta',), cubetas=(0.1, 1))
+    for valor in (0.05, 0.5, 0.5, 3):
+        histograma.observar(valor, 'a"b')
+    assert histograma.exponer() == [
+        '# HELP prueba_segundos Prueba',
+        '# TYPE prueba_segundos histogram',
+        'prueba_segundos_bucket{ruta="a\\"b",le="0.1"} 1',
+        'prueba_segundos_bucket{ruta="a\\"b",le="1"} 3',
+        'prueba_segundos_bucket{ruta="a\\"b",le="+Inf"} 4',
+        'prueba_segundos_sum{ruta="a\\"b"} 4.05',
+        'prueba_segundos_count{ruta="a\\"b"} 4',
+    ]
@@ -0,0 +1,64 @@
+# backend/tests/test_migraciones.py
+import migraciones
+from app import hash_text
+from models import db, Finca, User
+
+
+def _usuario(username, codigo):
+    return User(username=username, password_hash='x', nombre='N', apellido='A',
+                codigo_asociado_hash=hash_text(codigo))
+
+
+def test_agregar_finca_id_en_esquema_viejo(app):
+    # Esquema anterior: users sin finca_id
+    db.session.execute(db.text("DROP TABLE users"))
+    db.session.execute(db.text(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(100) NOT NULL UNIQUE,"
+        " password_hash VARCHAR(255) NOT NULL, nombre VARCHAR(100) NOT NULL, apellido VARCHAR(100) NOT NULL,"
+        " codigo_asociado_hash VARCHAR(255) NOT NULL, foto_perfil BLOB, foto_mime VARCHAR(50),"
+        " foto_hash VARCHAR(64))"
+    ))
+    db.session.commit()
+    assert 'finca_id' not in migraciones._columnas('users')
+
+    finca = Finca(nombre='Finca Vieja', codigo_hash=hash_text('ASOC-0009'), codigo_original='ASOC-0009')
+    db.session.add(finca)
+    db.session.commit()
+    db.session.execute(db.text(
+        "INSERT INTO users (username, password_hash, nombre, apellido, codigo_asociado_hash) "
+        "VALUES ('viejo', 'x', 'N', 'A', :codigo), ('huerfano', 'x', 'N', 'A', :otro)"
+    ), {'codigo': hash_text('ASOC-0009'), 'otro': hash_text('ASOC-9999')})
+    db.session.commit()
+
+    assert migraciones.agregar_finca_id() == 1
+    filas = dict(db.session.execute(db.text("SELECT username, finca_id FROM users")).all())
+    assert filas == {'viejo': finca.id, 'huerfano': None}
+
+
+def test_rellenar_finca_id_no_pisa_ni_repite(app, usuario):
+    otra = Finca(nombre='Otra', codigo_hash=hash_text('ASOC-0002'), codigo_original='ASOC-0002')
+    nuevo, sin_finca = _usuario('nuevo', 'ASOC-0002'), _usuario('sin-finca', 'ASOC-0404')
+    db.session.add_all([otra, nuevo, sin_finca])
+    db.session.commit()
+
+    assert migraciones.agregar_finca_id() == 1          # solo 'nuevo'
+    assert migraciones.agregar_finca_id() == 0          # idempotente
+    db.session.expire_all()
+    assert (usuario.finca.nombre, nuevo.finca_id, sin_finca.finca_id) == ('Finca La Prueba', otra.id, None)
+
+
+def test_api_user_en_una_consulta(app, usuario, cliente):
+    sentencias = []
+
+    def contar(conn, cursor, sql, *args):
+        sentencias.append(sql)
+
+    db.event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        data = cliente.get('/api/user').get_json()
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', contar)
+
+    assert (data['nombreFinca'], data['codigo_asociado']) == ('Finca La Prueba', 'ASOC-0001')
+    assert len(sentencias) == 1 and 'JOIN fincas' in sentencias[0]
+    assert 'foto_perfil' not in sentencias[0] and 'password_hash' not in sentencias[0]
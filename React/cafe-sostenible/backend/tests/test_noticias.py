@@ -0,0 +1,151 @@
+# backend/tests/test_noticias.py
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import noticias
+
+HTML = """
+<html><body>
+<nav><a href="/">Inicio</a></nav>
+<article class="post">
+  <h2 class="entry-title"><a href="https://soppexcca.org.ni/cosecha">Arranca la cosecha</a></h2>
+  <time class="entry-date">3 noviembre, 2025</time>
+  <div class="entry-content"><p>Primer corte en Jinotega.</p></div>
+  <div class="post-thumbnail"><img src="chica.jpg" srcset="chica.jpg 300w, grande.jpg 1024w"></div>
+</article>
+<article class="post"><h2 class="entry-title">Sin enlace</h2></article>
+</body></html>
+"""
+NOTICIAS = [{"title": "Arranca la cosecha", "date": "3 noviembre, 2025", "snippet": "",
+             "url": "https://soppexcca.org.ni/cosecha", "image": ""}]
+
+
+class Sitio:
+    """Reemplaza la descarga: cuenta las llamadas y puede tardar o fallar."""
+
+    def __init__(self, retraso=0.0):
+        self.retraso = retraso
+        self.llamadas = 0
+        self.caido = False
+
+    def __call__(self):
+        self.llamadas += 1
+        time.sleep(self.retraso)
+        if self.caido:
+            raise noticias.ErrorRed("sitio caído")
+        return [dict(NOTICIAS[0], title=f"Noticia {self.llamadas}")]
+
+
+def _envejecer(cache, segundos):
+    cache._actualizado -= segundos
+
+
+def test_parsear_extrae_articulos():
+    primera, segunda = noticias.parsear(HTML)
+    assert primera == {
+        "title": "Arranca la cosecha", "date": "3 noviembre, 2025", "snippet": "Primer corte en Jinotega.",
+        "url": "https://soppexcca.org.ni/cosecha", "image": "grande.jpg",
+    }
+    assert segunda == {"title": "Sin título", "date": "Sin fecha", "snippet": "", "url": "", "image": ""}
+
+
+def test_una_sola_descarga_para_peticiones_concurrentes():
+    sitio = Sitio(retraso=0.3)
+    cache = noticias.CacheNoticias(ttl=60, cargar=sitio)
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener())) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert sitio.llamadas == 1
+    assert resultados == [([dict(NOTICIAS[0], title="Noticia 1")], 'MISS')] * 8
+    assert cache.obtener() == ([dict(NOTICIAS[0], title="Noticia 1")], 'HIT')
+
+
+def test_vieja_se_sirve_y_se_refresca_en_fondo():
+    sitio = Sitio()
+    cache = noticias.CacheNoticias(ttl=60, stale=600, cargar=sitio)
+    cache.obtener()
+    _envejecer(cache, 61)
+
+    datos, estado = cache.obtener()
+    assert (datos[0]['title'], estado) == ("Noticia 1", 'STALE')
+    for _ in range(100):
+        if sitio.llamadas == 2 and cache._en_curso is None:
+            break
+        time.sleep(0.01)
+    assert cache.obtener() == ([dict(NOTICIAS[0], title="Noticia 2")], 'HIT')
+
+
+def test_sitio_caido_sirve_la_ultima_copia_buena():
+    sitio = Sitio()
+    cache = noticias.CacheNoticias(ttl=60, stale=600, cargar=sitio)
+    cache.obtener()
+    sitio.caido = True
+    _envejecer(cache, 60 + 600 + 1)   # fuera de la ventana stale: se espera la descarga
+
+    assert cache.obtener() == ([dict(NOTICIAS[0], title="Noticia 1")], 'STALE')
+
+
+def test_sin_copia_buena_el_error_llega_a_la_vista(app, monkeypatch):
+    sitio = Sitio()
+    sitio.caido = True
+    monkeypatch.setattr(noticias, 'cache', noticias.CacheNoticias(ttl=60, cargar=sitio))
+    respuesta = app.test_client().get('/api/noticias')
+    assert respuesta.status_code == 502
+
+    sitio.caido = False
+    respuesta = app.test_client().get('/api/noticias')
+    assert respuesta.status_code == 200
+    assert respuesta.headers['X-Cache'] == 'MISS'
+    assert respuesta.headers['Cache-Control'] == 'public, max-age=60'
+    assert respuesta.get_json()[0]['title'] == "Noticia 2"
+    assert app.test_client().get('/api/noticias').headers['X-Cache'] == 'HIT'
+
+
+def test_modo_async_comparte_la_descarga():
+    class Cliente:
+        llamadas = 0
+
+        async def get(self, url, **kwargs):
+            Cliente.llamadas += 1
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, text=HTML, request=httpx.Request('GET', url))
+
+    cache = noticias.CacheNoticias(ttl=60)
+    cache.modo_async = True
+    with pytest.raises(noticias.ErrorRed):
+        cache.obtener()   # la vista no descarga: sin copia todavía
+
+    async def peticiones():
+        await asyncio.gather(*(cache.preparar_async(Cliente()) for _ in range(8)))
+
+    asyncio.run(peticiones())
+    assert Cliente.llamadas == 1
+    datos, estado = cache.obtener()
+    assert (len(datos), estado) == (2, 'HIT')
+
+
+def test_errores_de_refresco_van_al_log(caplog):
+    def roto():
+        raise KeyError('entry-title')   # cambió el HTML del sitio
+    cache = noticias.CacheNoticias(ttl=60, cargar=roto)
+    with pytest.raises(KeyError):
+        cache.obtener()
+    registro, = caplog.records
+    assert (registro.name, registro.levelname, registro.exc_info[0]) == ('noticias', 'ERROR', KeyError)
+
+    caplog.clear()
+    sitio = Sitio()
+    sitio.caido = True
+    with pytest.raises(noticias.ErrorRed):
+        noticias.CacheNoticias(ttl=60, cargar=sitio).obtener()
+    registro, = caplog.records
+    assert (registro.levelname, registro.getMessage(), registro.exc_info) == \
+        ('WARNING', "No se pudieron descargar las noticias: sitio caído", None)
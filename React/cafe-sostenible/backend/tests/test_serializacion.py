@@ -0,0 +1,67 @@
+# backend/tests/test_serializacion.py
+import json
+from datetime import datetime
+
+import pytest
+
+import importador
+import serializacion
+from models import CalculoEUDR
+
+
+@pytest.fixture
+def calculos(usuario):
+    importador.insertar_lote([{
+        'user_id': usuario.id, 'nombre_finca': nombre, 'fecha': fecha,
+        'area_cultivada': 2.5, 'produccion_verde': 1800.0, 'tipo_procesamiento': 'lavado',
+        'fertilizante_total': 300.0 if i else None, 'tipo_fertilizante': 'sintetico' if i else None,
+    } for i, (nombre, fecha) in enumerate([
+        ('Finca Ñandú', datetime(2025, 3, 10, 8, 30, 15, 123456)),
+        ('El Café "Grande"', datetime(2025, 3, 9)),
+    ])])
+    return CalculoEUDR.query.order_by(CalculoEUDR.fecha.desc()).all()
+
+
+def _v1(cliente, **args):
+    respuesta = cliente.get('/api/v1/historial', query_string=args)
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return respuesta.get_json()['data']
+
+
+@pytest.mark.skipif(serializacion.orjson is None, reason="orjson no instalado")
+def test_orjson_y_json_dan_lo_mismo(calculos, monkeypatch):
+    filas = serializacion.consulta(calculos[0].user_id).order_by(CalculoEUDR.id).all()
+    datos = {"items": serializacion.objetos(serializacion.COLUMNAS, filas),
+             "tabla": serializacion.columnar(serializacion.COLUMNAS, filas)}
+    rapido = serializacion.dumps(datos)
+    monkeypatch.setattr(serializacion, 'orjson', None)
+    lento = serializacion.dumps(datos)
+    assert json.loads(rapido) == json.loads(lento)
+    assert b'"2025-03-10T08:30:15.123456"' in rapido and b'"2025-03-10T08:30:15.123456"' in lento
+
+
+def test_objetos_iguales_a_to_dict(calculos, cliente):
+    items = _v1(cliente)['items']
+    assert items == [c.to_dict() for c in calculos]
+    assert list(items[0]) == list(serializacion.COLUMNAS)
+
+
+def test_columnar_igual_a_objetos(calculos, cliente):
+    objetos = _v1(cliente)
+    columnar = _v1(cliente, format='columnar')
+    assert [dict(zip(columnar['columns'], fila)) for fila in columnar['rows']] == objetos['items']
+    assert columnar['pagination'] == objetos['pagination']
+
+
+def test_fields_limita_columnas(calculos, cliente):
+    data = _v1(cliente, fields='huella_por_kg, nombre_finca', format='columnar')
+    assert data['columns'] == ['id', 'nombre_finca', 'fecha', 'huella_por_kg']   # id y fecha siempre
+    assert data['rows'][0][1] == 'Finca Ñandú'
+    assert [list(item) for item in _v1(cliente, fields='tipo_fertilizante')['items']] == \
+        [['id', 'fecha', 'tipo_fertilizante']] * 2
+
+
+@pytest.mark.parametrize('args', [{'fields': 'id,clave_secreta'}, {'format': 'xml'}])
+def test_parametros_invalidos(calculos, cliente, args):
+    respuesta = cliente.get('/api/v1/historial', query_string=args)
+    assert respuesta.status_code == 400 and respuesta.get_json()['success'] is False
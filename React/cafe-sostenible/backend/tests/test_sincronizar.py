@@ -0,0 +1,41 @@
+# backend/tests/test_sincronizar.py
+import pytest
+
+import sincronizar
+from models import CalculoEUDR
+
+VALIDO = {'areaCultivada': 2, 'produccionVerde': 1500, 'nombreFinca': 'Finca La Prueba'}
+
+
+@pytest.mark.parametrize('campo, valor', [
+    ('areaCultivada', [1]),
+    ('produccionVerde', {}),
+    ('arbolesSombra', 'Infinity'),
+    ('tipoCombustible', ['diesel']),
+])
+def test_item_malformado_no_tumba_el_lote(usuario, cliente, campo, valor):
+    items = [
+        {'clave': 'a', **VALIDO},
+        {'clave': 'malo', **VALIDO, campo: valor},
+        {'clave': 'b', **VALIDO},
+    ]
+    respuesta = cliente.post('/api/v1/historial/sync', json={'items': items})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    data = respuesta.get_json()['data']
+
+    assert [r['estado'] for r in data['items']] == ['creado', 'error', 'creado']
+    assert data['resumen'] == {'creado': 2, 'existente': 0, 'error': 1}
+    assert {c.clave_idempotencia for c in CalculoEUDR.query} == {'a', 'b'}
+
+
+def test_error_inesperado_queda_en_el_log(usuario, cliente, monkeypatch, caplog):
+    def falla(user_id, items):
+        raise RuntimeError("base caída")
+    monkeypatch.setattr(sincronizar, 'sincronizar', falla)
+
+    respuesta = cliente.post('/api/v1/historial/sync', json={'items': [{'clave': 'a', **VALIDO}]})
+    assert respuesta.status_code == 500
+    assert respuesta.get_json() == {"success": False, "error": "Error al sincronizar"}
+    registro, = [r for r in caplog.records if r.levelname == 'ERROR']
+    assert registro.getMessage() == f"Error en sincronización (usuario {usuario.id})"
+    assert registro.exc_info[1].args == ("base caída",)
@@ -0,0 +1,24 @@
+# backend/tests/test_tendencias.py
+import tendencias
+from models import db, CalculoEUDR, TendenciaCalculo
+
+PAYLOAD = {'nombreFinca': 'Finca La Prueba', 'areaCultivada': 2, 'produccionVerde': 1500}
+
+
+def _n_por_periodo():
+    return dict(db.session.query(TendenciaCalculo.tipo_periodo, db.func.sum(TendenciaCalculo.n))
+                .group_by(TendenciaCalculo.tipo_periodo))
+
+
+def test_reconstruir_no_cuenta_dos_veces_los_calculos_nuevos(usuario, cliente):
+    for _ in range(3):
+        assert cliente.post('/api/historial', json=PAYLOAD).status_code == 201
+
+    def guardar_otro(_):
+        # Un cálculo que llega a mitad de la reconstrucción (lo suma registrar)
+        if CalculoEUDR.query.count() == 3:
+            assert cliente.post('/api/historial', json=PAYLOAD).status_code == 201
+
+    assert tendencias.reconstruir(tamano_lote=1, log=guardar_otro) == 3
+    db.session.expire_all()
+    assert set(_n_por_periodo().values()) == {4}
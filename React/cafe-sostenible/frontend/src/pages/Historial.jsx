@@ -21,6 +21,10 @@ ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend)
 
 const API_BASE = import.meta.env.VITE_API_URL;
 
+// Respuesta columnar ({ columns, rows }) → lista de objetos
+const filasAObjetos = ({ columns, rows }) =>
+  rows.map((fila) => Object.fromEntries(columns.map((col, i) => [col, fila[i]])));
+
 export default function Historial() {
   const [user, setUser] = useState(null);
   const [historial, setHistorial] = useState([]);
@@ -81,6 +85,7 @@ export default function Historial() {
         const params = new URLSearchParams({
           page: currentPage.toString(),
           per_page: perPage.toString(),
+          format: 'columnar',
         });
 
         if (search && search.trim() !== '') {
@@ -104,7 +109,7 @@ export default function Historial() {
         if (!result.success) throw new Error('Error en API');
 
         const data = result.data;
-        setHistorial(data.items || []);
+        setHistorial(data.rows ? filasAObjetos(data) : data.items || []);
         setTotal(data.pagination.total || 0);
         setPages(data.pagination.pages || 0);
       } catch (err) {